@@ -0,0 +1 @@
+"""Offline benchmarks for the Lex fulfilment Lambda"""
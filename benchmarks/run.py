@@ -0,0 +1,231 @@
+"""
+Offline benchmark and load test for lambda_handler
+
+Drives lambda_handler with synthetic Lex V2 events for every intent against a
+SyntheticBackend and reports p50/p95/p99 latency, peak traced memory and AWS
+API calls per invocation for each scenario. No network access is needed.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --regions 20 --instances 5000 --buckets 2000 --alarms 10000 \\
+        --latency-ms 40 --jitter-ms 20 --throttle-rate 0.02 --iterations 20 --concurrency 4
+    python -m benchmarks.run --scenario ec2-all-regions --cold-cache --max-p95-ms 3000
+    python -m benchmarks.run --scenario ec2-all-accounts-running --member-accounts 30 --regions 17 --instances 200
+    python -m benchmarks.run --async --scenario ec2-all-regions --latency-ms 40
+
+With --async the handlers take the asyncio path and call the backend through a
+local HTTP stand-in (benchmarks.standin) instead of in-process clients.
+
+Exits with status 1 when --max-p95-ms is given and any scenario exceeds it.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmarks measure the handlers, not log shipping
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lambda_function
+from benchmarks.standin import StandInServer, standin_factory
+from benchmarks.synthetic_aws import SyntheticAccount, SyntheticBackend
+from cloud_assistant import accounts, aio, clients
+from cloud_assistant.cache import TTLCache
+
+def confirmed(event):
+    """An event for an intent the user has already confirmed"""
+    event['sessionState']['intent']['confirmationState'] = 'Confirmed'
+    return event
+
+def lex_event(intent_name, **slots):
+    """Minimal Lex V2 fulfilment event for an intent and its slot values"""
+    return {
+        'sessionId': 'benchmark',
+        'inputTranscript': f"benchmark {intent_name}",
+        'invocationSource': 'FulfillmentCodeHook',
+        'bot': {'id': 'BENCHMARK', 'name': 'CloudAssistant', 'aliasId': 'TSTALIASID', 'localeId': 'en_US', 'version': 'DRAFT'},
+        'sessionState': {
+            'sessionAttributes': {},
+            'intent': {
+                'name': intent_name,
+                'state': 'ReadyForFulfillment',
+                'confirmationState': 'None',
+                'slots': {
+                    name: {'value': {'originalValue': value, 'interpretedValue': value, 'resolvedValues': [value]}}
+                    for name, value in slots.items()
+                }
+            }
+        }
+    }
+
+SCENARIOS = {
+    'ec2-all-regions': lambda account: lex_event('ListEC2Instances'),
+    'ec2-all-regions-running': lambda account: lex_event('ListEC2Instances', InstanceState='running'),
+    'ec2-one-region': lambda account: lex_event('ListEC2Instances', Region=account.regions[0]),
+    'ec2-all-accounts-running': lambda account: lex_event('ListEC2Instances', InstanceState='running', Account='all'),
+    's3-list-buckets': lambda account: lex_event('DescribeS3Buckets'),
+    's3-one-bucket': lambda account: lex_event('DescribeS3Buckets', BucketName=account.bucket(0)['Name']),
+    's3-one-bucket-no-metrics': lambda account: lex_event('DescribeS3Buckets', BucketName=account.bucket(1)['Name']),
+    's3-one-bucket-exact': lambda account: lex_event('DescribeS3Buckets', BucketName=account.bucket(0)['Name'], CountMode='exact'),
+    'cloudwatch-active-alarms': lambda account: lex_event('CheckCloudWatchAlarms', AlarmState='alarm'),
+    'cloudwatch-all-alarms': lambda account: lex_event('CheckCloudWatchAlarms', AlarmState='all'),
+    'cloudwatch-alarms-by-prefix': lambda account: lex_event('CheckCloudWatchAlarms', AlarmState='all', AlarmNamePrefix='alarm-001'),
+    'cloudwatch-alarms-by-namespace': lambda account: lex_event('CheckCloudWatchAlarms', AlarmState='alarm', Namespace='AWS/Lambda'),
+    'configure-resource': lambda account: confirmed(lex_event('ConfigureAWSResource', ResourceType='s3', ConfigurationName='benchmark')),
+    'job-status': lambda account: lex_event('CheckJobStatus', JobId='benchmark'),
+    'service-status': lambda account: lex_event('GetAWSServiceStatus', ServiceName='all'),
+    'service-status-ec2': lambda account: lex_event('GetAWSServiceStatus', ServiceName='ec2'),
+}
+
+class BenchmarkContext:
+    """Lambda context stand-in with a real deadline"""
+    
+    def __init__(self, timeout_ms):
+        self.function_name = 'cloud-assistant-benchmark'
+        self.aws_request_id = 'benchmark'
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+    
+    def get_remaining_time_in_millis(self):
+        return max(int((self._deadline - time.monotonic()) * 1000), 0)
+
+def clear_caches():
+    """Invalidate every TTLCache held by a loaded cloud_assistant module, and the alarm index"""
+    for name, module in list(sys.modules.items()):
+        if name.startswith('cloud_assistant') and module is not None:
+            for value in vars(module).values():
+                if isinstance(value, TTLCache):
+                    value.invalidate()
+    alarm_index = sys.modules.get('cloud_assistant.alarm_index')
+    if alarm_index is not None:
+        alarm_index.clear_indexes()
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_scenario(name, backend, args):
+    event = SCENARIOS[name](backend.account)
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    
+    def invoke():
+        nonlocal failures
+        if args.cold_cache:
+            clear_caches()
+        started = time.perf_counter()
+        response = lambda_function.lambda_handler(event, BenchmarkContext(args.timeout_ms))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            if response['sessionState']['intent'].get('state') != 'Fulfilled':
+                failures += 1
+    
+    # One untimed call loads the handler module and fills caches for warm runs
+    with contextlib.redirect_stdout(io.StringIO()):
+        invoke()
+    latencies.clear()
+    failures = 0
+    backend.reset_calls()
+    
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(invoke) for _ in range(args.iterations)]:
+                future.result()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'scenario': name,
+        'iterations': len(latencies),
+        'failures': failures,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'peak_memory_mb': round(peak_bytes / (1024 * 1024), 2),
+        'api_calls_per_invocation': round(backend.total_calls() / len(latencies), 2),
+        'api_calls': {f"{service}.{operation}": count for (service, operation), count in sorted(backend.calls.items())}
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario to run (repeatable, default: all)')
+    parser.add_argument('--regions', type=int, default=20)
+    parser.add_argument('--instances', type=int, default=5000, help='Instances per region')
+    parser.add_argument('--buckets', type=int, default=2000)
+    parser.add_argument('--objects', type=int, default=1000, help='Objects per bucket')
+    parser.add_argument('--alarms', type=int, default=10000)
+    parser.add_argument('--member-accounts', type=int, default=0, help='Organization member accounts to scan (0: single account)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Injected latency per API call')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random extra latency per API call')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of API calls that are throttled')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent invocations in one process')
+    parser.add_argument('--timeout-ms', type=int, default=30000, help='Simulated Lambda timeout')
+    parser.add_argument('--cold-cache', action='store_true', help='Clear inventory caches before every invocation')
+    parser.add_argument('--no-validate', action='store_true', help='Skip botocore parameter validation')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Use the asyncio path against a local HTTP stand-in')
+    parser.add_argument('--json', help='Also write results to this file')
+    parser.add_argument('--max-p95-ms', type=float, help='Fail if any scenario p95 exceeds this')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    account = SyntheticAccount(
+        regions=args.regions,
+        instances_per_region=args.instances,
+        buckets=args.buckets,
+        alarms=args.alarms,
+        objects_per_bucket=args.objects,
+        member_accounts=args.member_accounts
+    )
+    backend = SyntheticBackend(
+        account,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        validate=not args.no_validate
+    )
+    clients.set_client_factory(backend)
+    if args.use_async:
+        aio.AWS_ASYNC = True
+        aio.set_client_factory(standin_factory(StandInServer(backend).start()))
+    if args.member_accounts:
+        accounts.ACCOUNTS = 'organizations'
+    
+    results = []
+    header = f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}{'calls/inv':>11}{'failed':>8}"
+    print(header)
+    print('-' * len(header))
+    for name in args.scenario or list(SCENARIOS):
+        result = run_scenario(name, backend, args)
+        results.append(result)
+        print(
+            f"{name:<26}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{result['peak_memory_mb']:>10}{result['api_calls_per_invocation']:>11}{result['failures']:>8}"
+        )
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.max_p95_ms is not None:
+        slow = [r['scenario'] for r in results if r['p95_ms'] > args.max_p95_ms]
+        if slow:
+            print(f"p95 above {args.max_p95_ms} ms: {', '.join(slow)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Local HTTP stand-in for AWS, for the asyncio path
+
+Serves a SyntheticBackend over HTTP/1.1 on localhost so the async handlers make
+real non-blocking socket calls, with the backend's injected latency and
+throttling happening on the server side. StandInClient is an aiobotocore-style
+client for it: every operation is a coroutine method taking boto3 keyword
+arguments, errors are raised as ClientError with the usual .response shape,
+and connections are kept alive and reused.
+
+    python -m benchmarks.run --async --scenario ec2-all-regions --latency-ms 40
+    python -m benchmarks.standin --port 4566 --regions 4 --instances 100
+
+The wire format is {operation: ..., params: ...} in and the response dict out,
+as JSON with datetimes as {"__datetime__": iso}; it is not the AWS protocol, so
+real aiobotocore clients cannot be pointed at it.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.synthetic_aws import ClientError, SyntheticAccount, SyntheticBackend
+
+# Threads running backend calls; the injected latency sleeps on them
+SERVER_WORKERS = 128
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+def _decode(value):
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    return value
+
+def dumps(value):
+    return json.dumps(value, default=_encode).encode('utf-8')
+
+def loads(data):
+    return json.loads(data, object_hook=_decode)
+
+async def _read_message(reader):
+    """(first line, body) of one HTTP message, or None at end of stream"""
+    first_line = await reader.readline()
+    if not first_line:
+        return None
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value.strip())
+    return first_line.decode('latin-1').strip(), await reader.readexactly(length)
+
+class StandInServer:
+    """SyntheticBackend served on its own thread and event loop"""
+    
+    def __init__(self, backend, host='127.0.0.1', port=0):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self._clients = {}
+        self._executor = ThreadPoolExecutor(max_workers=SERVER_WORKERS)
+        self._loop = asyncio.new_event_loop()
+    
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+    
+    def start(self):
+        """Start serving in the background; returns the base URL"""
+        threading.Thread(target=self._loop.run_forever, name='aws-standin', daemon=True).start()
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._serve, self.host, self.port), self._loop
+        ).result()
+        self.port = server.sockets[0].getsockname()[1]
+        return self.url
+    
+    def _dispatch(self, service, region, operation, params):
+        client = self._clients.get((service, region))
+        if client is None:
+            client = self._clients.setdefault((service, region), self.backend(service, region))
+        try:
+            return 200, getattr(client, operation)(**params)
+        except ClientError as e:
+            return 400, e.response
+        except Exception as e:
+            # Parameter validation and other client-side errors
+            return 400, {'Error': {'Code': type(e).__name__, 'Message': str(e)}}
+    
+    async def _serve(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                message = await _read_message(reader)
+                if message is None:
+                    break
+                request_line, body = message
+                # POST /<service>/<region> HTTP/1.1
+                _, service, region = request_line.split()[1].split('/')
+                request = loads(body)
+                status, response = await loop.run_in_executor(
+                    self._executor, self._dispatch, service, region, request['operation'], request['params']
+                )
+                payload = dumps(response)
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Bad Request'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode('latin-1')
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except RuntimeError:
+            # The executor is shut down when the interpreter exits
+            pass
+        finally:
+            writer.close()
+
+class StandInClient:
+    """Async client for one (service, region) of a stand-in server"""
+    
+    def __init__(self, url, service, region):
+        host, _, port = url.split('://', 1)[-1].partition(':')
+        self.host = host
+        self.port = int(port)
+        self.service = service
+        self._idle = []
+        self.meta = types.SimpleNamespace(region_name=region)
+    
+    def __getattr__(self, operation):
+        if operation.startswith('_'):
+            raise AttributeError(operation)
+        
+        async def method(**params):
+            return await self._request(operation, params)
+        
+        method.__name__ = operation
+        return method
+    
+    async def _request(self, operation, params):
+        body = dumps({'operation': operation, 'params': params})
+        if self._idle:
+            reader, writer = self._idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(
+                f"POST /{self.service}/{self.meta.region_name} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1')
+                + body
+            )
+            await writer.drain()
+            message = await _read_message(reader)
+            if message is None:
+                raise ConnectionResetError("stand-in closed the connection")
+        except BaseException:
+            # A cancelled or broken request leaves the connection in an unknown state
+            writer.close()
+            raise
+        self._idle.append((reader, writer))
+        
+        status_line, payload = message
+        response = loads(payload)
+        if status_line.split()[1] != '200':
+            raise ClientError(response, operation)
+        return response
+    
+    async def __aexit__(self, *exc_info):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+def standin_factory(url):
+    """aio.set_client_factory() factory building StandInClients for a server URL"""
+    return lambda service, region, credentials=None: StandInClient(url, service, region)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=4566)
+    parser.add_argument('--regions', type=int, default=20)
+    parser.add_argument('--instances', type=int, default=5000, help='Instances per region')
+    parser.add_argument('--buckets', type=int, default=2000)
+    parser.add_argument('--alarms', type=int, default=10000)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Injected latency per API call')
+    args = parser.parse_args(argv)
+    
+    account = SyntheticAccount(
+        regions=args.regions,
+        instances_per_region=args.instances,
+        buckets=args.buckets,
+        alarms=args.alarms
+    )
+    server = StandInServer(SyntheticBackend(account, latency_ms=args.latency_ms), port=args.port)
+    print(f"Serving synthetic AWS on {server.start()}")
+    threading.Event().wait()
+
+if __name__ == '__main__':
+    main()
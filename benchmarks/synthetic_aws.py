@@ -0,0 +1,566 @@
+"""
+Synthetic AWS backend for offline benchmarks
+
+SyntheticAccount describes an account (regions, instances, buckets, alarms) and
+SyntheticBackend hands out fake clients for it through
+cloud_assistant.clients.set_client_factory(). Records are generated on demand
+from their index, so a 20 x 5,000 instance account costs no memory until a page
+is requested. Every call can be delayed and randomly throttled, and is counted
+per operation. When botocore is installed, request parameters are validated
+against the real service model, so parameter mistakes in the handlers still
+fail offline.
+
+botocore's Stubber is not used because its strictly ordered response queue does
+not fit concurrent fan-outs, and moto cannot inject per-call latency or
+throttling.
+"""
+import json
+import random
+import re
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:
+    class ClientError(Exception):
+        """Stand-in with the same .response shape as botocore's ClientError"""
+        def __init__(self, error_response, operation_name):
+            self.response = error_response
+            self.operation_name = operation_name
+            super().__init__(f"An error occurred ({error_response['Error']['Code']}) when calling the {operation_name} operation")
+
+REGION_NAMES = [
+    'us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'ca-central-1', 'sa-east-1',
+    'eu-west-1', 'eu-west-2', 'eu-west-3', 'eu-central-1', 'eu-north-1', 'eu-south-1',
+    'ap-south-1', 'ap-northeast-1', 'ap-northeast-2', 'ap-northeast-3', 'ap-southeast-1',
+    'ap-southeast-2', 'me-south-1', 'af-south-1', 'ap-east-1', 'il-central-1'
+]
+INSTANCE_STATES = ['running', 'running', 'running', 'stopped', 'pending', 'terminated']
+INSTANCE_TYPES = ['t3.micro', 't3.large', 'm5.xlarge', 'c6g.large', 'r6i.2xlarge']
+TEAMS = ['payments', 'search', 'web', 'data']
+ALARM_STATES = ['OK', 'OK', 'OK', 'ALARM', 'INSUFFICIENT_DATA']
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+class SyntheticAccount:
+    """Shape of a synthetic account; every count is per account unless noted"""
+    
+    def __init__(self, regions=20, instances_per_region=5000, buckets=2000, alarms=10000, objects_per_bucket=1000, member_accounts=0):
+        self.regions = REGION_NAMES[:regions]
+        self.instances_per_region = instances_per_region
+        self.buckets = buckets
+        self.alarms = alarms
+        self.objects_per_bucket = objects_per_bucket
+        # Organization members besides the management account; each looks like this one
+        self.account_id = '000000000000'
+        self.member_ids = [f"{index + 1:012d}" for index in range(member_accounts)]
+    
+    def instance(self, region, index):
+        return {
+            'InstanceId': f"i-{self.regions.index(region):04x}{index:013x}",
+            'InstanceType': INSTANCE_TYPES[index % len(INSTANCE_TYPES)],
+            'State': {'Name': INSTANCE_STATES[index % len(INSTANCE_STATES)]},
+            'Placement': {'AvailabilityZone': f"{region}a"},
+            'LaunchTime': EPOCH + timedelta(minutes=index),
+            'Tags': [
+                {'Key': 'Name', 'Value': f"server-{index}"},
+                {'Key': 'team', 'Value': TEAMS[index % len(TEAMS)]}
+            ]
+        }
+    
+    def bucket(self, index):
+        return {'Name': f"bucket-{index:05d}", 'CreationDate': EPOCH + timedelta(days=index % 365)}
+    
+    def bucket_region(self, index):
+        return self.regions[index % len(self.regions)]
+    
+    def alarm(self, index):
+        alarm = {
+            'AlarmName': f"alarm-{index:05d}",
+            'AlarmDescription': f"Synthetic alarm {index}",
+            'StateValue': ALARM_STATES[index % len(ALARM_STATES)],
+            'StateUpdatedTimestamp': EPOCH + timedelta(seconds=index)
+        }
+        # Every tenth alarm is a composite alarm over the two before it
+        if index % 10 == 9:
+            alarm['AlarmRule'] = f"ALARM(alarm-{index - 1:05d}) OR ALARM(alarm-{index - 2:05d})"
+        else:
+            alarm['Namespace'] = 'AWS/EC2' if index % 2 else 'AWS/Lambda'
+            alarm['MetricName'] = 'CPUUtilization' if index % 2 else 'Errors'
+        return alarm
+
+class SyntheticBackend:
+    """Client factory for a SyntheticAccount with injected latency and throttling"""
+    
+    def __init__(self, account, latency_ms=0, jitter_ms=0, throttle_rate=0.0, validate=True, seed=0):
+        self.account = account
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.calls = {}
+        # Resources created by provisioning jobs: instances by client token, alarms by name
+        self.launched = {}
+        self.created_alarms = {}
+        # Message bodies sent to SQS queues, by queue URL
+        self.sent_messages = {}
+        # DynamoDB items by table name, then by (pk, sk)
+        self.tables = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._models = {}
+        self._validate = validate and self._load_validator()
+    
+    def __call__(self, service, region, credentials=None):
+        client_class = CLIENT_CLASSES.get(service)
+        if client_class is None:
+            raise NotImplementedError(f"No synthetic {service} client")
+        return client_class(self, service, region)
+    
+    def reset_calls(self):
+        with self._lock:
+            self.calls = {}
+    
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+    
+    def _load_validator(self):
+        try:
+            import botocore.session
+            from botocore.validate import ParamValidator
+        except ImportError:
+            return False
+        self._botocore_session = botocore.session.get_session()
+        self._validator = ParamValidator()
+        return True
+    
+    def _check_params(self, service, operation, params):
+        from botocore import xform_name
+        from botocore.exceptions import ParamValidationError
+        model = self._models.get(service)
+        if model is None:
+            service_model = self._botocore_session.get_service_model(service)
+            model = {xform_name(name): service_model.operation_model(name) for name in service_model.operation_names}
+            self._models[service] = model
+        report = self._validator.validate(params, model[operation].input_shape)
+        if report.has_errors():
+            raise ParamValidationError(report=report.generate_report())
+    
+    def request(self, service, operation, params):
+        """Account for, delay, validate and maybe throttle one API call"""
+        with self._lock:
+            self.calls[(service, operation)] = self.calls.get((service, operation), 0) + 1
+            throttled = self._random.random() < self.throttle_rate
+            delay_ms = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if self._validate:
+            self._check_params(service, operation, params)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+        if throttled:
+            code = 'SlowDown' if service == 's3' else 'Throttling'
+            raise ClientError({'Error': {'Code': code, 'Message': 'Rate exceeded'}}, operation)
+
+class _SyntheticClient:
+    def __init__(self, backend, service, region):
+        self.backend = backend
+        self.account = backend.account
+        self.meta = types.SimpleNamespace(region_name=region)
+    
+    def _page(self, items, params, limit_key, default_limit, token_key='NextToken'):
+        start = int(params.get(token_key) or 0)
+        limit = params.get(limit_key) or default_limit
+        page = items[start:start + limit]
+        token = str(start + limit) if start + limit < len(items) else None
+        return page, token
+
+class SyntheticEC2(_SyntheticClient):
+    def _filtered_indexes(self, params):
+        region = self.meta.region_name
+        if region not in self.account.regions:
+            return []
+        states = None
+        for f in params.get('Filters', []):
+            if f['Name'] == 'instance-state-name':
+                states = set(f['Values'])
+        count = self.account.instances_per_region
+        indexes = range(count)
+        if states is not None:
+            indexes = [i for i in indexes if INSTANCE_STATES[i % len(INSTANCE_STATES)] in states]
+        if params.get('InstanceIds'):
+            wanted = set(params['InstanceIds'])
+            indexes = [i for i in indexes if self.account.instance(region, i)['InstanceId'] in wanted]
+        return indexes
+    
+    def describe_regions(self, **params):
+        self.backend.request('ec2', 'describe_regions', params)
+        return {'Regions': [{'RegionName': r, 'Endpoint': f"ec2.{r}.amazonaws.com"} for r in self.account.regions]}
+    
+    def describe_instances(self, **params):
+        self.backend.request('ec2', 'describe_instances', params)
+        indexes, token = self._page(list(self._filtered_indexes(params)), params, 'MaxResults', 1000)
+        region = self.meta.region_name
+        response = {'Reservations': [{'Instances': [self.account.instance(region, i) for i in indexes]}]}
+        if token:
+            response['NextToken'] = token
+        # Launched instances are running by the time they are first described
+        launched = [i for i in self.backend.launched.values() if i['InstanceId'] in params.get('InstanceIds', [])]
+        if launched:
+            response['Reservations'].append({'Instances': [dict(i, State={'Name': 'running'}) for i in launched]})
+        return response
+    
+    def run_instances(self, **params):
+        self.backend.request('ec2', 'run_instances', params)
+        with self.backend._lock:
+            # The same client token returns the instance of the first launch
+            token = params.get('ClientToken') or str(len(self.backend.launched))
+            if token not in self.backend.launched:
+                self.backend.launched[token] = {
+                    'InstanceId': f"i-{0xffff:04x}{len(self.backend.launched):013x}",
+                    'InstanceType': params['InstanceType'],
+                    'ImageId': params['ImageId'],
+                    'State': {'Name': 'pending'},
+                    'Placement': {'AvailabilityZone': f"{self.meta.region_name}a"},
+                    'LaunchTime': datetime.now(timezone.utc),
+                    'Tags': params.get('TagSpecifications', [{}])[0].get('Tags', [])
+                }
+            return {'Instances': [self.backend.launched[token]]}
+    
+    def describe_instance_status(self, **params):
+        self.backend.request('ec2', 'describe_instance_status', params)
+        indexes, token = self._page(list(self._filtered_indexes(params)), params, 'MaxResults', 1000)
+        region = self.meta.region_name
+        statuses = []
+        for i in indexes:
+            instance = self.account.instance(region, i)
+            statuses.append({
+                'InstanceId': instance['InstanceId'],
+                'InstanceState': instance['State'],
+                'AvailabilityZone': instance['Placement']['AvailabilityZone']
+            })
+        response = {'InstanceStatuses': statuses}
+        if token:
+            response['NextToken'] = token
+        return response
+
+class SyntheticS3(_SyntheticClient):
+    def _bucket_index(self, name, operation):
+        try:
+            index = int(name.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            index = -1
+        if not 0 <= index < self.account.buckets:
+            raise ClientError({'Error': {'Code': 'NoSuchBucket', 'Message': 'The specified bucket does not exist'}}, operation)
+        return index
+    
+    def list_buckets(self, **params):
+        self.backend.request('s3', 'list_buckets', params)
+        # ListBuckets reports each bucket's region, as the current API does
+        buckets = [dict(self.account.bucket(i), BucketRegion=self.account.bucket_region(i)) for i in range(self.account.buckets)]
+        return {'Buckets': buckets, 'Owner': {'ID': 'synthetic'}}
+    
+    def get_bucket_location(self, **params):
+        self.backend.request('s3', 'get_bucket_location', params)
+        region = self.account.bucket_region(self._bucket_index(params['Bucket'], 'get_bucket_location'))
+        return {'LocationConstraint': None if region == 'us-east-1' else region}
+    
+    def get_bucket_policy_status(self, **params):
+        self.backend.request('s3', 'get_bucket_policy_status', params)
+        index = self._bucket_index(params['Bucket'], 'get_bucket_policy_status')
+        return {'PolicyStatus': {'IsPublic': index % 10 == 0}}
+    
+    def list_objects_v2(self, **params):
+        self.backend.request('s3', 'list_objects_v2', params)
+        index = self._bucket_index(params['Bucket'], 'list_objects_v2')
+        prefix = params.get('Prefix', '')
+        delimiter = params.get('Delimiter')
+        # Keys are spread over 16 top-level prefixes, plus one object at the root
+        keys = ['README.txt'] + sorted(f"part-{n % 16:02d}/{n:08d}.json" for n in range(self.account.objects_per_bucket - 1))
+        entries = []
+        seen_prefixes = set()
+        start_after = params.get('StartAfter')
+        for key in keys:
+            if not key.startswith(prefix) or (start_after is not None and key <= start_after):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                common = prefix + rest.split(delimiter, 1)[0] + delimiter
+                if common not in seen_prefixes:
+                    seen_prefixes.add(common)
+                    entries.append(('prefix', common))
+            else:
+                entries.append(('key', key))
+        page, token = self._page(entries, params, 'MaxKeys', 1000, token_key='ContinuationToken')
+        response = {
+            'KeyCount': len(page),
+            'IsTruncated': token is not None,
+            'Contents': [{'Key': k, 'Size': 1024 * (1 + (index + len(k)) % 64), 'LastModified': EPOCH} for kind, k in page if kind == 'key'],
+            'CommonPrefixes': [{'Prefix': p} for kind, p in page if kind == 'prefix']
+        }
+        if token:
+            response['NextContinuationToken'] = token
+        return response
+    
+    def create_bucket(self, **params):
+        self.backend.request('s3', 'create_bucket', params)
+        return {'Location': f"/{params['Bucket']}"}
+    
+    def put_public_access_block(self, **params):
+        self.backend.request('s3', 'put_public_access_block', params)
+        return {}
+    
+    def put_bucket_encryption(self, **params):
+        self.backend.request('s3', 'put_bucket_encryption', params)
+        return {}
+    
+    def put_bucket_tagging(self, **params):
+        self.backend.request('s3', 'put_bucket_tagging', params)
+        return {}
+    
+    def list_bucket_inventory_configurations(self, **params):
+        self.backend.request('s3', 'list_bucket_inventory_configurations', params)
+        self._bucket_index(params['Bucket'], 'list_bucket_inventory_configurations')
+        return {'InventoryConfigurationList': [], 'IsTruncated': False}
+
+class SyntheticCloudWatch(_SyntheticClient):
+    def _bucket_size(self, index):
+        return self.account.objects_per_bucket * 32 * 1024 * (1 + index % 7)
+    
+    def list_metrics(self, **params):
+        self.backend.request('cloudwatch', 'list_metrics', params)
+        # Storage metrics exist for even-numbered buckets only, so odd ones
+        # exercise the inventory and live-listing fallbacks
+        metrics = []
+        if params.get('Namespace') == 'AWS/S3' and params.get('MetricName') in (None, 'BucketSizeBytes'):
+            for i in range(0, self.account.buckets, 2):
+                if self.account.bucket_region(i) == self.meta.region_name:
+                    metrics.append({
+                        'Namespace': 'AWS/S3',
+                        'MetricName': 'BucketSizeBytes',
+                        'Dimensions': [
+                            {'Name': 'BucketName', 'Value': self.account.bucket(i)['Name']},
+                            {'Name': 'StorageType', 'Value': 'StandardStorage'}
+                        ]
+                    })
+        page, token = self._page(metrics, params, 'MaxRecords', 500)
+        response = {'Metrics': page}
+        if token:
+            response['NextToken'] = token
+        return response
+    
+    def get_metric_data(self, **params):
+        self.backend.request('cloudwatch', 'get_metric_data', params)
+        results = []
+        for query in params['MetricDataQueries']:
+            match = re.search(r'bucket-(\d{5})', json.dumps(query, default=str))
+            index = int(match.group(1)) if match else None
+            values = []
+            if index is not None and index % 2 == 0 and index < self.account.buckets:
+                if query['Id'] == 'objects':
+                    values = [float(self.account.objects_per_bucket)]
+                else:
+                    values = [float(self._bucket_size(index))]
+            results.append({
+                'Id': query['Id'],
+                'Timestamps': [EPOCH] if values else [],
+                'Values': values,
+                'StatusCode': 'Complete'
+            })
+        return {'MetricDataResults': results}
+    
+    def describe_alarms(self, **params):
+        self.backend.request('cloudwatch', 'describe_alarms', params)
+        # Filters work on indexes so only the returned page is materialised
+        indexes = range(self.account.alarms)
+        if params.get('AlarmNames'):
+            indexes = [i for i in indexes if f"alarm-{i:05d}" in params['AlarmNames']]
+        if params.get('StateValue'):
+            indexes = [i for i in indexes if ALARM_STATES[i % len(ALARM_STATES)] == params['StateValue']]
+        if params.get('AlarmNamePrefix'):
+            indexes = [i for i in indexes if f"alarm-{i:05d}".startswith(params['AlarmNamePrefix'])]
+        alarm_types = params.get('AlarmTypes') or ['MetricAlarm']
+        indexes = [i for i in indexes if ('CompositeAlarm' if i % 10 == 9 else 'MetricAlarm') in alarm_types]
+        page, token = self._page(indexes, params, 'MaxRecords', 50)
+        page = [self.account.alarm(i) for i in page]
+        response = {
+            'MetricAlarms': [a for a in page if 'AlarmRule' not in a],
+            'CompositeAlarms': [a for a in page if 'AlarmRule' in a]
+        }
+        if token:
+            response['NextToken'] = token
+        # Alarms created by provisioning jobs are only returned when asked for by name
+        for name in params.get('AlarmNames', []):
+            if name in self.backend.created_alarms:
+                response['MetricAlarms'].append(self.backend.created_alarms[name])
+        return response
+    
+    def put_metric_alarm(self, **params):
+        self.backend.request('cloudwatch', 'put_metric_alarm', params)
+        alarm = {key: value for key, value in params.items() if key != 'Tags'}
+        alarm.update(StateValue='INSUFFICIENT_DATA', StateUpdatedTimestamp=datetime.now(timezone.utc))
+        with self.backend._lock:
+            self.backend.created_alarms[params['AlarmName']] = alarm
+        return {}
+    
+    def describe_alarm_history(self, **params):
+        self.backend.request('cloudwatch', 'describe_alarm_history', params)
+        # The synthetic account never changes, so there is no history to replay
+        return {'AlarmHistoryItems': []}
+
+class SyntheticSSM(_SyntheticClient):
+    def get_parameter(self, **params):
+        self.backend.request('ssm', 'get_parameter', params)
+        return {'Parameter': {'Name': params['Name'], 'Type': 'String', 'Value': 'ami-0123456789abcdef0'}}
+
+class SyntheticHealth(_SyntheticClient):
+    def _events(self):
+        # Two open issues: EC2 in the first region and Lambda in the last one
+        regions = self.account.regions
+        return [
+            {
+                'arn': f"arn:aws:health:{region}::event/{service}/AWS_{service}_OPERATIONAL_ISSUE/{index}",
+                'service': service,
+                'eventTypeCode': f"AWS_{service}_OPERATIONAL_ISSUE",
+                'eventTypeCategory': 'issue',
+                'region': region,
+                'startTime': EPOCH + timedelta(hours=index),
+                'lastUpdatedTime': EPOCH + timedelta(hours=index + 1),
+                'statusCode': 'open',
+                'eventScopeCode': 'PUBLIC'
+            }
+            for index, (service, region) in enumerate([('EC2', regions[0]), ('LAMBDA', regions[-1])])
+        ]
+    
+    def describe_events(self, **params):
+        self.backend.request('health', 'describe_events', params)
+        page, token = self._page(self._events(), params, 'maxResults', 100, token_key='nextToken')
+        response = {'events': page}
+        if token:
+            response['nextToken'] = token
+        return response
+    
+    def describe_event_details(self, **params):
+        self.backend.request('health', 'describe_event_details', params)
+        events = {event['arn']: event for event in self._events()}
+        return {
+            'successfulSet': [
+                {
+                    'event': events[arn],
+                    'eventDescription': {'latestDescription': f"We are investigating increased error rates for {events[arn]['service']}."}
+                }
+                for arn in params['eventArns'] if arn in events
+            ],
+            'failedSet': []
+        }
+
+class SyntheticSTS(_SyntheticClient):
+    def get_caller_identity(self, **params):
+        self.backend.request('sts', 'get_caller_identity', params)
+        account_id = self.account.account_id
+        return {'Account': account_id, 'Arn': f"arn:aws:iam::{account_id}:role/cloud-assistant", 'UserId': 'AROASYNTHETIC'}
+    
+    def assume_role(self, **params):
+        self.backend.request('sts', 'assume_role', params)
+        account_id = params['RoleArn'].split(':')[4]
+        if account_id not in self.account.member_ids:
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': f"Cannot assume {params['RoleArn']}"}}, 'AssumeRole')
+        return {
+            'Credentials': {
+                'AccessKeyId': f"ASIA{account_id}",
+                'SecretAccessKey': 'synthetic',
+                'SessionToken': f"token-{account_id}-{time.monotonic()}",
+                'Expiration': datetime.now(timezone.utc) + timedelta(seconds=params.get('DurationSeconds', 3600))
+            }
+        }
+
+class SyntheticOrganizations(_SyntheticClient):
+    def list_accounts(self, **params):
+        self.backend.request('organizations', 'list_accounts', params)
+        accounts = [
+            {'Id': account_id, 'Name': 'management' if account_id == self.account.account_id else f"member-{account_id[-4:]}", 'Status': 'ACTIVE'}
+            for account_id in [self.account.account_id] + self.account.member_ids
+        ]
+        page, token = self._page(accounts, params, 'MaxResults', 20)
+        response = {'Accounts': page}
+        if token:
+            response['NextToken'] = token
+        return response
+
+class SyntheticSQS(_SyntheticClient):
+    def send_message_batch(self, **params):
+        self.backend.request('sqs', 'send_message_batch', params)
+        with self.backend._lock:
+            queue = self.backend.sent_messages.setdefault(params['QueueUrl'], [])
+            queue.extend(entry['MessageBody'] for entry in params['Entries'])
+        return {'Successful': [{'Id': entry['Id'], 'MessageId': entry['Id']} for entry in params['Entries']], 'Failed': []}
+
+class SyntheticLambda(_SyntheticClient):
+    def invoke(self, **params):
+        # Asynchronous invocations are accepted and counted but not run
+        self.backend.request('lambda', 'invoke', params)
+        return {'StatusCode': 202 if params.get('InvocationType') == 'Event' else 200}
+
+class SyntheticDynamoDB(_SyntheticClient):
+    """Tables with string 'pk'/'sk' keys, queried on the key or a GSI partition attribute"""
+    
+    QUERY_PAGE_SIZE = 100
+    
+    def _table(self, name):
+        return self.backend.tables.setdefault(name, {})
+    
+    def batch_write_item(self, **params):
+        self.backend.request('dynamodb', 'batch_write_item', params)
+        with self.backend._lock:
+            for table_name, requests in params['RequestItems'].items():
+                table = self._table(table_name)
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table[(item['pk']['S'], item['sk']['S'])] = item
+                    else:
+                        key = request['DeleteRequest']['Key']
+                        table.pop((key['pk']['S'], key['sk']['S']), None)
+        return {'UnprocessedItems': {}}
+    
+    def batch_get_item(self, **params):
+        self.backend.request('dynamodb', 'batch_get_item', params)
+        responses = {}
+        with self.backend._lock:
+            for table_name, request in params['RequestItems'].items():
+                table = self._table(table_name)
+                keys = [(key['pk']['S'], key['sk']['S']) for key in request['Keys']]
+                responses[table_name] = [table[key] for key in keys if key in table]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+    
+    def query(self, **params):
+        self.backend.request('dynamodb', 'query', params)
+        attribute, placeholder = re.fullmatch(r"(\w+) = (:\w+)", params['KeyConditionExpression']).groups()
+        value = params['ExpressionAttributeValues'][placeholder]['S']
+        with self.backend._lock:
+            items = sorted(
+                (item for item in self._table(params['TableName']).values() if item.get(attribute, {}).get('S') == value),
+                key=lambda item: (item['sk']['S'], item['pk']['S'])
+            )
+        start = params.get('ExclusiveStartKey')
+        if start:
+            after = (start['sk']['S'], start['pk']['S'])
+            items = [item for item in items if (item['sk']['S'], item['pk']['S']) > after]
+        page = items[:params.get('Limit') or self.QUERY_PAGE_SIZE]
+        response = {'Items': page, 'Count': len(page)}
+        if len(items) > len(page):
+            response['LastEvaluatedKey'] = {'pk': page[-1]['pk'], 'sk': page[-1]['sk']}
+        return response
+
+CLIENT_CLASSES = {
+    'ec2': SyntheticEC2,
+    's3': SyntheticS3,
+    'cloudwatch': SyntheticCloudWatch,
+    'ssm': SyntheticSSM,
+    'health': SyntheticHealth,
+    'lambda': SyntheticLambda,
+    'sts': SyntheticSTS,
+    'organizations': SyntheticOrganizations,
+    'sqs': SyntheticSQS,
+    'dynamodb': SyntheticDynamoDB,
+}
@@ -0,0 +1,6 @@
+"""
+Intent handlers and shared AWS helpers for the CloudAssistant Lex bot.
+
+Modules in this package are imported lazily by lambda_function so that a
+given invocation only pays for the code (and AWS SDK) it actually uses.
+"""
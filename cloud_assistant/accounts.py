@@ -0,0 +1,175 @@
+"""
+Scanning several AWS accounts with assumed-role credentials
+
+ACCOUNTS lists the accounts intents look at:
+
+    (empty)                                   only the Lambda's own account
+    111111111111:prod,222222222222:staging    a static list, names optional
+    organizations                             every active account in the
+                                              AWS Organization
+
+Member accounts are reached by assuming ACCOUNT_ROLE_NAME in them. Credentials
+are cached per account until CREDENTIAL_REFRESH_MARGIN seconds before they
+expire, and concurrent requests for the same account share one AssumeRole
+call, so an org-wide question costs at most one AssumeRole per account, not
+one per region or per request.
+
+scan() runs a function for every (account, region) cell of the work matrix,
+inside clients.use_account(), with at most MAX_ACCOUNT_WORKERS cells in flight
+and the invocation's deadline applied to the whole matrix.
+"""
+import os
+import time
+
+from cloud_assistant import clients
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.coalesce import SingleFlight
+from cloud_assistant.fanout import fan_out
+
+# Accounts to scan: empty, 'organizations', or comma-separated 'id[:name]'
+ACCOUNTS = os.environ.get('ACCOUNTS', '').strip()
+
+# Role assumed in member accounts, and its optional external id
+ACCOUNT_ROLE_NAME = os.environ.get('ACCOUNT_ROLE_NAME', 'CloudAssistantReadOnly')
+ACCOUNT_ROLE_EXTERNAL_ID = os.environ.get('ACCOUNT_ROLE_EXTERNAL_ID', '')
+
+# Lifetime of assumed-role credentials, and how long before expiry they are renewed (seconds)
+ASSUME_ROLE_DURATION = int(os.environ.get('ASSUME_ROLE_DURATION', '3600'))
+CREDENTIAL_REFRESH_MARGIN = int(os.environ.get('CREDENTIAL_REFRESH_MARGIN', '300'))
+
+# (account, region) cells scanned at the same time
+MAX_ACCOUNT_WORKERS = int(os.environ.get('MAX_ACCOUNT_WORKERS', '32'))
+
+# STS and Organizations are called in this region
+ACCOUNTS_API_REGION = os.environ.get('ACCOUNTS_API_REGION', 'us-east-1')
+
+class UnknownAccountError(ValueError):
+    """Raised for an account selector that matches no configured account"""
+
+account_cache = TTLCache(
+    'accounts',
+    ttl=int(os.environ.get('ACCOUNT_LIST_TTL', '3600')),
+    stale_ttl=int(os.environ.get('ACCOUNT_LIST_STALE_TTL', '86400'))
+)
+
+# Account id -> (boto3 session arguments, expiry as epoch seconds)
+_credentials = {}
+_assume_flight = SingleFlight()
+
+def _call(service, operation, **params):
+    from cloud_assistant.scheduler import call
+    # STS and Organizations are always called as the Lambda's own role
+    with clients.use_account(None):
+        client = clients.get_client(service, ACCOUNTS_API_REGION)
+        return call(service, ACCOUNTS_API_REGION, getattr(client, operation), **params)
+
+def own_account_id():
+    """Id of the account the function runs in"""
+    return account_cache.get_or_load('own', lambda: _call('sts', 'get_caller_identity')['Account'])
+
+def _organization_accounts():
+    from cloud_assistant.scheduler import paginate
+    with clients.use_account(None):
+        organizations = clients.get_client('organizations', ACCOUNTS_API_REGION)
+        pages = paginate('organizations', ACCOUNTS_API_REGION, organizations.list_accounts)
+        return [
+            {'Id': account['Id'], 'Name': account.get('Name')}
+            for page in pages for account in page.get('Accounts', [])
+            if account.get('Status') == 'ACTIVE'
+        ]
+
+def list_accounts():
+    """[{'Id': ..., 'Name': ...}] of every configured account, or None when ACCOUNTS is empty"""
+    if not ACCOUNTS:
+        return None
+    if ACCOUNTS.lower() == 'organizations':
+        return account_cache.get_or_load('organization', _organization_accounts)
+    accounts = []
+    for item in ACCOUNTS.split(','):
+        account_id, _, name = item.strip().partition(':')
+        if account_id:
+            accounts.append({'Id': account_id, 'Name': name or None})
+    return accounts
+
+def select_accounts(selector=None):
+    """
+    Accounts an intent should look at: all configured accounts, or the one
+    whose id or name matches selector. None when multi-account scanning is off.
+    """
+    accounts = list_accounts()
+    if accounts is None or not selector or selector.lower() == 'all':
+        return accounts
+    wanted = selector.strip().lower()
+    matches = [a for a in accounts if a['Id'] == wanted or (a['Name'] or '').lower() == wanted]
+    if not matches:
+        raise UnknownAccountError(f"I don't know an account called {selector}")
+    return matches
+
+def account_label(account):
+    return f"{account['Name']} ({account['Id']})" if account.get('Name') else account['Id']
+
+def _assume(account_id):
+    # Another thread may have renewed the credentials while this one waited
+    cached = _credentials.get(account_id)
+    if cached and cached[1] - time.time() > CREDENTIAL_REFRESH_MARGIN:
+        return cached[0]
+    
+    params = {
+        'RoleArn': f"arn:aws:iam::{account_id}:role/{ACCOUNT_ROLE_NAME}",
+        'RoleSessionName': 'cloud-assistant',
+        'DurationSeconds': ASSUME_ROLE_DURATION
+    }
+    if ACCOUNT_ROLE_EXTERNAL_ID:
+        params['ExternalId'] = ACCOUNT_ROLE_EXTERNAL_ID
+    response = _call('sts', 'assume_role', **params)['Credentials']
+    credentials = {
+        'aws_access_key_id': response['AccessKeyId'],
+        'aws_secret_access_key': response['SecretAccessKey'],
+        'aws_session_token': response['SessionToken']
+    }
+    _credentials[account_id] = (credentials, response['Expiration'].timestamp())
+    if cached:
+        clients.release_credentials(cached[0])
+    return credentials
+
+def get_credentials(account_id):
+    """Credentials for an account (None for the function's own account), renewed shortly before expiry"""
+    if account_id == own_account_id():
+        return None
+    cached = _credentials.get(account_id)
+    if cached and cached[1] - time.time() > CREDENTIAL_REFRESH_MARGIN:
+        return cached[0]
+    return _assume_flight.do(account_id, lambda: _assume(account_id))
+
+def _scope(account_id, credentials):
+    # The own account keeps the unscoped caches, buckets and breakers
+    return clients.use_account(None if credentials is None else account_id, credentials)
+
+def scan(func, accounts, regions, context=None):
+    """
+    Run func(region) for every (account id, region) cell with that account's
+    credentials. regions is a list, or a function returning the regions of the
+    account it is called for. Returns (results, skipped, failed) like fan_out(),
+    keyed by (account id, region); accounts that could not be entered at all
+    appear with region None.
+    """
+    def enter(account_id):
+        credentials = get_credentials(account_id)
+        with _scope(account_id, credentials):
+            return credentials, regions() if callable(regions) else list(regions)
+    
+    # Resolved once up front rather than by every account worker at the same time
+    own_account_id()
+    account_ids = [account['Id'] for account in accounts]
+    entered, skipped_accounts, failed_accounts = fan_out(enter, account_ids, context, MAX_ACCOUNT_WORKERS)
+    
+    def run(cell):
+        account_id, region = cell
+        with _scope(account_id, entered[account_id][0]):
+            return func(region)
+    
+    cells = [(account_id, region) for account_id in account_ids if account_id in entered for region in entered[account_id][1]]
+    results, skipped, failed = fan_out(run, cells, context, MAX_ACCOUNT_WORKERS)
+    skipped = [(account_id, None) for account_id in skipped_accounts] + skipped
+    failed.update({(account_id, None): error for account_id, error in failed_accounts.items()})
+    return results, skipped, failed
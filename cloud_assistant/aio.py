@@ -0,0 +1,201 @@
+"""
+Asyncio execution path for AWS lookups
+
+With AWS_ASYNC=true the region, bucket and alarm sweeps behind
+ListEC2Instances, DescribeS3Buckets and CheckCloudWatchAlarms run as
+cooperative tasks on one event loop with non-blocking aiobotocore clients,
+instead of one thread (and one blocking boto3 call) per lookup. Handlers keep
+their synchronous interface: run() hands a coroutine to the container's loop
+thread, in the caller's context so clients.use_account() scopes carry over,
+and waits for its result until the invocation's deadline (plus
+AIO_RESULT_GRACE_MS, so a fan-out stopping at that deadline can still hand
+back its partial results). A coroutine still running then is cancelled.
+
+fan_out_async() is fan_out() for coroutines: at most MAX_ASYNC_TASKS lookups
+run at once, each is cancelled after AWS_TASK_TIMEOUT seconds, and whatever is
+still pending when the invocation's deadline passes is cancelled. Those count
+as skipped; a lookup that raises, including a network timeout, counts as failed.
+
+aiobotocore is only imported when the first async client is built. Clients
+honour AWS_ENDPOINT_URL like boto3 does, so the path can be pointed at a local
+HTTP stand-in; set_client_factory() swaps in any other aiobotocore-style client
+(async methods taking boto3 keyword arguments), e.g. benchmarks.standin.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+from cloud_assistant import clients
+from cloud_assistant.fanout import get_time_budget
+
+# Run AWS lookups on the asyncio path
+AWS_ASYNC = os.environ.get('AWS_ASYNC', 'false').lower() == 'true'
+
+# Longest a single lookup task may run before it is cancelled (seconds)
+AWS_TASK_TIMEOUT = float(os.environ.get('AWS_TASK_TIMEOUT', '10'))
+
+# Lookup tasks running at the same time in one fan-out
+MAX_ASYNC_TASKS = int(os.environ.get('MAX_ASYNC_TASKS', '100'))
+
+# Time (ms) run() keeps waiting past the deadline for a coroutine to return what it has
+AIO_RESULT_GRACE_MS = int(os.environ.get('AIO_RESULT_GRACE_MS', '250'))
+
+# Connections per async client; tasks are cheap, so this is the real concurrency limit per endpoint
+ASYNC_POOL_CONNECTIONS = int(os.environ.get('ASYNC_POOL_CONNECTIONS', '50'))
+
+_loop = None
+_loop_lock = threading.Lock()
+
+# Client creation tasks by (service, region, credentials key); only touched on the loop
+_clients = {}
+_client_factory = None
+_session = None
+_client_config = None
+
+class TaskTimeout(Exception):
+    """A lookup task cancelled after task_timeout"""
+
+def get_loop():
+    """The container's event loop, running on a daemon thread so clients outlive invocations"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='aws-async', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run(coro_fn, *args, context=None, **kwargs):
+    """
+    Run coro_fn(*args, **kwargs) on the container's loop and return its result.
+    context is the Lambda context whose deadline bounds the wait; it is not
+    passed to coro_fn. At the deadline the coroutine is cancelled and
+    TimeoutError raised.
+    """
+    # The task is created from a callback that runs in a copy of this thread's
+    # context, so account scopes and other context variables carry over
+    future = asyncio.run_coroutine_threadsafe(coro_fn(*args, **kwargs), get_loop())
+    budget = get_time_budget(context)
+    try:
+        return future.result(timeout=None if budget is None else budget + AIO_RESULT_GRACE_MS / 1000.0)
+    except concurrent.futures.TimeoutError:
+        # Cancelling the future cancels the task on the loop, releasing its connections
+        future.cancel()
+        raise TimeoutError("time limit reached before the AWS lookup finished") from None
+
+def set_client_factory(factory):
+    """
+    Build async clients with factory(service, region, credentials) instead of
+    aiobotocore (None restores aiobotocore)
+    """
+    global _client_factory
+    _client_factory = factory
+    if _loop is not None:
+        asyncio.run_coroutine_threadsafe(_close_clients(), _loop).result()
+
+async def _close_clients():
+    creations = list(_clients.values())
+    _clients.clear()
+    for creation in creations:
+        try:
+            client = await creation
+        except Exception:
+            continue
+        if hasattr(client, '__aexit__'):
+            await client.__aexit__(None, None, None)
+
+async def _create_client(service, region, credentials):
+    global _session, _client_config
+    if _client_factory is not None:
+        return _client_factory(service, region, credentials)
+    if _session is None:
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+        _session = get_session()
+        # Retries are left to the scheduler, as for the boto3 clients
+        _client_config = AioConfig(
+            max_pool_connections=ASYNC_POOL_CONNECTIONS,
+            connect_timeout=int(os.environ.get('AWS_CONNECT_TIMEOUT', '3')),
+            read_timeout=int(os.environ.get('AWS_READ_TIMEOUT', '10')),
+            retries={'max_attempts': 1, 'mode': 'standard'}
+        )
+    creator = _session.create_client(service, region_name=region, config=_client_config, **(credentials or {}))
+    return await creator.__aenter__()
+
+async def get_client(service, region=None):
+    """
+    Pooled async client for (service, region) with the current use_account()
+    credentials. Must be awaited on the container's loop.
+    """
+    region = region or os.environ.get('AWS_REGION') or 'us-east-1'
+    credentials = clients.current_credentials()
+    key = (service, region, clients._credentials_key(credentials))
+    creation = _clients.get(key)
+    if creation is None:
+        creation = asyncio.ensure_future(_create_client(service, region, credentials))
+        _clients[key] = creation
+    try:
+        return await asyncio.shield(creation)
+    except Exception:
+        if _clients.get(key) is creation:
+            del _clients[key]
+        raise
+
+async def fan_out_async(func, items, context=None, max_tasks=MAX_ASYNC_TASKS, task_timeout=AWS_TASK_TIMEOUT):
+    """
+    Await func(item) for every item as concurrent tasks. Returns (results,
+    skipped, failed) like fan_out(); tasks cancelled at the deadline or after
+    task_timeout count as skipped, and tasks whose call raised, including a
+    network asyncio.TimeoutError, count as failed.
+    """
+    results = {}
+    failed = {}
+    if not items:
+        return results, [], failed
+    
+    slots = asyncio.Semaphore(max_tasks)
+    
+    async def run_one(item):
+        async with slots:
+            # Not wait_for(): its TimeoutError could not be told apart from one raised by the call
+            call = asyncio.ensure_future(func(item))
+            try:
+                done, _ = await asyncio.wait({call}, timeout=task_timeout)
+            finally:
+                # Also reached when the fan-out deadline cancels this task
+                if not call.done():
+                    call.cancel()
+                    await asyncio.wait({call})
+            if not done:
+                raise TaskTimeout()
+            return call.result()
+    
+    tasks = {asyncio.ensure_future(run_one(item)): item for item in items}
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=get_time_budget(context))
+    except asyncio.CancelledError:
+        # run() gave up on the whole fan-out, so its lookups stop too
+        for task in tasks:
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+    if pending:
+        # Let cancelled tasks unwind so their connections go back to the pool
+        await asyncio.wait(pending)
+    
+    for task in done:
+        item = tasks[task]
+        if task.cancelled():
+            continue
+        error = task.exception()
+        if error is None:
+            results[item] = task.result()
+        elif not isinstance(error, TaskTimeout):
+            print(f"Error processing {item}: {str(error)}")
+            failed[item] = error
+    
+    skipped = [item for item in items if item not in results and item not in failed]
+    return results, skipped, failed
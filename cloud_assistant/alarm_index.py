@@ -0,0 +1,426 @@
+"""
+In-memory index of CloudWatch alarms (metric and composite) per region
+
+The first query in a region pages through every alarm once. After that the
+index is kept current incrementally:
+
+- alarm history (StateUpdate and ConfigurationUpdate items since the last
+  sync) is applied when the index is older than ALARM_INDEX_TTL,
+- "CloudWatch Alarm State Change" events delivered to the function through
+  EventBridge are applied as they arrive (see apply_event),
+- a full resync runs every ALARM_INDEX_FULL_SYNC_SECONDS to catch anything
+  history missed.
+
+Queries by state and namespace are set lookups, and name prefixes are a
+bisect over the sorted names, so "what's firing" does not scan 10k alarms.
+Syncs read AWS without holding the index lock: a full sync builds new indexes
+and swaps them in, replaying state changes that arrived while it ran, so
+queries and events are never held up by a slow sync.
+When several accounts are configured, each account has its own indexes.
+With AWS_ASYNC the regions are refreshed as tasks on the event loop (see
+cloud_assistant.aio).
+"""
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from cloud_assistant import accounts, aio
+from cloud_assistant.clients import current_account, get_client, use_account
+from cloud_assistant.fanout import fan_out
+from cloud_assistant.scheduler import RegionUnavailableError, paginate, paginate_async
+
+# Regions whose alarms are indexed (comma-separated, default: the function's region)
+ALARM_REGIONS = [
+    region.strip()
+    for region in os.environ.get('ALARM_REGIONS', os.environ.get('AWS_REGION', 'us-east-1')).split(',')
+    if region.strip()
+]
+
+# Seconds before an index is brought up to date from alarm history
+ALARM_INDEX_TTL = int(os.environ.get('ALARM_INDEX_TTL', '30'))
+
+# Seconds between full resyncs of a region
+ALARM_INDEX_FULL_SYNC_SECONDS = int(os.environ.get('ALARM_INDEX_FULL_SYNC_SECONDS', '3600'))
+
+# History is read from slightly before the last sync because it is eventually consistent
+HISTORY_OVERLAP = timedelta(seconds=60)
+
+# DescribeAlarms accepts at most 100 alarm names per call
+MAX_ALARM_NAMES_PER_CALL = 100
+
+def _namespaces(alarm):
+    """Namespaces a metric alarm watches, including those inside metric math"""
+    namespaces = set()
+    if alarm.get('Namespace'):
+        namespaces.add(alarm['Namespace'])
+    for query in alarm.get('Metrics', []):
+        namespace = query.get('MetricStat', {}).get('Metric', {}).get('Namespace')
+        if namespace:
+            namespaces.add(namespace)
+    return namespaces
+
+def _record(alarm, alarm_type, region):
+    return {
+        'Name': alarm['AlarmName'],
+        'Type': alarm_type,
+        'Region': region,
+        'State': alarm.get('StateValue'),
+        'Updated': alarm.get('StateUpdatedTimestamp'),
+        'Description': alarm.get('AlarmDescription'),
+        'Namespaces': sorted(_namespaces(alarm))
+    }
+
+def _insert(alarms, by_state, by_namespace, record):
+    alarms[record['Name']] = record
+    by_state.setdefault(record['State'], set()).add(record['Name'])
+    for namespace in record['Namespaces']:
+        by_namespace.setdefault(namespace, set()).add(record['Name'])
+
+def _parse_time(value):
+    # Event timestamps look like 2024-01-01T12:00:00.000+0000
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+class AlarmIndex:
+    """Alarms of one region with secondary indexes on state and namespace"""
+    
+    def __init__(self, region):
+        self.region = region
+        self.alarms = {}
+        self.by_state = {}
+        self.by_namespace = {}
+        self._sorted_names = None
+        self.synced_at = None
+        self.synced_monotonic = None
+        self.full_synced_monotonic = None
+        self._lock = threading.RLock()
+        # One sync at a time; held while reading AWS, unlike _lock
+        self._sync_lock = threading.Lock()
+        # State changes seen while a full sync is reading, replayed onto its result
+        self._changes_during_sync = None
+        # Sync running on the event loop, shared by concurrent refresh_async() callers
+        self._sync_task = None
+    
+    def _add(self, record):
+        self._remove(record['Name'])
+        _insert(self.alarms, self.by_state, self.by_namespace, record)
+        self._sorted_names = None
+    
+    def _remove(self, name):
+        record = self.alarms.pop(name, None)
+        if record is None:
+            return
+        self.by_state.get(record['State'], set()).discard(name)
+        for namespace in record['Namespaces']:
+            self.by_namespace.get(namespace, set()).discard(name)
+        self._sorted_names = None
+    
+    def set_state(self, name, state, updated):
+        """Apply a state change unless the index already holds a newer one; False if the alarm is unknown"""
+        with self._lock:
+            if self._changes_during_sync is not None:
+                self._changes_during_sync.append((name, state, updated))
+            record = self.alarms.get(name)
+            if record is None:
+                return False
+            if record['Updated'] is not None and updated is not None and updated < record['Updated']:
+                return True
+            self.by_state.get(record['State'], set()).discard(name)
+            record['State'] = state
+            record['Updated'] = updated
+            self.by_state.setdefault(state, set()).add(name)
+            return True
+    
+    def _records(self, page):
+        for alarm in page.get('MetricAlarms', []):
+            yield _record(alarm, 'metric', self.region)
+        for alarm in page.get('CompositeAlarms', []):
+            yield _record(alarm, 'composite', self.region)
+    
+    def _describe(self, **params):
+        cloudwatch = get_client('cloudwatch', self.region)
+        pages = paginate(
+            'cloudwatch', self.region, cloudwatch.describe_alarms,
+            AlarmTypes=['MetricAlarm', 'CompositeAlarm'], MaxRecords=100, **params
+        )
+        for page in pages:
+            yield from self._records(page)
+    
+    async def _describe_async(self, **params):
+        cloudwatch = await aio.get_client('cloudwatch', self.region)
+        pages = paginate_async(
+            'cloudwatch', self.region, cloudwatch.describe_alarms,
+            AlarmTypes=['MetricAlarm', 'CompositeAlarm'], MaxRecords=100, **params
+        )
+        return [record async for page in pages for record in self._records(page)]
+    
+    def _start_full_sync(self):
+        with self._lock:
+            self._changes_during_sync = []
+    
+    def _replace(self, records, started):
+        """Swap in indexes built from records, then replay changes that arrived meanwhile"""
+        alarms = {}
+        by_state = {}
+        by_namespace = {}
+        for record in records:
+            _insert(alarms, by_state, by_namespace, record)
+        with self._lock:
+            changes = self._changes_during_sync or []
+            self._changes_during_sync = None
+            self.alarms = alarms
+            self.by_state = by_state
+            self.by_namespace = by_namespace
+            self._sorted_names = None
+            for name, state, updated in changes:
+                self.set_state(name, state, updated)
+            self.synced_at = started
+            self.synced_monotonic = time.monotonic()
+            self.full_synced_monotonic = self.synced_monotonic
+        print(f"Alarm index {self.region}: full sync of {len(records)} alarms")
+    
+    def full_sync(self):
+        """Replace the index with every alarm in the region"""
+        started = datetime.now(timezone.utc)
+        self._start_full_sync()
+        try:
+            records = list(self._describe())
+        except Exception:
+            with self._lock:
+                self._changes_during_sync = None
+            raise
+        self._replace(records, started)
+    
+    def _apply_reload(self, batch, records):
+        by_name = {record['Name']: record for record in records}
+        with self._lock:
+            for name in batch:
+                if name in by_name:
+                    self._add(by_name[name])
+                else:
+                    self._remove(name)
+    
+    def _reload(self, names):
+        """Re-read alarms whose configuration changed; names that no longer exist are dropped"""
+        names = sorted(names)
+        for start in range(0, len(names), MAX_ALARM_NAMES_PER_CALL):
+            batch = names[start:start + MAX_ALARM_NAMES_PER_CALL]
+            self._apply_reload(batch, self._describe(AlarmNames=batch))
+    
+    def _history_params(self, item_type, started):
+        return {
+            'AlarmTypes': ['MetricAlarm', 'CompositeAlarm'],
+            'HistoryItemType': item_type,
+            'StartDate': self.synced_at - HISTORY_OVERLAP,
+            'EndDate': started,
+            'ScanBy': 'TimestampAscending',
+            'MaxRecords': 100
+        }
+    
+    def _apply_history(self, item_type, page, changed):
+        """Apply a history page's state changes; alarms to re-read are added to changed"""
+        for item in page.get('AlarmHistoryItems', []):
+            if item_type == 'ConfigurationUpdate':
+                changed.add(item['AlarmName'])
+                continue
+            new_state = json.loads(item.get('HistoryData') or '{}').get('newState', {}).get('stateValue')
+            if new_state and not self.set_state(item['AlarmName'], new_state, item.get('Timestamp')):
+                changed.add(item['AlarmName'])
+    
+    def _mark_synced(self, started):
+        with self._lock:
+            self.synced_at = started
+            self.synced_monotonic = time.monotonic()
+    
+    def incremental_sync(self):
+        """Apply alarm history recorded since the last sync"""
+        started = datetime.now(timezone.utc)
+        cloudwatch = get_client('cloudwatch', self.region)
+        changed = set()
+        for item_type in ('StateUpdate', 'ConfigurationUpdate'):
+            pages = paginate(
+                'cloudwatch', self.region, cloudwatch.describe_alarm_history,
+                **self._history_params(item_type, started)
+            )
+            for page in pages:
+                self._apply_history(item_type, page, changed)
+        if changed:
+            self._reload(changed)
+        self._mark_synced(started)
+    
+    def _sync_due(self):
+        """'full', 'incremental' or None, depending on how old the index is"""
+        now = time.monotonic()
+        if self.full_synced_monotonic is None or now - self.full_synced_monotonic > ALARM_INDEX_FULL_SYNC_SECONDS:
+            return 'full'
+        if now - self.synced_monotonic > ALARM_INDEX_TTL:
+            return 'incremental'
+        return None
+    
+    def refresh(self):
+        """Bring the index up to date if it is older than its TTL"""
+        with self._sync_lock:
+            due = self._sync_due()
+            if due == 'full':
+                self.full_sync()
+            elif due == 'incremental':
+                self.incremental_sync()
+        return self
+    
+    async def _sync_async(self, due):
+        started = datetime.now(timezone.utc)
+        if due == 'full':
+            self._start_full_sync()
+            try:
+                records = await self._describe_async()
+            except BaseException:
+                with self._lock:
+                    self._changes_during_sync = None
+                raise
+            self._replace(records, started)
+            return
+        
+        cloudwatch = await aio.get_client('cloudwatch', self.region)
+        changed = set()
+        for item_type in ('StateUpdate', 'ConfigurationUpdate'):
+            pages = paginate_async(
+                'cloudwatch', self.region, cloudwatch.describe_alarm_history,
+                **self._history_params(item_type, started)
+            )
+            async for page in pages:
+                self._apply_history(item_type, page, changed)
+        names = sorted(changed)
+        for start in range(0, len(names), MAX_ALARM_NAMES_PER_CALL):
+            batch = names[start:start + MAX_ALARM_NAMES_PER_CALL]
+            self._apply_reload(batch, await self._describe_async(AlarmNames=batch))
+        self._mark_synced(started)
+    
+    async def refresh_async(self):
+        """
+        refresh() on the event loop. Concurrent callers await the same sync, and
+        a caller that is cancelled does not cancel it for the others.
+        """
+        if self._sync_task is None:
+            due = self._sync_due()
+            if due is None:
+                return self
+            self._sync_task = asyncio.ensure_future(self._sync_async(due))
+            self._sync_task.add_done_callback(self._sync_finished)
+        await asyncio.shield(self._sync_task)
+        return self
+    
+    def _sync_finished(self, task):
+        self._sync_task = None
+        # Errors reach the callers still waiting; retrieve them in case none are left
+        if not task.cancelled():
+            task.exception()
+    
+    def query(self, state=None, name_prefix=None, namespace=None):
+        """Records matching every given filter"""
+        with self._lock:
+            candidates = None
+            if state is not None:
+                candidates = set(self.by_state.get(state, ()))
+            if namespace is not None:
+                matches = self.by_namespace.get(namespace, set())
+                candidates = set(matches) if candidates is None else candidates & matches
+            if name_prefix:
+                if self._sorted_names is None:
+                    self._sorted_names = sorted(self.alarms)
+                start = bisect.bisect_left(self._sorted_names, name_prefix)
+                end = bisect.bisect_left(self._sorted_names, name_prefix + '\uffff')
+                matches = set(self._sorted_names[start:end])
+                candidates = matches if candidates is None else candidates & matches
+            if candidates is None:
+                return list(self.alarms.values())
+            return [self.alarms[name] for name in candidates]
+
+# One index per (account, region), shared across warm invocations
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(region):
+    """Index of a region in the current use_account() scope"""
+    key = (current_account(), region)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = AlarmIndex(region)
+        return _indexes[key]
+
+def clear_indexes():
+    """Forget every index so the next query starts with a full sync"""
+    with _indexes_lock:
+        _indexes.clear()
+
+def query_alarms(state=None, name_prefix=None, namespace=None, regions=None, context=None, account_list=None):
+    """
+    Matching alarms across regions, most recently updated first. Returns
+    (alarms, failed) where failed maps regions that could not be refreshed to
+    their exception, including those that ran out of time.
+    
+    With account_list (see accounts.select_accounts) every account's regions
+    are queried; the records are copies with an 'Account' id and failed is
+    keyed by 'account/region'.
+    """
+    regions = regions or ALARM_REGIONS
+    if account_list is not None:
+        return _query_accounts(state, name_prefix, namespace, regions, context, account_list)
+    if aio.AWS_ASYNC:
+        indexes, skipped, failed = aio.run(
+            aio.fan_out_async, lambda region: get_index(region).refresh_async(), regions, context, context=context
+        )
+    else:
+        indexes, skipped, failed = fan_out(lambda region: get_index(region).refresh(), regions, context)
+    for region in skipped:
+        failed[region] = RegionUnavailableError('cloudwatch', region, "time limit reached")
+    
+    alarms = []
+    for region in regions:
+        if region in indexes:
+            alarms.extend(indexes[region].query(state, name_prefix, namespace))
+    return _newest_first(alarms), failed
+
+def _query_accounts(state, name_prefix, namespace, regions, context, account_list):
+    results, skipped, failed = accounts.scan(
+        lambda region: get_index(region).refresh().query(state, name_prefix, namespace),
+        account_list,
+        regions,
+        context
+    )
+    alarms = []
+    for (account_id, region), records in results.items():
+        alarms.extend(dict(record, Account=account_id) for record in records)
+    failed = {f"{account_id}/{region or '*'}": error for (account_id, region), error in failed.items()}
+    for account_id, region in skipped:
+        failed[f"{account_id}/{region or '*'}"] = RegionUnavailableError('cloudwatch', region or '*', "time limit reached")
+    return _newest_first(alarms), failed
+
+def _newest_first(alarms):
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    alarms.sort(key=lambda alarm: alarm['Updated'] or epoch, reverse=True)
+    return alarms
+
+def apply_event(event):
+    """
+    Apply an EventBridge "CloudWatch Alarm State Change" event to the index of
+    its region. Returns True if the event was applied; alarms the index does
+    not know yet are picked up by the next sync.
+    """
+    if event.get('detail-type') != 'CloudWatch Alarm State Change':
+        return False
+    # Events forwarded from member accounts update that account's index
+    account_id = event.get('account')
+    if not accounts.ACCOUNTS or account_id == accounts.own_account_id():
+        account_id = None
+    with use_account(account_id):
+        index = get_index(event.get('region'))
+    if index.synced_at is None:
+        return False
+    detail = event['detail']
+    state = detail.get('state', {})
+    return index.set_state(detail['alarmName'], state.get('value'), _parse_time(state['timestamp']))
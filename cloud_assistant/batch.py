@@ -0,0 +1,223 @@
+"""
+Batched fulfilment: many Lex-shaped requests in one invocation
+
+Dashboards and scheduled reports ask the same questions in bulk. Instead of one
+invocation per question, they can send a batch in any of these shapes:
+
+    SQS event              {'Records': [{'messageId': ..., 'body': <Lex event JSON>}]}
+    AppSync batch resolver [{'arguments': {'request': <Lex event>}, ...}, ...]
+    direct invocation      {'requests': [{'id': ..., 'request': <Lex event>}, ...]}
+
+Identical read-only requests (same intent and slots) are fulfilled once and the
+answer is copied to every caller with its own session attributes. Distinct
+requests run side by side on the pooled clients and share the inventory, alarm
+and bucket caches, whose concurrent misses load only once, so two questions
+about the same regions cost one sweep. Each request sees a deadline
+BATCH_ITEM_MARGIN_MS earlier than the batch, so its own region fan-out returns
+a partial answer before the batch gives up on it. A request that fails or runs
+out of time only fails its own item:
+
+- SQS: failed message ids are returned as batchItemFailures, so only those
+  are retried; answers go to BATCH_RESULT_QUEUE when one is configured.
+  A message that is not a Lex request will never succeed, so it is answered
+  with {'requestId': ..., 'error': ...} (and logged) instead of being retried
+- AppSync: a list in request order of {'data': response} or
+  {'data': None, 'errorType': ..., 'errorMessage': ...}
+- direct: {'responses': [{'id': ..., 'response': ...} or {'id': ..., 'error': ...}]};
+  ids must be unique within the batch
+"""
+import json
+import os
+
+from cloud_assistant.coalesce import request_key
+from cloud_assistant.fanout import fan_out
+from cloud_assistant.pages import with_caller_session
+
+# Distinct requests fulfilled at the same time
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '16'))
+
+# Time (ms) a request's own deadline leaves the batch to collect its answer
+BATCH_ITEM_MARGIN_MS = int(os.environ.get('BATCH_ITEM_MARGIN_MS', '500'))
+
+# SQS queue URL that receives {'requestId': ..., 'response' or 'error': ...} for SQS batches; empty drops answers
+BATCH_RESULT_QUEUE = os.environ.get('BATCH_RESULT_QUEUE', '')
+
+# SendMessageBatch accepts at most 10 messages per call
+MAX_MESSAGES_PER_CALL = 10
+
+class BatchItemError(Exception):
+    """A batch item that is not a Lex request or was not fulfilled in time"""
+
+class ItemContext:
+    """Lambda context for one batch request, with a deadline margin_ms earlier"""
+    
+    def __init__(self, context, margin_ms):
+        self._context = context
+        self._margin_ms = margin_ms
+    
+    def get_remaining_time_in_millis(self):
+        return max(self._context.get_remaining_time_in_millis() - self._margin_ms, 0)
+    
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+def _lex_request(value):
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, dict) or not value.get('sessionState', {}).get('intent', {}).get('name'):
+        raise BatchItemError("not a Lex fulfilment request")
+    return value
+
+def _parse(event):
+    """(shape, [(item id, Lex event or BatchItemError)]) for a batch event"""
+    if isinstance(event, list):
+        shape = 'appsync'
+        # A non-dict item is passed through as is and rejected on its own by _lex_request()
+        raw = [
+            (str(index), (item.get('arguments') or {}).get('request', item) if isinstance(item, dict) else item)
+            for index, item in enumerate(event)
+        ]
+    elif 'Records' in event:
+        shape = 'sqs'
+        raw = []
+        for index, record in enumerate(event['Records']):
+            if record.get('eventSource') != 'aws:sqs':
+                raise ValueError(f"Unsupported batch record source: {record.get('eventSource')}")
+            if not record.get('messageId'):
+                # Without a message id the record cannot be retried, only rejected
+                raw.append((f"record-{index}", BatchItemError("SQS record has no messageId")))
+                continue
+            raw.append((record['messageId'], record.get('body')))
+    else:
+        shape = 'direct'
+        raw = [
+            (str(item.get('id', index)), item.get('request', item)) if isinstance(item, dict) else (str(index), item)
+            for index, item in enumerate(event['requests'])
+        ]
+        # Answers are matched to requests by id, so an id may appear only once
+        ids = [item_id for item_id, _ in raw]
+        duplicates = sorted({item_id for item_id in ids if ids.count(item_id) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate request ids in batch: {', '.join(duplicates)}")
+    
+    items = []
+    for item_id, value in raw:
+        if isinstance(value, BatchItemError):
+            items.append((item_id, value))
+            continue
+        try:
+            items.append((item_id, _lex_request(value)))
+        except BatchItemError as e:
+            items.append((item_id, e))
+        except ValueError as e:
+            items.append((item_id, BatchItemError(f"request body is not valid JSON: {str(e)}")))
+    return shape, items
+
+def _group_key(index, request, shared_intents):
+    # Only read-only intents may share an answer; others depend on session state
+    if request['sessionState']['intent']['name'] in shared_intents:
+        return request_key(request)
+    return f"item:{index}"
+
+def fulfil_all(items, context, fulfil, shared_intents):
+    """
+    {item id: Lex response or exception} for [(item id, Lex event)], fulfilling
+    each distinct request once
+    """
+    groups = {}
+    for index, (item_id, request) in enumerate(items):
+        groups.setdefault(_group_key(index, request, shared_intents), []).append((item_id, request))
+    
+    # Each group is answered for its first request and copied to the rest
+    keys = list(groups)
+    item_context = ItemContext(context, BATCH_ITEM_MARGIN_MS) if hasattr(context, 'get_remaining_time_in_millis') else context
+    results, skipped, failed = fan_out(
+        lambda key: fulfil(groups[key][0][1], item_context),
+        keys,
+        context,
+        max_workers=BATCH_MAX_WORKERS
+    )
+    
+    outcomes = {}
+    for key, members in groups.items():
+        for item_id, request in members:
+            if key in results:
+                outcomes[item_id] = with_caller_session(request, results[key]) if len(members) > 1 else results[key]
+            elif key in failed:
+                outcomes[item_id] = failed[key]
+            else:
+                outcomes[item_id] = BatchItemError("time limit reached before this request was fulfilled")
+    return outcomes, len(keys)
+
+def _answer(item_id, response):
+    if isinstance(response, Exception):
+        return {'requestId': item_id, 'error': str(response)}
+    return {'requestId': item_id, 'response': response}
+
+def _send_results(answers):
+    """Send SQS answers to BATCH_RESULT_QUEUE; returns the ids that could not be sent"""
+    from cloud_assistant.clients import get_client
+    from cloud_assistant.scheduler import call
+    
+    sqs = get_client('sqs')
+    region = sqs.meta.region_name
+    unsent = []
+    for start in range(0, len(answers), MAX_MESSAGES_PER_CALL):
+        chunk = answers[start:start + MAX_MESSAGES_PER_CALL]
+        entries = [
+            {'Id': str(index), 'MessageBody': json.dumps(_answer(item_id, response), default=str)}
+            for index, (item_id, response) in enumerate(chunk)
+        ]
+        try:
+            sent = call('sqs', region, sqs.send_message_batch, QueueUrl=BATCH_RESULT_QUEUE, Entries=entries)
+            unsent.extend(chunk[int(entry['Id'])][0] for entry in sent.get('Failed', []))
+        except Exception as e:
+            print(f"Error sending batch results: {str(e)}")
+            unsent.extend(item_id for item_id, _ in chunk)
+    return unsent
+
+def handle_batch(event, context, fulfil, shared_intents):
+    """
+    Fulfil every request of a batch event with fulfil(lex_event, context).
+    Returns (result in the shape the batch source expects, stats for metrics).
+    """
+    shape, items = _parse(event)
+    requests = [(item_id, value) for item_id, value in items if not isinstance(value, BatchItemError)]
+    outcomes, distinct = fulfil_all(requests, context, fulfil, shared_intents)
+    rejected = {item_id: value for item_id, value in items if isinstance(value, BatchItemError)}
+    outcomes.update(rejected)
+    
+    failed_ids = [item_id for item_id, _ in items if isinstance(outcomes[item_id], Exception)]
+    for item_id in failed_ids:
+        print(f"Batch item {item_id} failed: {str(outcomes[item_id])}")
+    
+    if shape == 'sqs':
+        # Malformed messages are answered with their error; only fulfilment failures are retried
+        retried = [item_id for item_id in failed_ids if item_id not in rejected]
+        answers = [(item_id, outcomes[item_id]) for item_id, _ in items if item_id not in retried]
+        if BATCH_RESULT_QUEUE and answers:
+            unsent = _send_results(answers)
+            # A malformed message is acknowledged even when its reply is lost; retrying it cannot help
+            for item_id in unsent:
+                if item_id in rejected:
+                    print(f"Batch item {item_id} was rejected and its reply could not be sent")
+                else:
+                    retried.append(item_id)
+        result = {'batchItemFailures': [{'itemIdentifier': item_id} for item_id in retried]}
+    elif shape == 'appsync':
+        result = [
+            {'data': None, 'errorType': type(outcomes[item_id]).__name__, 'errorMessage': str(outcomes[item_id])}
+            if isinstance(outcomes[item_id], Exception) else {'data': outcomes[item_id]}
+            for item_id, _ in items
+        ]
+    else:
+        result = {
+            'responses': [
+                {'id': item_id, 'error': str(outcomes[item_id])}
+                if isinstance(outcomes[item_id], Exception) else {'id': item_id, 'response': outcomes[item_id]}
+                for item_id, _ in items
+            ]
+        }
+    
+    stats = {'BatchSize': len(items), 'DistinctRequests': distinct, 'FailedItems': len(failed_ids)}
+    return result, stats
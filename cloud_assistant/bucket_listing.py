@@ -0,0 +1,304 @@
+"""
+Enriched S3 bucket listing: region, public access and size for every bucket
+
+Per-bucket lookups (region, policy status) run concurrently with bounded
+parallelism and are cached per bucket. Sizes are not fetched bucket by bucket:
+each region's BucketSizeBytes series are enumerated with ListMetrics and read
+with batched GetMetricData calls (up to 500 series per call), also cached.
+Several accounts are listed with list_buckets_across_accounts(), and
+list_buckets_enriched_async() does the same lookups as tasks on the asyncio path.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from cloud_assistant import accounts, aio
+from cloud_assistant.bucket_stats import format_bytes
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.clients import get_client
+from cloud_assistant.fanout import fan_out
+from cloud_assistant.scheduler import call, call_async, error_code, paginate, paginate_async
+
+# Concurrent per-bucket lookups
+BUCKET_ENRICH_WORKERS = int(os.environ.get('BUCKET_ENRICH_WORKERS', '32'))
+
+# Largest buckets listed in a response, keeping it within Lex message limits
+MAX_BUCKETS_LISTED = int(os.environ.get('MAX_BUCKETS_LISTED', '10'))
+
+# GetMetricData accepts at most 500 queries per call
+METRIC_QUERIES_PER_CALL = 500
+
+bucket_details_cache = TTLCache(
+    'bucket-details',
+    ttl=int(os.environ.get('BUCKET_DETAILS_CACHE_TTL', '900')),
+    stale_ttl=int(os.environ.get('BUCKET_DETAILS_CACHE_STALE_TTL', '3600')),
+    max_entries=int(os.environ.get('BUCKET_DETAILS_CACHE_SIZE', '5000'))
+)
+region_sizes_cache = TTLCache(
+    'bucket-sizes',
+    ttl=int(os.environ.get('BUCKET_STATS_CACHE_TTL', '3600')),
+    stale_ttl=int(os.environ.get('BUCKET_STATS_CACHE_STALE_TTL', '86400'))
+)
+
+# Size classes shown in the overview, smallest first: (label, upper bound in bytes).
+# CloudWatch reports no size for an empty bucket, so empty buckets are 'unknown'.
+SIZE_CLASSES = [
+    ('under 1 GB', 1024 ** 3),
+    ('1 GB - 1 TB', 1024 ** 4),
+    ('over 1 TB', None),
+]
+
+def size_class(size):
+    """Label of the size class a byte count falls into ('unknown' for None)"""
+    if size is None:
+        return 'unknown'
+    for label, upper in SIZE_CLASSES:
+        if upper is None or size < upper:
+            return label
+
+def _normalise_region(location_constraint):
+    # Buckets in us-east-1 report no constraint; very old EU buckets report 'EU'
+    if not location_constraint:
+        return 'us-east-1'
+    if location_constraint == 'EU':
+        return 'eu-west-1'
+    return location_constraint
+
+def _load_bucket_details(bucket):
+    """Region and public-access status of one bucket"""
+    # ListBuckets reports BucketRegion in current API versions, saving a call per bucket
+    region = bucket.get('BucketRegion')
+    if not region:
+        s3 = get_client('s3')
+        location = call('s3', s3.meta.region_name, s3.get_bucket_location, Bucket=bucket['Name'])
+        region = _normalise_region(location.get('LocationConstraint'))
+    
+    regional_s3 = get_client('s3', region)
+    try:
+        policy = call('s3', region, regional_s3.get_bucket_policy_status, Bucket=bucket['Name'])
+        is_public = policy.get('PolicyStatus', {}).get('IsPublic', False)
+    except Exception as e:
+        is_public = _public_on_error(e)
+    
+    return {'Region': region, 'IsPublic': is_public}
+
+async def _load_bucket_details_async(bucket):
+    """_load_bucket_details() on the asyncio path"""
+    region = bucket.get('BucketRegion')
+    if not region:
+        s3 = await aio.get_client('s3')
+        location = await call_async('s3', s3.meta.region_name, s3.get_bucket_location, Bucket=bucket['Name'])
+        region = _normalise_region(location.get('LocationConstraint'))
+    
+    regional_s3 = await aio.get_client('s3', region)
+    try:
+        policy = await call_async('s3', region, regional_s3.get_bucket_policy_status, Bucket=bucket['Name'])
+        is_public = policy.get('PolicyStatus', {}).get('IsPublic', False)
+    except Exception as e:
+        is_public = _public_on_error(e)
+    
+    return {'Region': region, 'IsPublic': is_public}
+
+def _public_on_error(error):
+    # No bucket policy means the policy cannot make the bucket public
+    return False if error_code(error) == 'NoSuchBucketPolicy' else None
+
+def get_bucket_details(bucket):
+    return bucket_details_cache.get_or_load(bucket['Name'], lambda: _load_bucket_details(bucket))
+
+async def get_bucket_details_async(bucket):
+    return await bucket_details_cache.get_or_load_async(bucket['Name'], lambda: _load_bucket_details_async(bucket))
+
+def _load_region_sizes(region):
+    """{bucket name: total bytes over all storage types} for buckets in a region"""
+    cloudwatch = get_client('cloudwatch', region)
+    series = []
+    pages = paginate(
+        'cloudwatch', region, cloudwatch.list_metrics,
+        Namespace='AWS/S3', MetricName='BucketSizeBytes'
+    )
+    for page in pages:
+        series.extend(_bucket_series(page))
+    
+    sizes = {}
+    for batch, params in _size_queries(series):
+        for page in paginate('cloudwatch', region, cloudwatch.get_metric_data, **params):
+            _add_sizes(sizes, batch, page)
+    return {name: int(sum(by_series.values())) for name, by_series in sizes.items()}
+
+async def _load_region_sizes_async(region):
+    """_load_region_sizes() on the asyncio path"""
+    cloudwatch = await aio.get_client('cloudwatch', region)
+    series = []
+    pages = paginate_async(
+        'cloudwatch', region, cloudwatch.list_metrics,
+        Namespace='AWS/S3', MetricName='BucketSizeBytes'
+    )
+    async for page in pages:
+        series.extend(_bucket_series(page))
+    
+    sizes = {}
+    for batch, params in _size_queries(series):
+        async for page in paginate_async('cloudwatch', region, cloudwatch.get_metric_data, **params):
+            _add_sizes(sizes, batch, page)
+    return {name: int(sum(by_series.values())) for name, by_series in sizes.items()}
+
+def _bucket_series(page):
+    """Per-bucket series of a ListMetrics page"""
+    return [
+        metric for metric in page.get('Metrics', [])
+        if any(d['Name'] == 'BucketName' for d in metric.get('Dimensions', []))
+    ]
+
+def _size_queries(series):
+    """(series batch, GetMetricData arguments) for every METRIC_QUERIES_PER_CALL series"""
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(series), METRIC_QUERIES_PER_CALL):
+        batch = series[start:start + METRIC_QUERIES_PER_CALL]
+        queries = [
+            {
+                'Id': f"m{index}",
+                'MetricStat': {'Metric': metric, 'Period': 86400, 'Stat': 'Average'},
+                'ReturnData': True
+            }
+            for index, metric in enumerate(batch)
+        ]
+        yield batch, {
+            'MetricDataQueries': queries,
+            'StartTime': now - timedelta(days=3),
+            'EndTime': now,
+            'ScanBy': 'TimestampDescending'
+        }
+
+def _add_sizes(sizes, batch, page):
+    """Merge a GetMetricData page into {bucket name: {query id: bytes}}"""
+    for result in page.get('MetricDataResults', []):
+        if not result.get('Values'):
+            continue
+        metric = batch[int(result['Id'][1:])]
+        bucket_name = next(d['Value'] for d in metric['Dimensions'] if d['Name'] == 'BucketName')
+        # Values are newest first; a series split over pages keeps its first (latest) value
+        sizes.setdefault(bucket_name, {}).setdefault(result['Id'], result['Values'][0])
+
+def get_region_sizes(region):
+    return region_sizes_cache.get_or_load(region, lambda: _load_region_sizes(region))
+
+async def get_region_sizes_async(region):
+    return await region_sizes_cache.get_or_load_async(region, lambda: _load_region_sizes_async(region))
+
+def list_buckets_enriched(context=None):
+    """
+    Every bucket with Name, CreationDate, Region, IsPublic (True/False/None) and
+    Size (bytes or None). Buckets whose lookups did not finish in time keep
+    Region/IsPublic as None and are counted in the returned 'pending' number.
+    """
+    s3 = get_client('s3')
+    buckets = call('s3', s3.meta.region_name, s3.list_buckets).get('Buckets', [])
+    
+    by_name = {bucket['Name']: bucket for bucket in buckets}
+    details, skipped, failed = fan_out(
+        lambda name: get_bucket_details(by_name[name]),
+        list(by_name),
+        context,
+        max_workers=BUCKET_ENRICH_WORKERS
+    )
+    
+    regions = sorted({d['Region'] for d in details.values()})
+    region_sizes, _, _ = fan_out(get_region_sizes, regions, context)
+    return _enrich(buckets, details, region_sizes), len(skipped) + len(failed)
+
+async def list_buckets_enriched_async(context=None):
+    """list_buckets_enriched() with every lookup a task on the event loop"""
+    s3 = await aio.get_client('s3')
+    buckets = (await call_async('s3', s3.meta.region_name, s3.list_buckets)).get('Buckets', [])
+    
+    by_name = {bucket['Name']: bucket for bucket in buckets}
+    details, skipped, failed = await aio.fan_out_async(
+        lambda name: get_bucket_details_async(by_name[name]),
+        list(by_name),
+        context
+    )
+    
+    regions = sorted({d['Region'] for d in details.values()})
+    region_sizes, _, _ = await aio.fan_out_async(get_region_sizes_async, regions, context)
+    return _enrich(buckets, details, region_sizes), len(skipped) + len(failed)
+
+def _enrich(buckets, details, region_sizes):
+    enriched = []
+    for bucket in buckets:
+        detail = details.get(bucket['Name'], {})
+        region = detail.get('Region')
+        enriched.append({
+            'Name': bucket['Name'],
+            'CreationDate': bucket.get('CreationDate'),
+            'Region': region,
+            'IsPublic': detail.get('IsPublic'),
+            'Size': region_sizes.get(region, {}).get(bucket['Name']) if region in region_sizes else None
+        })
+    return enriched
+
+def list_buckets_across_accounts(account_list, context=None):
+    """
+    list_buckets_enriched() for every account, with an 'Account' id on each
+    bucket. Returns (buckets, pending, failed) where failed maps accounts that
+    could not be listed (or ran out of time) to their exception or None.
+    """
+    # S3 listings are global, so each account is a single cell of the matrix
+    results, skipped, failed = accounts.scan(
+        lambda region: list_buckets_enriched(context),
+        account_list,
+        ['global'],
+        context
+    )
+    buckets = []
+    pending = 0
+    for account in account_list:
+        account_buckets, account_pending = results.get((account['Id'], 'global'), ([], 0))
+        buckets.extend(dict(bucket, Account=account['Id']) for bucket in account_buckets)
+        pending += account_pending
+    failed = {account_id: error for (account_id, _), error in failed.items()}
+    failed.update({account_id: None for account_id, _ in skipped})
+    return buckets, pending, failed
+
+def describe_bucket_overview(buckets, pending, limit=MAX_BUCKETS_LISTED, account_list=None):
+    """Response text: totals, size classes and the largest `limit` buckets"""
+    content = f"You have {len(buckets)} S3 buckets"
+    regions = {b['Region'] for b in buckets if b['Region']}
+    if regions:
+        content += f" across {len(regions)} regions"
+    if account_list:
+        content += f" in {len(account_list)} account{'s' if len(account_list) != 1 else ''}"
+    content += ".\n\n"
+    
+    if account_list:
+        counts = {}
+        for bucket in buckets:
+            counts[bucket['Account']] = counts.get(bucket['Account'], 0) + 1
+        content += "By account: " + ", ".join(
+            f"{accounts.account_label(a)}: {counts[a['Id']]}" for a in account_list if a['Id'] in counts
+        ) + "\n"
+    
+    public = [b for b in buckets if b['IsPublic']]
+    if public:
+        content += f"Publicly accessible: {len(public)} ({', '.join(b['Name'] for b in public[:5])}{', ...' if len(public) > 5 else ''})\n"
+    else:
+        content += "Publicly accessible: none\n"
+    
+    classes = {}
+    for bucket in buckets:
+        label = size_class(bucket['Size'])
+        classes[label] = classes.get(label, 0) + 1
+    ordered = [label for label, _ in SIZE_CLASSES] + ['unknown']
+    content += "By size: " + ", ".join(f"{classes[label]} {label}" for label in ordered if label in classes) + "\n\n"
+    
+    largest = sorted(buckets, key=lambda b: (b['Size'] is not None, b['Size'] or 0), reverse=True)[:limit]
+    content += f"Largest {len(largest)} buckets:\n" if len(buckets) > limit else "Buckets by size:\n"
+    for i, bucket in enumerate(largest):
+        size = format_bytes(bucket['Size']) if bucket['Size'] is not None else 'size unknown'
+        public_label = {True: ', public', False: '', None: ', access unknown'}[bucket['IsPublic']]
+        account_label = f"{bucket['Account']}, " if 'Account' in bucket else ""
+        content += f"{i+1}. {bucket['Name']} ({account_label}{bucket['Region'] or 'region unknown'}, {size}{public_label})\n"
+    if len(buckets) > limit:
+        content += f"...and {len(buckets) - limit} more buckets\n"
+    if pending:
+        content += f"\nDetails for {pending} buckets were still loading; ask again in a moment for the full picture.\n"
+    return content
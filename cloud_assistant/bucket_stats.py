@@ -0,0 +1,347 @@
+"""
+Object count and total size for S3 buckets without scanning every object
+
+Sources, cheapest first:
+
+1. CloudWatch daily storage metrics (NumberOfObjects, BucketSizeBytes summed
+   over storage types): one GetMetricData call, figures up to a day old.
+2. The latest CSV S3 Inventory report: rows are streamed from the gzipped data
+   files within a time budget, and the totals are extrapolated from the share
+   of the report read when the budget runs out.
+3. A live listing, split into key ranges (StartAfter) that are counted
+   concurrently, so flat buckets are listed in parallel too. Only running
+   totals and at most LIVE_COUNT_MAX_RANGES pending ranges are held. It is
+   used when an exact count is requested or no other source has data, and is
+   marked as an estimate if it stops at the deadline.
+
+Buckets with neither metrics nor an inventory are remembered for
+BUCKET_STATS_NEGATIVE_TTL seconds only, so statistics show up soon after
+CloudWatch starts reporting them.
+
+Every result is a dict:
+
+    {'objects': int, 'bytes': int or None, 'source': str, 'exact': bool,
+     'as_of': 'YYYY-MM-DD' or None, 'note': str or None}
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import string
+import time
+from datetime import datetime, timedelta, timezone
+
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.clients import get_client
+from cloud_assistant.fanout import fan_out, get_time_budget
+from cloud_assistant.scheduler import call, paginate
+
+# Budgets (seconds) for reading inventory reports and for live listings
+INVENTORY_READ_BUDGET = float(os.environ.get('INVENTORY_READ_BUDGET', '5'))
+LIVE_COUNT_BUDGET = float(os.environ.get('LIVE_COUNT_BUDGET', '8'))
+
+# Key ranges held at once by a live count, pages listed per range before it is
+# split, and split points taken per key position when it is
+LIVE_COUNT_MAX_RANGES = int(os.environ.get('LIVE_COUNT_MAX_RANGES', '64'))
+LIVE_COUNT_PAGES_PER_RANGE = int(os.environ.get('LIVE_COUNT_PAGES_PER_RANGE', '3'))
+LIVE_COUNT_SPLIT_WIDTH = int(os.environ.get('LIVE_COUNT_SPLIT_WIDTH', '10'))
+
+# Characters tried as split points, in key order
+SPLIT_CHARACTERS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+# Storage metrics and inventories change at most daily
+bucket_stats_cache = TTLCache(
+    'bucket-stats',
+    ttl=int(os.environ.get('BUCKET_STATS_CACHE_TTL', '3600')),
+    stale_ttl=int(os.environ.get('BUCKET_STATS_CACHE_STALE_TTL', '86400'))
+)
+missing_stats_cache = TTLCache(
+    'bucket-stats-missing',
+    ttl=int(os.environ.get('BUCKET_STATS_NEGATIVE_TTL', '300'))
+)
+
+class _NoStats(Exception):
+    """Raised by the cache loader so a bucket without statistics is not cached for the full TTL"""
+
+def _stats(objects, size, source, exact, as_of=None, note=None):
+    # Dates are kept as strings so results survive the cache's JSON tier
+    as_of = as_of.strftime('%Y-%m-%d') if as_of else None
+    return {'objects': objects, 'bytes': size, 'source': source, 'exact': exact, 'as_of': as_of, 'note': note}
+
+def get_bucket_stats(bucket_name, region, exact=False, context=None):
+    """
+    Statistics for a bucket. With exact=True the bucket is listed live;
+    otherwise CloudWatch metrics or the latest inventory are used and a short
+    live count is the last resort.
+    """
+    if exact:
+        return count_objects_live(bucket_name, region, context)
+    
+    def load():
+        stats = stats_from_cloudwatch(bucket_name, region) or stats_from_inventory(bucket_name, region)
+        if stats is None:
+            raise _NoStats()
+        return stats
+    
+    key = (bucket_name, region)
+    stats = None
+    if missing_stats_cache.get(key) is None:
+        try:
+            stats = bucket_stats_cache.get_or_load(key, load)
+        except _NoStats:
+            missing_stats_cache.set(key, True)
+    if stats is None:
+        stats = count_objects_live(bucket_name, region, context)
+    return stats
+
+def stats_from_cloudwatch(bucket_name, region):
+    """Latest daily storage metrics for a bucket, or None if CloudWatch has none"""
+    cloudwatch = get_client('cloudwatch', region)
+    now = datetime.now(timezone.utc)
+    size_search = (
+        "SEARCH('{AWS/S3,BucketName,StorageType} MetricName=\"BucketSizeBytes\" "
+        f"BucketName=\"{bucket_name}\"', 'Average', 86400)"
+    )
+    response = call(
+        'cloudwatch', region, cloudwatch.get_metric_data,
+        MetricDataQueries=[
+            {'Id': 'size', 'Expression': f"SUM({size_search})", 'ReturnData': True},
+            {
+                'Id': 'objects',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/S3',
+                        'MetricName': 'NumberOfObjects',
+                        'Dimensions': [
+                            {'Name': 'BucketName', 'Value': bucket_name},
+                            {'Name': 'StorageType', 'Value': 'AllStorageTypes'}
+                        ]
+                    },
+                    'Period': 86400,
+                    'Stat': 'Average'
+                },
+                'ReturnData': True
+            }
+        ],
+        StartTime=now - timedelta(days=3),
+        EndTime=now,
+        ScanBy='TimestampDescending'
+    )
+    
+    latest = {}
+    for result in response.get('MetricDataResults', []):
+        if result.get('Values'):
+            latest[result['Id']] = (result['Values'][0], result['Timestamps'][0])
+    if 'objects' not in latest:
+        return None
+    
+    objects, as_of = latest['objects']
+    size = int(latest['size'][0]) if 'size' in latest else None
+    return _stats(int(objects), size, 'CloudWatch storage metrics', False, as_of)
+
+def _latest_manifest_key(s3, region, destination_bucket, base_prefix):
+    """Key of the newest manifest.json under an inventory destination prefix"""
+    folders = []
+    pages = paginate(
+        's3', region, s3.list_objects_v2,
+        input_token='ContinuationToken', output_token='NextContinuationToken',
+        Bucket=destination_bucket, Prefix=base_prefix, Delimiter='/'
+    )
+    for page in pages:
+        for prefix in page.get('CommonPrefixes', []):
+            folder = prefix['Prefix'][len(base_prefix):].rstrip('/')
+            # Report folders are timestamps such as 2024-01-01T01-00Z
+            if folder[:4].isdigit():
+                folders.append(folder)
+    if not folders:
+        return None
+    return f"{base_prefix}{max(folders)}/manifest.json"
+
+def stats_from_inventory(bucket_name, region, budget=INVENTORY_READ_BUDGET):
+    """
+    Totals from the latest CSV inventory of current object versions, or None.
+    Data files are streamed until the budget runs out; the remainder is
+    extrapolated from compressed file sizes.
+    """
+    s3 = get_client('s3', region)
+    try:
+        configurations = call(
+            's3', region, s3.list_bucket_inventory_configurations, Bucket=bucket_name
+        ).get('InventoryConfigurationList', [])
+    except Exception as e:
+        print(f"Error reading inventory configurations for {bucket_name}: {str(e)}")
+        return None
+    
+    for configuration in configurations:
+        destination = configuration['Destination']['S3BucketDestination']
+        if (not configuration.get('IsEnabled') or destination.get('Format') != 'CSV'
+                or configuration.get('IncludedObjectVersions') != 'Current'):
+            continue
+        
+        destination_bucket = destination['Bucket'].split(':::')[-1]
+        base_prefix = f"{destination['Prefix'].rstrip('/')}/" if destination.get('Prefix') else ''
+        base_prefix += f"{bucket_name}/{configuration['Id']}/"
+        try:
+            manifest_key = _latest_manifest_key(s3, region, destination_bucket, base_prefix)
+            if manifest_key is None:
+                continue
+            manifest_object = call('s3', region, s3.get_object, Bucket=destination_bucket, Key=manifest_key)
+            manifest = json.loads(manifest_object['Body'].read())
+            return _read_inventory(s3, region, destination_bucket, manifest, manifest_object.get('LastModified'), budget)
+        except Exception as e:
+            print(f"Error reading inventory {configuration['Id']} for {bucket_name}: {str(e)}")
+    return None
+
+def _read_inventory(s3, region, destination_bucket, manifest, as_of, budget):
+    columns = [column.strip() for column in manifest['fileSchema'].split(',')]
+    size_column = columns.index('Size') if 'Size' in columns else None
+    files = manifest.get('files', [])
+    total_compressed = sum(f.get('size', 0) for f in files) or 1
+    deadline = time.monotonic() + budget
+    
+    objects = 0
+    size = 0
+    compressed_read = 0
+    for data_file in files:
+        if time.monotonic() > deadline:
+            break
+        body = call('s3', region, s3.get_object, Bucket=destination_bucket, Key=data_file['key'])['Body']
+        reader = csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=body), encoding='utf-8'))
+        for row in reader:
+            objects += 1
+            if size_column is not None and len(row) > size_column and row[size_column]:
+                size += int(row[size_column])
+        compressed_read += data_file.get('size', 0)
+    
+    if compressed_read >= total_compressed or not files:
+        return _stats(objects, size if size_column is not None else None, 'S3 Inventory', False, as_of)
+    
+    # Scale what was read by the share of compressed data it represents
+    share = compressed_read / total_compressed
+    if share == 0:
+        return None
+    return _stats(
+        int(objects / share),
+        int(size / share) if size_column is not None else None,
+        'S3 Inventory', False, as_of,
+        note=f"extrapolated from {share:.0%} of the inventory report"
+    )
+
+def split_points(first_key, last_key, upto=None, limit=LIVE_COUNT_MAX_RANGES):
+    """
+    Keys after last_key (and before upto) that divide the rest of a listing
+    into ranges: fine-grained just after last_key, coarser further away. The
+    positions come from where the keys of the last page started to differ.
+    """
+    differ = len(os.path.commonprefix([first_key, last_key]))
+    points = []
+    for position in range(min(max(differ - 1, 0), len(last_key) - 1), -1, -1):
+        taken = 0
+        for char in SPLIT_CHARACTERS:
+            if char <= last_key[position]:
+                continue
+            point = last_key[:position] + char
+            if (upto is not None and point >= upto) or len(points) >= limit:
+                return points
+            points.append(point)
+            taken += 1
+            if taken == LIVE_COUNT_SPLIT_WIDTH:
+                break
+    return points
+
+def _count_range(s3, region, bucket_name, key_range, splits, deadline):
+    """
+    Count the keys in key_range = (after, upto], after and upto being None for
+    the ends of the bucket. After LIVE_COUNT_PAGES_PER_RANGE pages the rest of
+    the range is handed back, split into at most splits + 1 ranges.
+    Returns (objects, bytes, ranges left to list).
+    """
+    after, upto = key_range
+    params = {'Bucket': bucket_name}
+    if after is not None:
+        params['StartAfter'] = after
+    objects = 0
+    size = 0
+    pages = paginate(
+        's3', region, s3.list_objects_v2,
+        input_token='ContinuationToken', output_token='NextContinuationToken', **params
+    )
+    for page_number, page in enumerate(pages, 1):
+        contents = page.get('Contents', [])
+        for obj in contents:
+            if upto is not None and obj['Key'] > upto:
+                return objects, size, []
+            objects += 1
+            size += obj.get('Size', 0)
+        if not page.get('IsTruncated') or not contents:
+            return objects, size, []
+        if page_number >= LIVE_COUNT_PAGES_PER_RANGE or time.monotonic() > deadline:
+            last_key = contents[-1]['Key']
+            points = split_points(contents[0]['Key'], last_key, upto, splits) if splits else []
+            bounds = [last_key] + points + [upto]
+            return objects, size, list(zip(bounds, bounds[1:]))
+    return objects, size, []
+
+def count_objects_live(bucket_name, region, context=None, budget=LIVE_COUNT_BUDGET):
+    """
+    Count objects by listing the bucket. Ranges that run long are split on
+    their keys and listed concurrently in rounds; only running totals and the
+    pending ranges (at most LIVE_COUNT_MAX_RANGES) are kept in memory.
+    """
+    remaining = get_time_budget(context)
+    budget = min(budget, remaining) if remaining is not None else budget
+    deadline = time.monotonic() + budget
+    s3 = get_client('s3', region)
+    
+    objects = 0
+    size = 0
+    complete = True
+    ranges = [(None, None)]
+    while ranges:
+        if time.monotonic() > deadline:
+            complete = False
+            break
+        # Share the range allowance between the ranges of this round
+        splits = max(LIVE_COUNT_MAX_RANGES // len(ranges) - 1, 0)
+        results, skipped, failed = fan_out(
+            lambda key_range: _count_range(s3, region, bucket_name, key_range, splits, deadline),
+            ranges,
+            context,
+            timeout=max(deadline - time.monotonic(), 0) + 1
+        )
+        ranges = []
+        for range_objects, range_size, rest in results.values():
+            objects += range_objects
+            size += range_size
+            ranges.extend(rest)
+        if skipped or failed:
+            complete = False
+            break
+    
+    note = None if complete else "the listing stopped at the time limit, so this is a lower bound"
+    return _stats(objects, size, 'live listing', complete, datetime.now(timezone.utc), note)
+
+def format_bytes(size):
+    """Human-readable size using binary units"""
+    for unit in ('bytes', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'bytes' else f"{size:.2f} {unit}"
+        size /= 1024
+
+def describe_stats(stats):
+    """'Total Objects' and 'Total Size' lines for a response"""
+    if stats['exact']:
+        qualifier = "exact, live count"
+    else:
+        qualifier = f"estimated from {stats['source']}"
+        if stats['as_of']:
+            qualifier += f" as of {stats['as_of']}"
+    if stats['note']:
+        qualifier += f"; {stats['note']}"
+    
+    prefix = "at least " if stats['source'] == 'live listing' and not stats['exact'] else ""
+    content = f"Total Objects: {prefix}{stats['objects']:,} ({qualifier})\n"
+    if stats['bytes'] is not None:
+        content += f"Total Size: {prefix}{format_bytes(stats['bytes'])}\n"
+    return content
@@ -0,0 +1,222 @@
+"""
+In-process TTL caches shared across warm invocations
+
+Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds a stale
+entry is still returned immediately while a background thread reloads it
+(stale-while-revalidate); after that the next read reloads synchronously.
+Each cache holds at most `max_entries` keys and evicts the least recently used.
+When a persist directory is configured, entries are also written as JSON files
+(e.g. under /tmp) so a new container on the same sandbox can start warm.
+Keys are kept apart per account when code runs inside clients.use_account().
+Concurrent misses on the same key share one load, so requests handled side by
+side (e.g. a batch) never sweep the same region twice. get_or_load_async() does
+the same for coroutine loaders on the asyncio path (see cloud_assistant.aio).
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cloud_assistant import metrics
+from cloud_assistant.clients import current_account
+from cloud_assistant.coalesce import SingleFlight
+
+# Optional directory for the persistent tier; empty disables it
+CACHE_PERSIST_DIR = os.environ.get('CACHE_PERSIST_DIR', '')
+
+# Default size bound for every cache
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+class TTLCache:
+    """Size-bounded LRU cache with TTL, stale-while-revalidate and optional disk tier"""
+    
+    def __init__(self, name, ttl, stale_ttl=0, max_entries=CACHE_MAX_ENTRIES, persist_dir=CACHE_PERSIST_DIR):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.persist_dir = os.path.join(persist_dir, name) if persist_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._loading = SingleFlight()
+        # Loads in progress on the event loop, by key (only touched from the loop)
+        self._loading_async = {}
+        self._lock = threading.Lock()
+    
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() to fill or refresh it.
+        Errors from a synchronous load propagate and nothing is cached.
+        """
+        key = self._scoped(key)
+        now = time.time()
+        entry = self._get_entry(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = now - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                metrics.record_cache(self.name, True)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.hits += 1
+                metrics.record_cache(self.name, True)
+                self._refresh_in_background(key, loader)
+                return value
+        
+        self.misses += 1
+        metrics.record_cache(self.name, False)
+        return self._loading.do(key, lambda: self._load(key, loader))
+    
+    def _load(self, key, loader):
+        value = loader()
+        self._store(key, value)
+        return value
+    
+    async def get_or_load_async(self, key, loader):
+        """get_or_load() for a coroutine function loader, awaited on the running event loop"""
+        key = self._scoped(key)
+        entry = self._get_entry(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl + self.stale_ttl:
+                self.hits += 1
+                metrics.record_cache(self.name, True)
+                if age >= self.ttl and key not in self._loading_async:
+                    # Stale: refresh as a background task and answer now
+                    self._start_async_load(key, loader).add_done_callback(self._log_async_refresh)
+                return entry[1]
+        
+        self.misses += 1
+        metrics.record_cache(self.name, False)
+        load = self._loading_async.get(key) or self._start_async_load(key, loader)
+        # A caller that times out must not cancel the load other callers share
+        return await asyncio.shield(load)
+    
+    def _start_async_load(self, key, loader):
+        async def load():
+            value = await loader()
+            self._store(key, value)
+            return value
+        
+        task = asyncio.ensure_future(load())
+        self._loading_async[key] = task
+        task.add_done_callback(lambda _: self._finish_async_load(key, task))
+        return task
+    
+    def _finish_async_load(self, key, task):
+        self._loading_async.pop(key, None)
+        # Retrieve the error so a load whose callers all gave up is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+    
+    def _log_async_refresh(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error refreshing {self.name} cache entry: {str(task.exception())}")
+    
+    def get(self, key, max_age=None):
+        """
+        Cached value for key without loading, or None when it is missing, expired
+        or older than max_age seconds (default: stale values are returned too)
+        """
+        if max_age is None:
+            max_age = self.ttl + self.stale_ttl
+        entry = self._get_entry(self._scoped(key))
+        if entry is None or time.time() - entry[0] >= min(max_age, self.ttl + self.stale_ttl):
+            return None
+        return entry[1]
+    
+    def set(self, key, value):
+        """Store a value for key, evicting the least recently used entries"""
+        self._store(self._scoped(key), value)
+    
+    def _scoped(self, key):
+        # The Lambda's own account keeps plain keys
+        account = current_account()
+        return key if account is None else (account, key)
+    
+    def _store(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._write_disk(key, stored_at, value)
+    
+    def invalidate(self, key=None):
+        """Drop one key, or every key when key is None (memory tier only)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._scoped(key), None)
+    
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        
+        # Fall back to the persistent tier and promote what it returns
+        entry = self._read_disk(key)
+        if entry is not None:
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+    
+    def _refresh_in_background(self, key, loader):
+        """Reload a stale key on a daemon thread, at most one refresh per key at a time"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                self._store(key, loader())
+            except Exception as e:
+                print(f"Error refreshing {self.name} cache entry {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        # The loader runs in the caller's context, so it reloads the same account
+        threading.Thread(target=contextvars.copy_context().run, args=(refresh,), daemon=True).start()
+    
+    def _disk_path(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.json")
+    
+    def _read_disk(self, key):
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                data = json.load(f)
+            return data['stored_at'], data['value']
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _write_disk(self, key, stored_at, value):
+        if not self.persist_dir:
+            return
+        try:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            path = self._disk_path(key)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': stored_at, 'value': value}, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error persisting {self.name} cache entry {key}: {str(e)}")
@@ -0,0 +1,136 @@
+"""
+Pooled boto3 clients shared across warm invocations
+
+boto3/botocore are imported on first use only, so intents that never talk to
+AWS do not pay for loading the SDK during a cold start.
+
+Code running inside use_account() gets clients for that account's credentials
+without passing them around; the scope follows work handed to fan_out() and to
+background cache refreshes.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+from cloud_assistant.fanout import MAX_REGION_WORKERS
+
+# Sessions and clients live at module level so warm invocations reuse them
+_sessions = {}
+_clients = {}
+_client_lock = threading.Lock()
+
+# boto3.session module and shared botocore Config, loaded with the first client
+_boto3_session = None
+_client_config = None
+
+# Optional replacement for boto3 client construction, e.g. a synthetic backend
+# used by the offline benchmarks
+_client_factory = None
+
+# Time spent importing the AWS SDK in this container (None until first use)
+SDK_IMPORT_MS = None
+
+# (account id, credentials) used when get_client() is not given credentials;
+# (None, None) is the Lambda's own account and role
+_account_scope = contextvars.ContextVar('account_scope', default=(None, None))
+
+def _load_sdk():
+    """Import boto3/botocore and build the shared client Config, timing the import"""
+    global _boto3_session, _client_config, SDK_IMPORT_MS
+    
+    started = time.perf_counter()
+    import boto3.session
+    from botocore.config import Config
+    SDK_IMPORT_MS = (time.perf_counter() - started) * 1000
+    
+    # The pool size covers one connection per fan-out worker so concurrent
+    # calls never wait for a socket. Retries are left to the scheduler.
+    _boto3_session = boto3.session
+    _client_config = Config(
+        max_pool_connections=max(MAX_REGION_WORKERS, 10),
+        tcp_keepalive=True,
+        connect_timeout=int(os.environ.get('AWS_CONNECT_TIMEOUT', '3')),
+        read_timeout=int(os.environ.get('AWS_READ_TIMEOUT', '10')),
+        retries={'max_attempts': 1, 'mode': 'standard'}
+    )
+
+def set_client_factory(factory):
+    """
+    Build clients with factory(service, region, credentials) instead of boto3
+    (None restores boto3). Clears the pool so no real client is reused.
+    """
+    global _client_factory
+    with _client_lock:
+        _client_factory = factory
+        _clients.clear()
+
+def _credentials_key(credentials):
+    """Cache key for a set of explicit credentials (None means the Lambda role)"""
+    if not credentials:
+        return None
+    return (
+        credentials.get('aws_access_key_id'),
+        credentials.get('aws_session_token')
+    )
+
+@contextlib.contextmanager
+def use_account(account_id, credentials=None):
+    """Make get_client() default to an account's credentials (None: the Lambda's own)"""
+    token = _account_scope.set((account_id, credentials))
+    try:
+        yield
+    finally:
+        _account_scope.reset(token)
+
+def current_account():
+    """Id of the account selected with use_account(), or None for the Lambda's own"""
+    return _account_scope.get()[0]
+
+def current_credentials():
+    """Credentials of the current use_account() scope, or None for the Lambda's role"""
+    return _account_scope.get()[1]
+
+def release_credentials(credentials):
+    """Drop the pooled session and clients of credentials that are no longer used"""
+    cred_key = _credentials_key(credentials)
+    with _client_lock:
+        _sessions.pop(cred_key, None)
+        for key in [key for key in _clients if key[2] == cred_key]:
+            del _clients[key]
+
+def get_client(service, region=None, credentials=None):
+    """
+    Return a pooled boto3 client for (service, region, credentials).
+    
+    Clients are created once per warm container and shared between threads;
+    credentials is an optional dict of boto3.session.Session keyword arguments
+    and defaults to those of the current use_account() scope.
+    """
+    region = region or os.environ.get('AWS_REGION') or 'us-east-1'
+    if credentials is None:
+        credentials = _account_scope.get()[1]
+    cred_key = _credentials_key(credentials)
+    key = (service, region, cred_key)
+    
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    
+    # boto3 sessions are not thread-safe, so client construction is serialised
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None and _client_factory is not None:
+            client = _client_factory(service, region, credentials)
+            _clients[key] = client
+        elif client is None:
+            if _boto3_session is None:
+                _load_sdk()
+            session = _sessions.get(cred_key)
+            if session is None:
+                session = _boto3_session.Session(**(credentials or {}))
+                _sessions[cred_key] = session
+            client = session.client(service, region_name=region, config=_client_config)
+            _clients[key] = client
+    return client
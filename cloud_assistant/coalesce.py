@@ -0,0 +1,409 @@
+"""
+Single-flight coalescing of identical intent fulfilments
+
+Requests are keyed on the intent name plus normalised slot values. Within one
+process, concurrent identical requests wait for the first one and share its
+response. Across processes, a pluggable store provides a short lease (only the
+holder runs the AWS sweep) and a short-lived result that the other invocations
+pick up. The stores also keep plain values with a TTL (put/get), which the
+pager uses for result sets. Waiters give up after COALESCE_LEASE_SECONDS or COALESCE_WAIT_FRACTION
+of the invocation's remaining time, whichever is shorter, so a slow leader
+never holds duplicate callers until their own invocations time out.
+COALESCE_STORE selects the store:
+
+    sqlite:/tmp/coalesce.db    local file, for tests and single-host runs
+    dynamodb:<table name>      shared table keyed on 'key' with TTL on 'expires_at'
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from cloud_assistant.fanout import get_time_budget
+
+# Cross-process store specification; empty keeps coalescing in-process only
+COALESCE_STORE = os.environ.get('COALESCE_STORE', '')
+
+# How long a lease holder may take before waiters stop waiting for it (seconds)
+COALESCE_LEASE_SECONDS = float(os.environ.get('COALESCE_LEASE_SECONDS', '30'))
+
+# Largest fraction of the remaining invocation time a waiter spends waiting
+COALESCE_WAIT_FRACTION = float(os.environ.get('COALESCE_WAIT_FRACTION', '0.5'))
+
+# How long a finished response can be shared with later identical requests (seconds)
+COALESCE_RESULT_TTL = float(os.environ.get('COALESCE_RESULT_TTL', '5'))
+
+# Delay between store polls while another process holds the lease (seconds)
+COALESCE_POLL_INTERVAL = float(os.environ.get('COALESCE_POLL_INTERVAL', '0.1'))
+
+def request_key(event):
+    """Stable key for an intent request: intent name plus normalised slot values"""
+    intent = event['sessionState']['intent']
+    slots = intent.get('slots') or {}
+    values = {}
+    for slot_name in sorted(slots):
+        slot = slots[slot_name]
+        if slot and slot.get('value') and slot['value'].get('interpretedValue') is not None:
+            values[slot_name] = str(slot['value']['interpretedValue']).strip().lower()
+    raw = json.dumps([intent['name'], values], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class FlightTimeout(Exception):
+    """Raised to a waiter whose wait for another caller's execution ran out"""
+
+class _Flight:
+    """One in-process execution that other threads can wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome"""
+    
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key, fn, timeout=None):
+        """
+        Return fn() for key. Callers that find an execution in progress wait for
+        it, for at most timeout seconds (None waits as long as it takes), and
+        get FlightTimeout when it has not finished by then.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+        
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise FlightTimeout(key)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+class SQLiteCoalescingStore:
+    """Lease/result store in a local SQLite file, shared by processes on one host"""
+    
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS coalesce ("
+                "key TEXT PRIMARY KEY, owner TEXT, lease_until REAL, result TEXT, expires_at REAL)"
+            )
+        finally:
+            conn.close()
+    
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+    
+    def acquire(self, key, owner, lease_seconds):
+        """Take the lease for key unless a live lease or live result already exists"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT lease_until, result, expires_at FROM coalesce WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                lease_until, result, expires_at = row
+                if (result is None and lease_until > now) or (result is not None and expires_at > now):
+                    conn.execute("COMMIT")
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO coalesce (key, owner, lease_until, result, expires_at) VALUES (?, ?, ?, NULL, NULL)",
+                (key, owner, now + lease_seconds)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def get(self, key):
+        """Return (result or None, lease still live) for key"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT lease_until, result, expires_at FROM coalesce WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None, False
+        lease_until, result, expires_at = row
+        if result is not None and expires_at > now:
+            return json.loads(result), False
+        return None, result is None and lease_until > now
+    
+    def put_result(self, key, owner, result, ttl):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE coalesce SET result = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                (json.dumps(result, default=str), time.time() + ttl, key, owner)
+            )
+        finally:
+            conn.close()
+    
+    def put(self, key, value, ttl):
+        """Store a value under key for ttl seconds, outside any lease; get() returns it"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO coalesce (key, owner, lease_until, result, expires_at) VALUES (?, NULL, 0, ?, ?)",
+                (key, json.dumps(value, default=str), time.time() + ttl)
+            )
+        finally:
+            conn.close()
+    
+    def release(self, key, owner):
+        """Give up a lease without a result so waiters stop waiting"""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM coalesce WHERE key = ? AND owner = ? AND result IS NULL", (key, owner))
+        finally:
+            conn.close()
+
+class DynamoDBCoalescingStore:
+    """Lease/result store in a DynamoDB table shared by every container"""
+    
+    def __init__(self, table_name):
+        self.table_name = table_name
+    
+    def _call(self, operation, **params):
+        from cloud_assistant.clients import get_client
+        from cloud_assistant.scheduler import call
+        client = get_client('dynamodb')
+        return call('dynamodb', client.meta.region_name, getattr(client, operation), **params)
+    
+    def acquire(self, key, owner, lease_seconds):
+        from botocore.exceptions import ClientError
+        now = time.time()
+        try:
+            self._call(
+                'put_item',
+                TableName=self.table_name,
+                Item={
+                    'key': {'S': key},
+                    'owner': {'S': owner},
+                    'lease_until': {'N': str(now + lease_seconds)},
+                    'expires_at': {'N': str(int(now + lease_seconds) + 1)}
+                },
+                ConditionExpression=(
+                    'attribute_not_exists(#k) OR '
+                    '(attribute_not_exists(#r) AND lease_until < :now) OR '
+                    '(attribute_exists(#r) AND expires_at < :now)'
+                ),
+                ExpressionAttributeNames={'#k': 'key', '#r': 'result'},
+                ExpressionAttributeValues={':now': {'N': str(now)}}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+    
+    def get(self, key):
+        now = time.time()
+        item = self._call(
+            'get_item',
+            TableName=self.table_name, Key={'key': {'S': key}}, ConsistentRead=True
+        ).get('Item')
+        if not item:
+            return None, False
+        if 'result' in item and float(item['expires_at']['N']) > now:
+            return json.loads(item['result']['S']), False
+        return None, 'result' not in item and float(item['lease_until']['N']) > now
+    
+    def put_result(self, key, owner, result, ttl):
+        self._call(
+            'update_item',
+            TableName=self.table_name,
+            Key={'key': {'S': key}},
+            UpdateExpression='SET #r = :r, expires_at = :e',
+            ConditionExpression='#o = :o',
+            ExpressionAttributeNames={'#r': 'result', '#o': 'owner'},
+            ExpressionAttributeValues={
+                ':r': {'S': json.dumps(result, default=str)},
+                ':e': {'N': str(time.time() + ttl)},
+                ':o': {'S': owner}
+            }
+        )
+    
+    def put(self, key, value, ttl):
+        now = time.time()
+        self._call(
+            'put_item',
+            TableName=self.table_name,
+            Item={
+                'key': {'S': key},
+                'result': {'S': json.dumps(value, default=str)},
+                'lease_until': {'N': '0'},
+                'expires_at': {'N': str(now + ttl)}
+            }
+        )
+    
+    def release(self, key, owner):
+        from botocore.exceptions import ClientError
+        try:
+            self._call(
+                'delete_item',
+                TableName=self.table_name,
+                Key={'key': {'S': key}},
+                ConditionExpression='#o = :o AND attribute_not_exists(#r)',
+                ExpressionAttributeNames={'#o': 'owner', '#r': 'result'},
+                ExpressionAttributeValues={':o': {'S': owner}}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+def create_store(spec):
+    """Build a store from a 'sqlite:<path>' or 'dynamodb:<table>' spec, or None"""
+    if not spec:
+        return None
+    backend, _, target = spec.partition(':')
+    if backend == 'sqlite':
+        return SQLiteCoalescingStore(target)
+    if backend == 'dynamodb':
+        return DynamoDBCoalescingStore(target)
+    raise ValueError(f"Unknown coalescing store: {spec}")
+
+_single_flight = SingleFlight()
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Store configured by COALESCE_STORE, created once per container"""
+    global _store
+    if _store is None and COALESCE_STORE:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(COALESCE_STORE)
+    return _store
+
+def coalesce(event, fn, context=None, store=None):
+    """
+    Return fn() for this request, sharing one execution between identical
+    concurrent requests in this process and, when a store is configured, with
+    other processes. Store errors fall back to running fn() directly.
+    """
+    key = request_key(event)
+    store = store or get_store()
+    wait_seconds = _wait_seconds(context)
+    try:
+        if store is None:
+            return _single_flight.do(key, fn, wait_seconds)
+        return _single_flight.do(key, lambda: _coalesce_across_processes(event, key, fn, wait_seconds, store), wait_seconds)
+    except FlightTimeout:
+        return _still_working(event)
+
+def _wait_seconds(context):
+    """How long a waiter may wait for another caller's execution"""
+    budget = get_time_budget(context)
+    if budget is None:
+        return COALESCE_LEASE_SECONDS
+    return min(COALESCE_LEASE_SECONDS, COALESCE_WAIT_FRACTION * budget)
+
+def _still_working(event):
+    """Answer for a waiter whose leader is still running the same request"""
+    return {
+        'sessionState': {
+            'dialogAction': {
+                'type': 'Close',
+                'fulfillmentState': 'Failed'
+            },
+            'intent': {
+                'name': event['sessionState']['intent']['name'],
+                'state': 'Failed'
+            }
+        },
+        'messages': [
+            {
+                'contentType': 'PlainText',
+                'content': "I'm still gathering that information. Please ask again in a moment."
+            }
+        ]
+    }
+
+def _coalesce_across_processes(event, key, fn, wait_seconds, store):
+    owner = uuid.uuid4().hex
+    try:
+        result, _ = store.get(key)
+        if result is not None:
+            return result
+        acquired = store.acquire(key, owner, COALESCE_LEASE_SECONDS)
+    except Exception as e:
+        print(f"Error using coalescing store: {str(e)}")
+        return fn()
+    
+    if acquired:
+        return _run_as_leader(key, owner, fn, store)
+    
+    # Another process is running the same request; wait for its result while
+    # its lease is live, leaving the rest of the invocation's time to run fn()
+    # if the leader gives up
+    deadline = time.time() + wait_seconds
+    while time.time() < deadline:
+        time.sleep(COALESCE_POLL_INTERVAL)
+        try:
+            result, lease_live = store.get(key)
+        except Exception as e:
+            print(f"Error using coalescing store: {str(e)}")
+            break
+        if result is not None:
+            return result
+        if not lease_live:
+            break
+    else:
+        # The leader is still working; duplicating its sweep would not finish sooner
+        return _still_working(event)
+    return fn()
+
+def _run_as_leader(key, owner, fn, store):
+    try:
+        result = fn()
+    except Exception:
+        _release_quietly(key, owner, store)
+        raise
+    
+    # Only successful answers are worth sharing
+    if result.get('sessionState', {}).get('intent', {}).get('state') == 'Fulfilled':
+        try:
+            store.put_result(key, owner, result, COALESCE_RESULT_TTL)
+        except Exception as e:
+            print(f"Error using coalescing store: {str(e)}")
+    else:
+        _release_quietly(key, owner, store)
+    return result
+
+def _release_quietly(key, owner, store):
+    try:
+        store.release(key, owner)
+    except Exception as e:
+        print(f"Error using coalescing store: {str(e)}")
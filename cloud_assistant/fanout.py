@@ -0,0 +1,63 @@
+"""
+Bounded, deadline-aware concurrent execution for multi-region requests
+"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Maximum number of regions queried at the same time for "all regions" requests
+MAX_REGION_WORKERS = int(os.environ.get('MAX_REGION_WORKERS', '10'))
+
+# Time kept in reserve (ms) to build and return the Lex response after a fan-out
+DEADLINE_SAFETY_MARGIN_MS = int(os.environ.get('DEADLINE_SAFETY_MARGIN_MS', '1000'))
+
+def get_time_budget(context):
+    """Seconds left for AWS calls in this invocation, or None when there is no deadline"""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    remaining_ms = context.get_remaining_time_in_millis() - DEADLINE_SAFETY_MARGIN_MS
+    return max(remaining_ms, 0) / 1000.0
+
+def fan_out(func, items, context=None, max_workers=MAX_REGION_WORKERS, timeout=None):
+    """
+    Run func(item) concurrently for every item with at most max_workers calls in
+    flight, stopping at the invocation deadline taken from the Lambda context
+    or after timeout seconds, whichever comes first.
+    
+    Only calls that have not started yet are cancelled at the deadline. Calls
+    already running keep going in their threads, possibly into the next warm
+    invocation, still holding their pooled clients and metrics collector. func
+    must be safe to finish late: callers that make side-effecting calls must not
+    rely on fan-out cancellation to stop them.
+    
+    Returns (results, skipped, failed): results maps each finished item to its
+    return value, skipped lists (in input order) the items that did not finish
+    in time, and failed maps items whose call raised to the exception.
+    """
+    results = {}
+    failed = {}
+    if not items:
+        return results, [], failed
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    # Each call runs in a copy of the caller's context, so an account scope carries over
+    futures = {executor.submit(contextvars.copy_context().run, func, item): item for item in items}
+    try:
+        budget = get_time_budget(context)
+        if timeout is not None:
+            budget = timeout if budget is None else min(budget, timeout)
+        done, _ = wait(futures, timeout=budget)
+    finally:
+        # Never block the response on stragglers; queued work is dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    for future in done:
+        item = futures[future]
+        try:
+            results[item] = future.result()
+        except Exception as e:
+            print(f"Error processing {item}: {str(e)}")
+            failed[item] = e
+    
+    skipped = [item for item in items if item not in results and item not in failed]
+    return results, skipped, failed
@@ -0,0 +1,293 @@
+"""
+Service health for GetAWSServiceStatus
+
+A health provider returns the open AWS issues as a snapshot:
+
+    {'CheckedAt': ISO timestamp,
+     'Events': [{'Service': 'EC2', 'Region': 'us-east-1', 'Type': str,
+                 'Status': str, 'Scope': str, 'StartTime': ISO timestamp,
+                 'LastUpdated': ISO timestamp, 'Description': str or None}]}
+
+HEALTH_PROVIDER selects it:
+
+    aws                        the AWS Health API (needs a Business, Enterprise
+                               On-Ramp or Enterprise support plan)
+    aws:<region>               the same, through another Health endpoint
+    fixture:<path>             events read from a JSON file in the shape
+                               above, for tests and demos
+
+The snapshot is cached for HEALTH_TTL seconds and served stale for
+HEALTH_STALE_TTL more while a background thread refreshes it, so a status
+question is a cache lookup even when the Health API is slow or throttled during
+a large event. Only a container without any snapshot waits for the provider,
+and for at most HEALTH_LOAD_TIMEOUT seconds.
+
+refresh_health() fetches a snapshot explicitly. An EventBridge schedule with
+the constant input {"source": "cloud-assistant.health"} calls it every
+HEALTH_TTL or so, and each snapshot is also written to HEALTH_STORE (default:
+COALESCE_STORE) when one is configured. A container whose own snapshot has
+expired then reads the scheduled one from the store instead of waiting for the
+Health API.
+
+Accounts without a qualifying support plan get SubscriptionRequiredException.
+That answer is remembered for HEALTH_STALE_TTL, so each question does not
+repeat a call that cannot succeed.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime, timezone
+
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.coalesce import COALESCE_STORE, create_store
+from cloud_assistant.fanout import get_time_budget
+
+# Health backend specification
+HEALTH_PROVIDER = os.environ.get('HEALTH_PROVIDER', 'aws')
+
+# Freshness of the health snapshot, and how long a stale one is still served (seconds)
+HEALTH_TTL = int(os.environ.get('HEALTH_TTL', '60'))
+HEALTH_STALE_TTL = int(os.environ.get('HEALTH_STALE_TTL', '1800'))
+
+# Shared store for scheduled snapshots ('sqlite:<path>' or 'dynamodb:<table>')
+HEALTH_STORE = os.environ.get('HEALTH_STORE', COALESCE_STORE)
+
+# Errors that will keep failing until the account changes, remembered for HEALTH_STALE_TTL
+PERMANENT_ERROR_CODES = {'SubscriptionRequiredException'}
+
+# Longest a status question waits for a provider when nothing is cached (seconds)
+HEALTH_LOAD_TIMEOUT = float(os.environ.get('HEALTH_LOAD_TIMEOUT', '3'))
+
+# Open events whose descriptions are fetched (DescribeEventDetails takes 10 per call)
+HEALTH_MAX_DESCRIBED_EVENTS = int(os.environ.get('HEALTH_MAX_DESCRIBED_EVENTS', '50'))
+MAX_EVENT_ARNS_PER_CALL = 10
+
+class HealthUnavailableError(Exception):
+    """No health snapshot could be loaded in time"""
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    return value
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+class AWSHealthProvider:
+    """Open issues from the AWS Health API"""
+    
+    def __init__(self, region='us-east-1'):
+        self.region = region
+    
+    def fetch(self):
+        from cloud_assistant.clients import get_client
+        from cloud_assistant.scheduler import call, paginate
+        
+        health = get_client('health', self.region)
+        events = []
+        pages = paginate(
+            'health', self.region, health.describe_events,
+            input_token='nextToken', output_token='nextToken',
+            filter={'eventTypeCategories': ['issue'], 'eventStatusCodes': ['open']},
+            maxResults=100
+        )
+        for page in pages:
+            events.extend(page.get('events', []))
+        
+        # Most recently updated events get their descriptions first
+        epoch = datetime.min.replace(tzinfo=timezone.utc)
+        events.sort(key=lambda event: event.get('lastUpdatedTime') or event.get('startTime') or epoch, reverse=True)
+        arns = [event['arn'] for event in events[:HEALTH_MAX_DESCRIBED_EVENTS]]
+        descriptions = {}
+        for start in range(0, len(arns), MAX_EVENT_ARNS_PER_CALL):
+            details = call(
+                'health', self.region, health.describe_event_details,
+                eventArns=arns[start:start + MAX_EVENT_ARNS_PER_CALL]
+            )
+            for item in details.get('successfulSet', []):
+                descriptions[item['event']['arn']] = item.get('eventDescription', {}).get('latestDescription')
+        
+        return {
+            'CheckedAt': _now(),
+            'Events': [
+                {
+                    'Service': event.get('service'),
+                    'Region': event.get('region', 'global'),
+                    'Type': event.get('eventTypeCode'),
+                    'Status': event.get('statusCode'),
+                    'Scope': event.get('eventScopeCode'),
+                    'StartTime': _timestamp(event.get('startTime')),
+                    'LastUpdated': _timestamp(event.get('lastUpdatedTime')),
+                    'Description': descriptions.get(event['arn'])
+                }
+                for event in events
+            ]
+        }
+
+class FixtureHealthProvider:
+    """Events read from a JSON file ({"Events": [...]}), for tests and demos"""
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def fetch(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        return {'CheckedAt': _now(), 'Events': data.get('Events', [])}
+
+def create_provider(spec):
+    """Build a provider from an 'aws', 'aws:<region>' or 'fixture:<path>' spec"""
+    backend, _, target = spec.partition(':')
+    if backend == 'aws':
+        return AWSHealthProvider(target or 'us-east-1')
+    if backend == 'fixture':
+        return FixtureHealthProvider(target)
+    raise ValueError(f"Unknown health provider: {spec}")
+
+health_cache = TTLCache('service-health', ttl=HEALTH_TTL, stale_ttl=HEALTH_STALE_TTL, max_entries=4)
+_provider = None
+_pending = None
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1)
+_store = None
+# (error, time.monotonic() until which it is raised again without calling AWS)
+_failure = None
+
+def _get_store():
+    global _store
+    if _store is None and HEALTH_STORE:
+        _store = create_store(HEALTH_STORE)
+    return _store
+
+def _age(snapshot):
+    """Seconds since a snapshot was taken"""
+    try:
+        checked = datetime.fromisoformat(snapshot['CheckedAt'])
+    except (KeyError, TypeError, ValueError):
+        return float('inf')
+    return (datetime.now(timezone.utc) - checked).total_seconds()
+
+def _remember(snapshot):
+    """Share a freshly fetched snapshot with other containers"""
+    store = _get_store()
+    if store is None:
+        return
+    try:
+        store.put(f"health:{HEALTH_PROVIDER}", snapshot, HEALTH_TTL + HEALTH_STALE_TTL)
+    except Exception as e:
+        print(f"Error saving health snapshot: {str(e)}")
+
+def _shared_snapshot():
+    store = _get_store()
+    if store is None:
+        return None
+    try:
+        snapshot, _ = store.get(f"health:{HEALTH_PROVIDER}")
+        return snapshot
+    except Exception as e:
+        print(f"Error loading health snapshot: {str(e)}")
+        return None
+
+def _remember_failure(error):
+    global _failure
+    from cloud_assistant.scheduler import error_code
+    if error_code(error) in PERMANENT_ERROR_CODES:
+        _failure = (error, time.monotonic() + HEALTH_STALE_TTL)
+
+def get_provider():
+    """Provider configured by HEALTH_PROVIDER, created once per container"""
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                _provider = create_provider(HEALTH_PROVIDER)
+    return _provider
+
+def _fetch_and_share(provider):
+    # Runs on the fetch thread, so the outcome is recorded before any caller sees it
+    try:
+        snapshot = provider.fetch()
+    except Exception as e:
+        _remember_failure(e)
+        raise
+    _remember(snapshot)
+    return snapshot
+
+def _cache_result(future):
+    if future.exception() is None:
+        health_cache.set(HEALTH_PROVIDER, future.result())
+
+def _fetch(timeout):
+    """
+    Fetch a snapshot from the provider, sharing one fetch between concurrent
+    callers. A caller gives up after timeout; the fetch then still fills the cache.
+    """
+    global _pending
+    provider = get_provider()
+    with _lock:
+        if _pending is None or _pending.done():
+            # The fetch runs in this invocation's context so its AWS calls are measured here
+            _pending = _executor.submit(contextvars.copy_context().run, _fetch_and_share, provider)
+        pending = _pending
+    
+    try:
+        return pending.result(timeout=timeout)
+    except TimeoutError:
+        pending.add_done_callback(_cache_result)
+        raise HealthUnavailableError("the AWS Health API is slow to respond")
+
+def _load(context=None):
+    """
+    Snapshot for a container without a usable one: the scheduled snapshot from
+    the shared store while it is fresh, otherwise a provider fetch of at most
+    HEALTH_LOAD_TIMEOUT, falling back to an older shared snapshot.
+    """
+    shared = _shared_snapshot()
+    if shared is not None and _age(shared) < HEALTH_TTL:
+        return shared
+    budget = get_time_budget(context)
+    try:
+        return _fetch(HEALTH_LOAD_TIMEOUT if budget is None else min(HEALTH_LOAD_TIMEOUT, budget))
+    except HealthUnavailableError:
+        if shared is not None:
+            return shared
+        raise
+
+def _check_failure():
+    """Raise the remembered permanent failure, if it has not expired"""
+    global _failure
+    if _failure is not None:
+        error, until = _failure
+        if time.monotonic() < until:
+            raise error
+        _failure = None
+
+def get_health(context=None):
+    """Current health snapshot, from the cache whenever one is held"""
+    _check_failure()
+    return health_cache.get_or_load(HEALTH_PROVIDER, lambda: _load(context))
+
+def refresh_health(context=None):
+    """
+    Fetch a snapshot now and store it in the cache and the shared store, e.g.
+    from a scheduled invocation. Returns a short report for the invocation result.
+    """
+    budget = get_time_budget(context)
+    try:
+        snapshot = _fetch(budget if budget is not None else HEALTH_LOAD_TIMEOUT)
+    except Exception as e:
+        print(f"Error refreshing service health: {str(e)}")
+        return {'refreshed': False, 'error': str(e)}
+    health_cache.set(HEALTH_PROVIDER, snapshot)
+    return {'refreshed': True, 'events': len(snapshot['Events'])}
+
+def open_events(snapshot, service=None, region=None):
+    """Events of a snapshot, optionally for one service code and/or region"""
+    return [
+        event for event in snapshot['Events']
+        if (service is None or (event['Service'] or '').upper() == service.upper())
+        and (region is None or event['Region'] in (region, 'global'))
+    ]
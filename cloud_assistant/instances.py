@@ -0,0 +1,166 @@
+"""
+Compact, column-oriented storage for large EC2 inventories
+
+A per-instance dict costs several hundred bytes. InstanceBatch keeps one
+column per field instead:
+
+- instance ids as integers (the low 64 bits, plus a 16-bit word holding the
+  high bits and the hex width, since current ids have 17 hex digits),
+- region, state, instance type and tag values as 16-bit codes (widened to
+  32 bits for columns with more distinct values) into per-batch tables of
+  interned strings,
+- names in a plain list (None when the sweep did not fetch them); the Name
+  tag is kept there rather than as a tag column.
+
+That is 16 bytes per instance, plus 2 per tag key, before names, and group-by counts run
+over the code arrays with collections.Counter instead of looping over dicts.
+"""
+import operator
+import sys
+from array import array
+from collections import Counter
+from itertools import compress, islice
+
+class InstanceRecord:
+    """One instance, as returned by InstanceBatch.select()"""
+    
+    __slots__ = ('InstanceId', 'State', 'InstanceType', 'Name', 'Region', 'Tags')
+    
+    def __init__(self, InstanceId, State, InstanceType, Name, Region, Tags):
+        self.InstanceId = InstanceId
+        self.State = State
+        self.InstanceType = InstanceType
+        self.Name = Name
+        self.Region = Region
+        self.Tags = Tags
+    
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+class _Column:
+    """Dictionary-encoded string column; code 0 stands for None"""
+    
+    def __init__(self, length=0):
+        self.codes = array('H', bytes(2 * length))
+        self.values = [None]
+        self._lookup = {None: 0}
+    
+    def encode(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            if len(self.values) > 0xFFFF and self.codes.typecode == 'H':
+                self.codes = array('I', self.codes)
+            value = sys.intern(value)
+            code = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = code
+        return code
+    
+    def append(self, value):
+        # encode() may widen the codes array, so it runs before the append is looked up
+        code = self.encode(value)
+        self.codes.append(code)
+    
+    def code_of(self, value):
+        """Code for a value, or -1 if it never occurs (so filters match nothing)"""
+        return self._lookup.get(value, -1)
+
+class InstanceBatch:
+    """Column-oriented instances of one or more regions with group-by counts"""
+    
+    def __init__(self):
+        self._ids = array('Q')
+        self._id_meta = array('H')
+        self._names = []
+        self._columns = {'region': _Column(), 'state': _Column(), 'instance_type': _Column()}
+        self._tags = {}
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def append(self, instance_id, state, region, instance_type=None, name=None, tags=None):
+        digits = instance_id[2:]
+        value = int(digits, 16)
+        self._ids.append(value & 0xFFFFFFFFFFFFFFFF)
+        self._id_meta.append((value >> 64) << 5 | len(digits))
+        self._names.append(name)
+        self._columns['region'].append(region)
+        self._columns['state'].append(state)
+        self._columns['instance_type'].append(instance_type)
+        tags = tags or {}
+        for key in tags:
+            if key not in self._tags and key != 'Name':
+                # A tag key seen for the first time is absent on every earlier row
+                self._tags[key] = _Column(len(self._ids) - 1)
+        for key, column in self._tags.items():
+            column.append(tags.get(key))
+    
+    def append_record(self, record):
+        """Add a record dict as produced by iter_instances()"""
+        self.append(
+            record['InstanceId'], record['State'], record['Region'],
+            record.get('InstanceType'), record.get('Name'), record.get('Tags')
+        )
+    
+    def _column(self, field):
+        if field.startswith('tag:'):
+            # A key no instance carries reads as an all-None column
+            return self._tags.get(field[4:]) or _Column(len(self))
+        return self._columns[field]
+    
+    def _mask(self, where):
+        """Selector bytes for rows matching every {field: value} in where, or None for all rows"""
+        if not where:
+            return None
+        mask = None
+        for field, value in where.items():
+            column = self._column(field)
+            code = column.code_of(value)
+            matches = bytes(map(code.__eq__, column.codes))
+            mask = matches if mask is None else bytes(map(operator.and_, mask, matches))
+        return mask
+    
+    def count(self, where=None):
+        """Number of rows matching where"""
+        mask = self._mask(where)
+        return len(self) if mask is None else mask.count(1)
+    
+    def count_by(self, *fields, where=None):
+        """
+        {value: count} grouped by one field, or {(value, ...): count} for several.
+        Fields are 'region', 'state', 'instance_type' or 'tag:<key>'.
+        """
+        columns = [self._column(field) for field in fields]
+        mask = self._mask(where)
+        if len(columns) == 1:
+            codes = columns[0].codes if mask is None else compress(columns[0].codes, mask)
+            counts = Counter(codes)
+            return {columns[0].values[code]: count for code, count in counts.items()}
+        rows = zip(*(column.codes for column in columns))
+        counts = Counter(rows if mask is None else compress(rows, mask))
+        return {
+            tuple(column.values[code] for column, code in zip(columns, key)): count
+            for key, count in counts.items()
+        }
+    
+    def select(self, where=None, limit=None):
+        """InstanceRecords for the first `limit` rows matching where"""
+        mask = self._mask(where)
+        rows = range(len(self)) if mask is None else compress(range(len(self)), mask)
+        return [self._record(row) for row in islice(rows, limit)]
+    
+    def _record(self, row):
+        columns = self._columns
+        tags = {}
+        for key, column in self._tags.items():
+            value = column.values[column.codes[row]]
+            if value is not None:
+                tags[key] = value
+        return InstanceRecord(
+            f"i-{(self._id_meta[row] >> 5) << 64 | self._ids[row]:0{self._id_meta[row] & 31}x}",
+            columns['state'].values[columns['state'].codes[row]],
+            columns['instance_type'].values[columns['instance_type'].codes[row]],
+            self._names[row],
+            columns['region'].values[columns['region'].codes[row]],
+            tags
+        )
@@ -0,0 +1 @@
+"""One module per Lex intent, loaded on demand by the dispatch registry"""
@@ -0,0 +1,110 @@
+"""
+CheckCloudWatchAlarms intent
+"""
+import os
+
+from cloud_assistant import accounts
+from cloud_assistant.alarm_index import ALARM_REGIONS, query_alarms
+from cloud_assistant.lex import get_slot_value
+from cloud_assistant.pages import ResponseBuffer
+from cloud_assistant.scheduler import describe_failure
+
+# Alarms kept for paging with "show more"
+MAX_ALARMS_LISTED = int(os.environ.get('MAX_ALARMS_LISTED', '500'))
+
+def handle_check_cloudwatch_alarms(event, context=None):
+    """
+    Handler for CheckCloudWatchAlarms intent
+    """
+    # Extract slot values
+    alarm_state = get_slot_value(event, 'AlarmState') or 'ALARM'
+    # Optional filters answered from the alarm index
+    name_prefix = get_slot_value(event, 'AlarmNamePrefix')
+    namespace = get_slot_value(event, 'Namespace')
+    # Account id or name when several accounts are configured ('all' by default)
+    account = get_slot_value(event, 'Account')
+    
+    # Map user-friendly terms to CloudWatch states
+    state_mapping = {
+        'active': 'ALARM',
+        'alarm': 'ALARM',
+        'insufficient data': 'INSUFFICIENT_DATA', 
+        'insufficient': 'INSUFFICIENT_DATA',
+        'ok': 'OK',
+        'all': None  # Special case to list all alarms
+    }
+    
+    # Default to ALARM if no state is specified
+    if not alarm_state or alarm_state.lower() not in state_mapping:
+        alarm_state = 'ALARM'
+    else:
+        alarm_state = state_mapping[alarm_state.lower()]
+    
+    response = ResponseBuffer()
+    try:
+        # Metric and composite alarms in every configured account and region, from the index
+        selected_accounts = accounts.select_accounts(account)
+        alarms, failed_regions = query_alarms(
+            alarm_state, name_prefix, namespace, context=context, account_list=selected_accounts
+        )
+        labels = {a['Id']: accounts.account_label(a) for a in selected_accounts or []}
+        
+        alarm_count = len(alarms)
+        
+        if alarm_count == 0:
+            if alarm_state == 'ALARM':
+                response.write("Good news! You don't have any active CloudWatch alarms.")
+            elif alarm_state == 'INSUFFICIENT_DATA':
+                response.write("You don't have any CloudWatch alarms in the INSUFFICIENT_DATA state.")
+            elif alarm_state == 'OK':
+                response.write("You don't have any CloudWatch alarms in the OK state.")
+            else:
+                response.write("You don't have any CloudWatch alarms configured.")
+        else:
+            state_desc = ""
+            if alarm_state == 'ALARM':
+                state_desc = "active"
+            elif alarm_state == 'INSUFFICIENT_DATA':
+                state_desc = "with insufficient data"
+            elif alarm_state == 'OK':
+                state_desc = "in OK state"
+            else:
+                state_desc = "configured"
+            
+            filters = ""
+            if name_prefix:
+                filters += f" named '{name_prefix}*'"
+            if namespace:
+                filters += f" on {namespace} metrics"
+            response.write(f"You have {alarm_count} CloudWatch alarms{filters} {state_desc}:\n")
+            
+            for i, alarm in enumerate(alarms[:MAX_ALARMS_LISTED]):
+                name = alarm['Name']
+                if alarm['Type'] == 'composite':
+                    name += " (composite)"
+                if 'Account' in alarm:
+                    name += f" [{labels[alarm['Account']]}, {alarm['Region']}]"
+                elif len(ALARM_REGIONS) > 1:
+                    name += f" [{alarm['Region']}]"
+                state = alarm['State']
+                description = alarm['Description'] or 'No description'
+                last_updated = alarm['Updated'].strftime('%Y-%m-%d %H:%M:%S') if alarm['Updated'] else 'unknown'
+                
+                response.add_item(
+                    f"{i+1}. {name} - State: {state}\n"
+                    f"   Description: {description}\n"
+                    f"   Last updated: {last_updated}\n"
+                )
+            
+            if alarm_count > MAX_ALARMS_LISTED:
+                response.add_item(f"...and {alarm_count - MAX_ALARMS_LISTED} more alarms")
+        
+        if failed_regions:
+            response.note("\nRegions not checked: " + ", ".join(
+                f"{region} ({describe_failure(error)})" for region, error in failed_regions.items()
+            ))
+    except Exception as e:
+        response = ResponseBuffer()
+        response.write(f"I couldn't retrieve your CloudWatch alarms. Error: {str(e)}")
+    
+    return response.respond(event, 'CheckCloudWatchAlarms')
@@ -0,0 +1,130 @@
+"""
+ConfigureAWSResource intent
+"""
+import os
+import re
+
+from cloud_assistant import jobs
+from cloud_assistant.lex import get_slot_value
+
+# S3 bucket naming rules, checked before a job is queued so the user hears about it now
+BUCKET_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$')
+
+# Session attribute remembering the last job, so "what's the status of my job" works
+LAST_JOB_ATTRIBUTE = 'lastJobId'
+
+def handle_configure_aws_resource(event, context=None):
+    """
+    Handler for ConfigureAWSResource intent
+    """
+    # Extract slot values
+    resource_type = get_slot_value(event, 'ResourceType')
+    configuration_name = get_slot_value(event, 'ConfigurationName')
+    region = get_slot_value(event, 'Region') or os.environ.get('AWS_REGION', 'us-east-1')
+    # Optional details passed through to the job
+    options = {}
+    for slot_name in ('InstanceType', 'InstanceId'):
+        value = get_slot_value(event, slot_name)
+        if value:
+            options[slot_name] = value
+    
+    print(f"Configuring {resource_type} with name {configuration_name}")
+    
+    session_attributes = dict(event['sessionState'].get('sessionAttributes') or {})
+    kind = resource_type.lower() if resource_type else None
+    
+    try:
+        if kind not in jobs.RESOURCE_LABELS:
+            response_content = f"I can't provision {resource_type} resources yet. " + \
+                "I can create an EC2 instance, an S3 bucket or a CloudWatch alarm for you."
+        
+        elif not configuration_name:
+            response_content = f"Please tell me what to name {jobs.RESOURCE_LABELS[kind]}."
+        
+        elif kind == 's3' and not BUCKET_NAME_PATTERN.match(configuration_name):
+            response_content = f"'{configuration_name}' isn't a valid S3 bucket name. " + \
+                "Bucket names are 3 to 63 lowercase letters, numbers, dots and hyphens."
+        
+        elif event['sessionState']['intent'].get('confirmationState') != 'Confirmed':
+            if event['sessionState']['intent'].get('confirmationState') == 'Denied':
+                response_content = f"OK, I won't create {jobs.RESOURCE_LABELS[kind]} named '{configuration_name}'."
+            else:
+                # Provisioning creates real, billable resources, so Lex asks the user first
+                return confirm_intent(event, session_attributes, kind, configuration_name, region)
+        
+        else:
+            # Provisioning runs in a separate worker invocation; this turn only records the job
+            job, created = jobs.submit(event, kind, configuration_name, region, options, context)
+            job_id = job['JobId']
+            session_attributes[LAST_JOB_ATTRIBUTE] = job_id
+            if created:
+                response_content = f"I've started provisioning {jobs.RESOURCE_LABELS[kind]} named '{configuration_name}' in {region}. " + \
+                    f"This runs in the background, so we can keep talking. Your job id is {job_id}; " + \
+                    f"ask me \"what's the status of job {job_id}\" to follow its progress."
+            elif job['Status'] == jobs.SUCCEEDED:
+                response_content = f"I've already provisioned {jobs.RESOURCE_LABELS[kind]} named '{configuration_name}' " + \
+                    f"for you as job {job_id}. Ask me \"what's the status of job {job_id}\" for the details."
+            else:
+                response_content = f"I'm already provisioning {jobs.RESOURCE_LABELS[kind]} named '{configuration_name}' " + \
+                    f"as job {job_id} ({job['Status']}). Ask me \"what's the status of job {job_id}\" to follow its progress."
+        
+        return {
+            'sessionState': {
+                'sessionAttributes': session_attributes,
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Fulfilled'
+                },
+                'intent': {
+                    'name': 'ConfigureAWSResource',
+                    'state': 'Fulfilled'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': response_content
+                }
+            ]
+        }
+    
+    except Exception as e:
+        print(f"Error in handle_configure_aws_resource: {str(e)}")
+        return {
+            'sessionState': {
+                'sessionAttributes': session_attributes,
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Failed'
+                },
+                'intent': {
+                    'name': 'ConfigureAWSResource',
+                    'state': 'Failed'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': f"I encountered an error while trying to configure your {resource_type} resource: {str(e)}"
+                }
+            ]
+        }
+
+def confirm_intent(event, session_attributes, kind, configuration_name, region):
+    """Ask the user to confirm the resource before any job is recorded"""
+    return {
+        'sessionState': {
+            'sessionAttributes': session_attributes,
+            'dialogAction': {
+                'type': 'ConfirmIntent'
+            },
+            'intent': dict(event['sessionState']['intent'], state='InProgress', confirmationState='None')
+        },
+        'messages': [
+            {
+                'contentType': 'PlainText',
+                'content': f"This will create {jobs.RESOURCE_LABELS[kind]} named '{configuration_name}' in {region} " +
+                    "in your AWS account, which may incur charges. Shall I go ahead?"
+            }
+        ]
+    }
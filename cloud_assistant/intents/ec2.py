@@ -0,0 +1,456 @@
+"""
+ListEC2Instances intent
+"""
+import os
+
+from cloud_assistant import accounts, aio, snapshot
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.clients import get_client
+from cloud_assistant.fanout import fan_out
+from cloud_assistant.instances import InstanceBatch
+from cloud_assistant.lex import get_slot_value
+from cloud_assistant.pages import ResponseBuffer
+from cloud_assistant.scheduler import call, describe_failure, paginate, paginate_async
+
+# Instances listed per region when scanning all regions, and for a single
+# region (paged with "show more")
+MAX_INSTANCES_PER_REGION = int(os.environ.get('MAX_INSTANCES_PER_REGION', '5'))
+MAX_INSTANCES_SINGLE_REGION = int(os.environ.get('MAX_INSTANCES_SINGLE_REGION', '500'))
+
+# Page size for describe_instances / describe_instance_status (API maximum is 1000)
+EC2_PAGE_SIZE = int(os.environ.get('EC2_PAGE_SIZE', '1000'))
+
+# Count "all regions" sweeps with describe_instance_status, which returns far
+# fewer fields per instance, and only fetch full details for the listed rows
+COUNT_ONLY_SWEEP = os.environ.get('EC2_COUNT_ONLY_SWEEP', 'true').lower() == 'true'
+
+# The region list practically never changes; per-region inventories are kept
+# briefly so follow-up questions on a warm container answer from memory
+region_cache = TTLCache(
+    'ec2-regions',
+    ttl=int(os.environ.get('REGION_CACHE_TTL', '86400')),
+    stale_ttl=int(os.environ.get('REGION_CACHE_STALE_TTL', '604800'))
+)
+inventory_cache = TTLCache(
+    'ec2-inventory',
+    ttl=int(os.environ.get('INVENTORY_CACHE_TTL', '60')),
+    stale_ttl=int(os.environ.get('INVENTORY_CACHE_STALE_TTL', '300'))
+)
+# Regions up to this many instances are kept as a columnar batch after a full,
+# unfiltered sweep; larger regions and every other sweep stream their counts
+BATCH_CACHE_MAX_INSTANCES = int(os.environ.get('BATCH_CACHE_MAX_INSTANCES', '20000'))
+
+# A cached batch serves every state filter of its region. Memory is bounded by
+# BATCH_CACHE_MAX_INSTANCES rows (about 16 bytes each plus names and tags) per region
+# and BATCH_CACHE_SIZE regions; batches are not JSON, so they stay out of the
+# persistent tier
+batch_cache = TTLCache(
+    'ec2-batches',
+    ttl=int(os.environ.get('INVENTORY_CACHE_TTL', '60')),
+    stale_ttl=int(os.environ.get('INVENTORY_CACHE_STALE_TTL', '300')),
+    max_entries=int(os.environ.get('BATCH_CACHE_SIZE', '32')),
+    persist_dir=''
+)
+
+def handle_list_ec2_instances(event, context=None):
+    """
+    Handler for ListEC2Instances intent
+    """
+    # Extract slot values
+    slots = event['sessionState']['intent']['slots']
+    region = get_slot_value(event, 'Region') or 'all'
+    instance_state = get_slot_value(event, 'InstanceState') or 'all'
+    # Optional filters answered from the inventory snapshot, e.g. "t3.large" and "team=payments"
+    instance_type = get_slot_value(event, 'InstanceType')
+    tag = get_slot_value(event, 'Tag')
+    # Account id or name when several accounts are configured ('all' by default)
+    account = get_slot_value(event, 'Account')
+    
+    try:
+        response = ResponseBuffer()
+        selected_accounts = accounts.select_accounts(account)
+        if instance_type or tag:
+            describe_snapshot_query(response, region, instance_state, instance_type, tag)
+        elif selected_accounts is not None:
+            describe_accounts(response, selected_accounts, region, instance_state, context)
+        elif region.lower() == 'all':
+            # Get all regions
+            regions = get_regions()
+            
+            # Query all regions concurrently within the invocation's time budget
+            if aio.AWS_ASYNC:
+                regional_results, skipped_regions, failed_regions = aio.run(
+                    aio.fan_out_async,
+                    lambda r: get_region_summary_async(r, instance_state, MAX_INSTANCES_PER_REGION, COUNT_ONLY_SWEEP),
+                    regions,
+                    context,
+                    context=context
+                )
+            else:
+                regional_results, skipped_regions, failed_regions = fan_out(
+                    lambda r: get_region_summary(r, instance_state, MAX_INSTANCES_PER_REGION, COUNT_ONLY_SWEEP),
+                    regions,
+                    context
+                )
+            summaries = [regional_results[r] for r in regions if regional_results.get(r) and regional_results[r]['Count']]
+            total_count = sum(summary['Count'] for summary in summaries)
+            
+            # Prepare response based on instance count
+            state_text = f" in the {instance_state} state" if instance_state.lower() != 'all' else ""
+            if not total_count:
+                scope = " in any region." if not (skipped_regions or failed_regions) else " in the regions I checked."
+                response.write(f"You don't have any EC2 instances{state_text}{scope}")
+            else:
+                scope = " across all regions:\n" if not (skipped_regions or failed_regions) else " across the regions I checked:\n"
+                response.write(f"I found {total_count} EC2 instances{state_text}{scope}")
+                
+                # One item per region so a region's rows stay on the same page
+                for summary in summaries:
+                    response.add_item(_region_block(summary, instance_state))
+            
+            if failed_regions:
+                degraded = [f"{r} ({describe_failure(failed_regions[r])})" for r in regions if r in failed_regions]
+                response.note(f"\n\nDegraded regions: {', '.join(degraded)}")
+            if skipped_regions:
+                response.note(f"\n\nRegions not scanned (time limit reached): {', '.join(skipped_regions)}")
+        else:
+            # List instances in the specified region
+            if aio.AWS_ASYNC:
+                summary = aio.run(get_region_summary_async, region, instance_state, MAX_INSTANCES_SINGLE_REGION, context=context)
+            else:
+                summary = get_region_summary(region, instance_state, MAX_INSTANCES_SINGLE_REGION)
+            state_text = f" in the {instance_state} state" if instance_state.lower() != 'all' else ""
+            
+            if not summary['Count']:
+                response.write(f"You don't have any EC2 instances{state_text} in the {region} region.")
+            else:
+                response.write(f"I found {summary['Count']} EC2 instances{state_text} in {region}:\n")
+                for i, instance in enumerate(summary['Instances']):
+                    response.add_item(f"{i+1}. {instance['InstanceId']} ({instance['State']}): {instance.get('Name', 'Unnamed')}")
+                if summary['Count'] > len(summary['Instances']):
+                    response.add_item(f"... and {summary['Count'] - len(summary['Instances'])} more instances")
+        
+        return response.respond(event, 'ListEC2Instances')
+    
+    except Exception as e:
+        print(f"Error in handle_list_ec2_instances: {str(e)}")
+        return {
+            'sessionState': {
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Failed'
+                },
+                'intent': {
+                    'name': 'ListEC2Instances',
+                    'state': 'Failed'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': f"I encountered an error while trying to list your EC2 instances: {str(e)}"
+                }
+            ]
+        }
+
+def _region_block(summary, instance_state, indent=""):
+    """A region's count, state breakdown and listed instances as one response item"""
+    lines = [f"{indent}Region {summary['Region']}: {summary['Count']} instances"]
+    if instance_state.lower() == 'all' and len(summary['States']) > 1:
+        breakdown = sorted(summary['States'].items(), key=lambda item: -item[1])
+        lines[0] += f" ({', '.join(f'{count} {state}' for state, count in breakdown)})"
+    for i, instance in enumerate(summary['Instances']):
+        lines.append(f"{indent}  {i+1}. {instance['InstanceId']} ({instance['State']}): {instance.get('Name', 'Unnamed')}")
+    if summary['Count'] > len(summary['Instances']):
+        lines.append(f"{indent}  ... and {summary['Count'] - len(summary['Instances'])} more instances")
+    return "\n".join(lines)
+
+def describe_accounts(response, selected_accounts, region, instance_state, context=None):
+    """Write an account x region instance summary into a ResponseBuffer"""
+    regions = get_regions if region.lower() == 'all' else [region]
+    results, skipped, failed = accounts.scan(
+        lambda r: get_region_summary(r, instance_state, MAX_INSTANCES_PER_REGION, COUNT_ONLY_SWEEP),
+        selected_accounts,
+        regions,
+        context
+    )
+    
+    by_account = {}
+    for (account_id, cell_region), summary in sorted(results.items()):
+        if summary and summary['Count']:
+            by_account.setdefault(account_id, []).append(summary)
+    total_count = sum(summary['Count'] for summaries in by_account.values() for summary in summaries)
+    
+    state_text = f" in the {instance_state} state" if instance_state.lower() != 'all' else ""
+    where = "" if region.lower() == 'all' else f" in {region}"
+    checked = "the accounts and regions I checked" if (skipped or failed) else \
+        f"{len(selected_accounts)} account{'s' if len(selected_accounts) != 1 else ''}"
+    if not total_count:
+        response.write(f"You don't have any EC2 instances{state_text}{where} in {checked}.")
+    else:
+        response.write(f"I found {total_count} EC2 instances{state_text}{where} across {checked}:\n")
+        # An account header, then one item per region so its rows stay on the same page
+        for account in selected_accounts:
+            summaries = by_account.get(account['Id'])
+            if not summaries:
+                continue
+            response.add_item(f"Account {accounts.account_label(account)}: {sum(s['Count'] for s in summaries)} instances")
+            for summary in summaries:
+                response.add_item(_region_block(summary, instance_state, indent="  "))
+    
+    if failed:
+        degraded = [
+            f"{account_id}{'/' + cell_region if cell_region else ''} ({describe_failure(error)})"
+            for (account_id, cell_region), error in sorted(failed.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+        ]
+        response.note(f"\n\nDegraded accounts/regions: {', '.join(degraded)}")
+    if skipped:
+        response.note(f"\n\nNot scanned (time limit reached): {', '.join(a + ('/' + r if r else '') for a, r in skipped)}")
+
+def describe_snapshot_query(response, region, instance_state, instance_type=None, tag=None):
+    """Write the answer to a filtered instance question, from the inventory snapshot, into a ResponseBuffer"""
+    filters = {
+        'region': None if region.lower() == 'all' else region,
+        'state': None if instance_state.lower() == 'all' else instance_state.lower(),
+        'instance_type': instance_type,
+        'tags': None
+    }
+    if tag:
+        key, _, value = tag.replace(':', '=', 1).partition('=')
+        filters['tags'] = {key.strip(): value.strip()}
+    
+    counts = snapshot.aggregate('ec2', 'region', **filters)
+    if counts is None:
+        response.write("Filtering by instance type or tag needs the inventory snapshot, which is not configured yet.")
+        return
+    age = snapshot.snapshot_age('ec2')
+    if age is None:
+        response.write("The inventory snapshot has not been built yet. Please try again after the next scheduled refresh.")
+        return
+    
+    description = ""
+    if filters['state']:
+        description += f"in the {instance_state} state "
+    description += f"in {region} " if filters['region'] else "across all regions "
+    if tag:
+        description += f"tagged {tag} "
+    total = sum(counts.values())
+    freshness = f"inventory snapshot from {int(age // 60)} minutes ago"
+    if age > snapshot.SNAPSHOT_MAX_AGE:
+        freshness += ", which may be out of date"
+    
+    if not total:
+        response.write(f"You don't have any {instance_type + ' ' if instance_type else ''}EC2 instances {description.strip()} ({freshness}).")
+        return
+    
+    response.write(f"I found {total} {instance_type + ' ' if instance_type else ''}EC2 instances {description.strip()} ({freshness}):\n")
+    if not filters['region'] and len(counts) > 1:
+        by_region = sorted(counts.items(), key=lambda item: -item[1])
+        response.write(", ".join(f"{counted_region}: {count}" for counted_region, count in by_region) + "\n")
+    instances = snapshot.query('ec2', limit=MAX_INSTANCES_SINGLE_REGION, **filters)
+    for i, instance in enumerate(instances):
+        response.add_item(f"{i+1}. {instance['ResourceId']} ({instance['State']}, {instance['InstanceType']}, {instance['Region']}): {instance['Name']}")
+    if total > len(instances):
+        response.add_item(f"... and {total - len(instances)} more instances")
+
+def get_regions():
+    """Names of all regions enabled for the account, cached across invocations"""
+    def load():
+        ec2_client = get_client('ec2', 'us-east-1')
+        response = call('ec2', 'us-east-1', ec2_client.describe_regions)
+        return [region['RegionName'] for region in response['Regions']]
+    
+    return region_cache.get_or_load('regions', load)
+
+def get_region_summary(region, state_filter='all', limit=MAX_INSTANCES_PER_REGION, count_only=False):
+    """summarize_region() served through the inventory cache"""
+    key = (region, state_filter.lower(), limit, count_only)
+    return inventory_cache.get_or_load(key, lambda: summarize_region(region, state_filter, limit, count_only))
+
+async def get_region_summary_async(region, state_filter='all', limit=MAX_INSTANCES_PER_REGION, count_only=False):
+    """get_region_summary() on the asyncio path"""
+    key = (region, state_filter.lower(), limit, count_only)
+    return await inventory_cache.get_or_load_async(key, lambda: summarize_region_async(region, state_filter, limit, count_only))
+
+def _state_filters(state_filter):
+    """describe_* filters for an optional instance state ('all' means no filter)"""
+    if state_filter.lower() == 'all':
+        return []
+    return [{
+        'Name': 'instance-state-name',
+        'Values': [state_filter.lower()]
+    }]
+
+def _instance_record(instance, region):
+    """Reduce a describe_instances instance to the fields the bot displays"""
+    # Get instance name from tags if available
+    tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+    name = tags.get('Name', "Unnamed")
+    
+    return {
+        'InstanceId': instance['InstanceId'],
+        'State': instance['State']['Name'],
+        'InstanceType': instance['InstanceType'],
+        'Name': name,
+        'Region': region,
+        'Tags': tags
+    }
+
+def _instance_params(state_filter, instance_ids=None):
+    params = {'Filters': _state_filters(state_filter)}
+    if instance_ids:
+        # MaxResults cannot be combined with InstanceIds
+        params['InstanceIds'] = instance_ids
+    else:
+        params['MaxResults'] = EC2_PAGE_SIZE
+    return params
+
+def iter_instances(region, state_filter='all', instance_ids=None):
+    """
+    Yield instance records for a region page by page, following NextToken, so
+    callers never hold more than one page of the API response in memory.
+    """
+    ec2 = get_client('ec2', region)
+    for page in paginate('ec2', region, ec2.describe_instances, **_instance_params(state_filter, instance_ids)):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                yield _instance_record(instance, region)
+
+async def iter_instances_async(region, state_filter='all', instance_ids=None):
+    """iter_instances() as an async generator over a non-blocking client"""
+    ec2 = await aio.get_client('ec2', region)
+    async for page in paginate_async('ec2', region, ec2.describe_instances, **_instance_params(state_filter, instance_ids)):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                yield _instance_record(instance, region)
+
+def iter_instance_ids(region, state_filter='all'):
+    """
+    Yield (instance id, state) for a region using describe_instance_status, which
+    returns only status fields and is much cheaper than describe_instances for
+    counting large fleets.
+    """
+    ec2 = get_client('ec2', region)
+    pages = paginate(
+        'ec2', region, ec2.describe_instance_status,
+        Filters=_state_filters(state_filter),
+        IncludeAllInstances=True,
+        MaxResults=EC2_PAGE_SIZE
+    )
+    for page in pages:
+        for status in page['InstanceStatuses']:
+            yield status['InstanceId'], status['InstanceState']['Name']
+
+async def iter_instance_ids_async(region, state_filter='all'):
+    """iter_instance_ids() as an async generator over a non-blocking client"""
+    ec2 = await aio.get_client('ec2', region)
+    pages = paginate_async(
+        'ec2', region, ec2.describe_instance_status,
+        Filters=_state_filters(state_filter),
+        IncludeAllInstances=True,
+        MaxResults=EC2_PAGE_SIZE
+    )
+    async for page in pages:
+        for status in page['InstanceStatuses']:
+            yield status['InstanceId'], status['InstanceState']['Name']
+
+def load_region_batch(region):
+    """Every instance in a region as an InstanceBatch, swept in one pass"""
+    batch = InstanceBatch()
+    for instance in iter_instances(region):
+        batch.append_record(instance)
+    return batch
+
+class _RegionSweep:
+    """
+    Streaming aggregation of one region sweep: per-state counts and the first
+    `limit` rows, plus a batch for the cache while the region is small enough.
+    Memory stays constant once the batch has been given up.
+    """
+    
+    def __init__(self, region, limit, keep_batch):
+        self.region = region
+        self.limit = limit
+        self.states = {}
+        self.displayed = []
+        self.batch = InstanceBatch() if keep_batch else None
+    
+    def add(self, instance_id, state, record=None):
+        self.states[state] = self.states.get(state, 0) + 1
+        if len(self.displayed) < self.limit:
+            self.displayed.append(record if record is not None else instance_id)
+        if self.batch is not None:
+            if len(self.batch) >= BATCH_CACHE_MAX_INSTANCES:
+                self.batch = None
+            else:
+                self.batch.append_record(record)
+    
+    def summary(self, displayed):
+        if self.batch is not None:
+            batch_cache.set(self.region, self.batch)
+        return {'Region': self.region, 'Count': sum(self.states.values()), 'States': self.states, 'Instances': displayed}
+
+def _from_batch(region, batch, state_filter, limit):
+    where = None if state_filter.lower() == 'all' else {'state': state_filter.lower()}
+    displayed = [record.as_dict() for record in batch.select(where, limit)]
+    return {'Region': region, 'Count': batch.count(where), 'States': batch.count_by('state'), 'Instances': displayed}
+
+def summarize_region(region, state_filter='all', limit=MAX_INSTANCES_PER_REGION, count_only=False):
+    """
+    Exact count, per-state counts and the first `limit` display records for a
+    region:
+        
+        {'Region': region, 'Count': 1234, 'States': {'running': 1000, ...},
+         'Instances': [<= limit records]}
+    
+    A fresh cached batch of the region answers any state filter without calling
+    AWS; a stale one is not used, so refreshes of the summary cache sweep again.
+    Otherwise the region is streamed with the state filter applied by the API;
+    with count_only the sweep uses describe_instance_status and full details are
+    fetched only for the instances that are displayed.
+    """
+    batch = batch_cache.get(region, max_age=batch_cache.ttl)
+    if batch is not None:
+        return _from_batch(region, batch, state_filter, limit)
+    
+    sweep = _RegionSweep(region, limit, keep_batch=not count_only and state_filter.lower() == 'all')
+    if count_only:
+        for instance_id, state in iter_instance_ids(region, state_filter):
+            sweep.add(instance_id, state)
+        instance_ids = sweep.displayed
+        details = {}
+        if instance_ids:
+            details = {instance['InstanceId']: instance for instance in iter_instances(region, instance_ids=instance_ids)}
+        return sweep.summary([details[instance_id] for instance_id in instance_ids if instance_id in details])
+    
+    for instance in iter_instances(region, state_filter):
+        sweep.add(instance['InstanceId'], instance['State'], instance)
+    return sweep.summary(sweep.displayed)
+
+async def summarize_region_async(region, state_filter='all', limit=MAX_INSTANCES_PER_REGION, count_only=False):
+    """summarize_region() on the asyncio path"""
+    batch = batch_cache.get(region, max_age=batch_cache.ttl)
+    if batch is not None:
+        return _from_batch(region, batch, state_filter, limit)
+    
+    sweep = _RegionSweep(region, limit, keep_batch=not count_only and state_filter.lower() == 'all')
+    if count_only:
+        async for instance_id, state in iter_instance_ids_async(region, state_filter):
+            sweep.add(instance_id, state)
+        instance_ids = sweep.displayed
+        details = {}
+        if instance_ids:
+            details = {instance['InstanceId']: instance async for instance in iter_instances_async(region, instance_ids=instance_ids)}
+        return sweep.summary([details[instance_id] for instance_id in instance_ids if instance_id in details])
+    
+    async for instance in iter_instances_async(region, state_filter):
+        sweep.add(instance['InstanceId'], instance['State'], instance)
+    return sweep.summary(sweep.displayed)
+
+def get_instances_in_region(region, state_filter='all'):
+    """Helper function to get EC2 instances in a specific region with optional state filter"""
+    try:
+        return list(iter_instances(region, state_filter))
+    except Exception as e:
+        print(f"Error getting instances in {region}: {str(e)}")
+        return []
@@ -0,0 +1,51 @@
+"""
+CheckJobStatus intent
+"""
+from cloud_assistant import jobs
+from cloud_assistant.intents.configure import LAST_JOB_ATTRIBUTE
+from cloud_assistant.lex import get_slot_value
+
+def handle_check_job_status(event, context=None):
+    """
+    Handler for CheckJobStatus intent: progress of a provisioning job, read
+    from the job store
+    """
+    session_attributes = event['sessionState'].get('sessionAttributes') or {}
+    # Without a job id, report on the last job started in this session
+    job_id = get_slot_value(event, 'JobId') or session_attributes.get(LAST_JOB_ATTRIBUTE)
+    
+    try:
+        if not job_id:
+            response_content = "Which job would you like to check? Tell me its job id."
+        else:
+            job = jobs.get_job(job_id.strip().lower())
+            if job is None:
+                response_content = f"I couldn't find a job with id {job_id}. Finished jobs are only kept for a limited time."
+            else:
+                jobs.resume_if_stalled(job, context)
+                response_content = jobs.describe_job(job)
+        fulfillment_state = 'Fulfilled'
+    except Exception as e:
+        print(f"Error in handle_check_job_status: {str(e)}")
+        response_content = f"I couldn't check the status of job {job_id}. Error: {str(e)}"
+        fulfillment_state = 'Failed'
+    
+    return {
+        'sessionState': {
+            'sessionAttributes': session_attributes,
+            'dialogAction': {
+                'type': 'Close',
+                'fulfillmentState': fulfillment_state
+            },
+            'intent': {
+                'name': 'CheckJobStatus',
+                'state': fulfillment_state
+            }
+        },
+        'messages': [
+            {
+                'contentType': 'PlainText',
+                'content': response_content
+            }
+        ]
+    }
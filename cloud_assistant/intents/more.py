@@ -0,0 +1,32 @@
+"""
+ShowMoreResults intent
+"""
+from cloud_assistant.pages import next_page
+
+def handle_show_more(event, context=None):
+    """
+    Handler for ShowMoreResults intent: the next page of the previous answer
+    """
+    response = next_page(event, 'ShowMoreResults')
+    if response is not None:
+        return response
+    
+    return {
+        'sessionState': {
+            'sessionAttributes': event['sessionState'].get('sessionAttributes') or {},
+            'dialogAction': {
+                'type': 'Close',
+                'fulfillmentState': 'Fulfilled'
+            },
+            'intent': {
+                'name': 'ShowMoreResults',
+                'state': 'Fulfilled'
+            }
+        },
+        'messages': [
+            {
+                'contentType': 'PlainText',
+                'content': "There's nothing more to show. Ask me about your instances, buckets or alarms first."
+            }
+        ]
+    }
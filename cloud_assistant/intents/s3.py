@@ -0,0 +1,124 @@
+"""
+DescribeS3Buckets intent
+"""
+from cloud_assistant import accounts, aio
+from cloud_assistant.bucket_listing import (
+    describe_bucket_overview, list_buckets_across_accounts, list_buckets_enriched, list_buckets_enriched_async
+)
+from cloud_assistant.bucket_stats import describe_stats, get_bucket_stats
+from cloud_assistant.clients import get_client
+from cloud_assistant.lex import get_slot_value
+from cloud_assistant.scheduler import call, describe_failure
+
+def handle_describe_s3_buckets(event, context=None):
+    """
+    Handler for DescribeS3Buckets intent
+    """
+    # Extract slot values
+    bucket_name = get_slot_value(event, 'BucketName')
+    # Optional slot: "exact" asks for a live count instead of metrics/inventory
+    count_mode = get_slot_value(event, 'CountMode') or 'estimate'
+    # Account id or name when several accounts are configured ('all' by default)
+    account = get_slot_value(event, 'Account')
+    
+    try:
+        s3 = get_client('s3')
+        
+        if bucket_name:
+            # Describe specific bucket
+            try:
+                # Check if bucket exists
+                location = call('s3', s3.meta.region_name, s3.get_bucket_location, Bucket=bucket_name)
+                region = location['LocationConstraint'] or 'us-east-1'
+                
+                # Object count and size come from metrics, inventory or a bounded live listing
+                stats = get_bucket_stats(bucket_name, region, count_mode.lower() == 'exact', context)
+                
+                # A few sample objects
+                regional_s3 = get_client('s3', region)
+                objects = call('s3', region, regional_s3.list_objects_v2, Bucket=bucket_name, MaxKeys=5)
+                
+                # Get bucket policy status if available
+                try:
+                    policy = call('s3', s3.meta.region_name, s3.get_bucket_policy_status, Bucket=bucket_name)
+                    is_public = policy.get('PolicyStatus', {}).get('IsPublic', False)
+                except:
+                    is_public = "Unknown"
+                
+                # Format response
+                response_content = f"Here's information about your S3 bucket '{bucket_name}':\n\n"
+                response_content += f"Region: {region}\n"
+                response_content += describe_stats(stats)
+                response_content += f"Public Access: {is_public if is_public == 'Unknown' else ('Yes' if is_public else 'No')}\n\n"
+                
+                if objects.get('Contents'):
+                    response_content += "Sample objects:\n"
+                    for i, obj in enumerate(objects.get('Contents', [])[:5]):
+                        size_mb = obj.get('Size', 0) / (1024 * 1024)
+                        response_content += f"{i+1}. {obj.get('Key')} ({size_mb:.2f} MB)\n"
+                    if stats['objects'] > 5:
+                        response_content += f"...and {stats['objects'] - 5:,} more objects\n"
+            except Exception as e:
+                response_content = f"I couldn't find information about bucket '{bucket_name}'. Error: {str(e)}"
+        else:
+            # List all buckets, enriched with region, public access and size
+            selected_accounts = accounts.select_accounts(account)
+            failed_accounts = {}
+            if selected_accounts is None and aio.AWS_ASYNC:
+                buckets, pending = aio.run(list_buckets_enriched_async, context, context=context)
+            elif selected_accounts is None:
+                buckets, pending = list_buckets_enriched(context)
+            else:
+                buckets, pending, failed_accounts = list_buckets_across_accounts(selected_accounts, context)
+            
+            if not buckets:
+                response_content = "You don't have any S3 buckets in your account." if selected_accounts is None else \
+                    "You don't have any S3 buckets in the accounts I checked."
+            else:
+                response_content = describe_bucket_overview(buckets, pending, account_list=selected_accounts)
+                response_content += "\nTo get more details about a specific bucket, you can ask me about it by name."
+            if failed_accounts:
+                response_content += "\n\nAccounts not checked: " + ", ".join(
+                    f"{account_id} ({describe_failure(error) if error else 'time limit reached'})"
+                    for account_id, error in failed_accounts.items()
+                )
+        
+        return {
+            'sessionState': {
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Fulfilled'
+                },
+                'intent': {
+                    'name': 'DescribeS3Buckets',
+                    'state': 'Fulfilled'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': response_content
+                }
+            ]
+        }
+    
+    except Exception as e:
+        print(f"Error in handle_describe_s3_buckets: {str(e)}")
+        return {
+            'sessionState': {
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Failed'
+                },
+                'intent': {
+                    'name': 'DescribeS3Buckets',
+                    'state': 'Failed'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': f"I encountered an error while trying to retrieve S3 bucket information: {str(e)}"
+                }
+            ]
+        }
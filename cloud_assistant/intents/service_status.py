@@ -0,0 +1,103 @@
+"""
+GetAWSServiceStatus intent
+"""
+from datetime import datetime
+
+from cloud_assistant.health import HealthUnavailableError, get_health, open_events
+from cloud_assistant.lex import get_slot_value
+from cloud_assistant.pages import ResponseBuffer
+from cloud_assistant.scheduler import describe_failure, error_code
+
+# Services always listed when the user asks about all of them
+DEFAULT_SERVICES = ['ec2', 's3', 'cloudwatch', 'lambda', 'dynamodb', 'rds']
+
+# Longest event description quoted in a response
+MAX_DESCRIPTION_CHARS = 300
+
+def _format_time(value):
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M UTC')
+    except (TypeError, ValueError):
+        return value or 'unknown time'
+
+def _describe_event(event):
+    kind = (event['Type'] or 'issue').replace('AWS_', '').replace('_', ' ').lower()
+    text = f"- {kind} in {event['Region']} since {_format_time(event['StartTime'])}"
+    if event.get('Description'):
+        description = " ".join(event['Description'].split())
+        if len(description) > MAX_DESCRIPTION_CHARS:
+            description = description[:MAX_DESCRIPTION_CHARS - 3] + "..."
+        text += f": {description}"
+    return text
+
+def handle_aws_service_status(event, context=None):
+    """
+    Handler for GetAWSServiceStatus intent
+    """
+    # Extract slot values
+    service_name = get_slot_value(event, 'ServiceName') or 'all'
+    region = get_slot_value(event, 'Region')
+    
+    try:
+        # Open issues from the health provider, served from the cache
+        snapshot = get_health(context)
+        checked = _format_time(snapshot['CheckedAt'])
+        events = open_events(snapshot, region=region)
+        where = f" in {region}" if region else ""
+        # A busy health feed is paged like the other lists, within the Lex message limits
+        response = ResponseBuffer()
+        
+        if service_name.lower() == 'all':
+            # Check all services, plus any other service with an open issue
+            affected = {}
+            for health_event in events:
+                affected.setdefault((health_event['Service'] or 'unknown').lower(), []).append(health_event)
+            services = DEFAULT_SERVICES + sorted(set(affected) - set(DEFAULT_SERVICES))
+            
+            response.write(f"Current AWS service status{where} (checked {checked}):\n\n")
+            for service in services:
+                if service in affected:
+                    regions = sorted({e['Region'] for e in affected[service]})
+                    response.add_item(f"{service.upper()}: Degraded - {len(affected[service])} open issue(s) in {', '.join(regions)}")
+                else:
+                    response.add_item(f"{service.upper()}: Operational - No open issues")
+        else:
+            # Check specific service
+            service_events = open_events(snapshot, service=service_name, region=region)
+            response.write(f"Status of AWS {service_name.upper()}{where} (checked {checked}):\n\n")
+            if service_events:
+                response.write(f"Degraded - {len(service_events)} open issue(s):\n")
+                for health_event in service_events:
+                    response.add_item(_describe_event(health_event))
+            else:
+                response.write("Operational - No open issues reported")
+        
+        return response.respond(event, 'GetAWSServiceStatus')
+    
+    except Exception as e:
+        print(f"Error in handle_aws_service_status: {str(e)}")
+        if error_code(e) == 'SubscriptionRequiredException':
+            reason = "the AWS Health API needs a Business, Enterprise On-Ramp or Enterprise support plan"
+        elif isinstance(e, HealthUnavailableError):
+            reason = str(e)
+        else:
+            reason = describe_failure(e)
+        return {
+            'sessionState': {
+                'dialogAction': {
+                    'type': 'Close',
+                    'fulfillmentState': 'Failed'
+                },
+                'intent': {
+                    'name': 'GetAWSServiceStatus',
+                    'state': 'Failed'
+                }
+            },
+            'messages': [
+                {
+                    'contentType': 'PlainText',
+                    'content': f"I couldn't check AWS service status right now ({reason}). " + \
+                        "Please check the AWS Health Dashboard for current status."
+                }
+            ]
+        }
@@ -0,0 +1,649 @@
+"""
+Asynchronous provisioning jobs for ConfigureAWSResource
+
+Provisioning takes far longer than a Lex turn, so the intent only records a
+job and returns its id. The job then runs in a separate, asynchronous
+invocation of the same function (an event {'source': 'cloud-assistant.jobs',
+'jobId': ...}), one step at a time:
+
+    ec2         resolve_image, launch, wait_until_running
+    s3          create_bucket, block_public_access, encrypt, tag
+    cloudwatch  create_alarm, verify_alarm
+
+Every finished step is checkpointed in the job store with its outputs (the
+instance id, for example). A worker that runs low on time hands the job to a
+fresh invocation, and a retried or duplicated invocation resumes after the last
+finished step. Steps are safe to repeat: instances are launched with a
+ClientToken derived from the job id, and the bucket, public access block,
+encryption, tag and alarm writes are idempotent. A lease on the job keeps two
+workers from running it at the same time.
+
+JOB_STORE selects the store:
+
+    sqlite:/tmp/jobs.db        local file, for tests and single-host runs
+    dynamodb:<table name>      table keyed on 'job_id' with TTL on 'expires_at'
+
+A worker invocation usually runs in another container, which cannot see a file
+under /tmp. When jobs are handed to a Lambda worker (JOB_WORKER_FUNCTION is
+set, or the code runs in Lambda), get_store() therefore raises
+JobStoreConfigError unless JOB_STORE names a shared store, and the intents
+answer with that error. Local runs without JOB_STORE use LOCAL_JOB_STORE.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from cloud_assistant.fanout import get_time_budget
+
+# Job store specification; deployed functions must use a DynamoDB table
+JOB_STORE = os.environ.get('JOB_STORE', '')
+
+# Store used when JOB_STORE is not set and jobs run on a local thread, sharing the host
+LOCAL_JOB_STORE = 'sqlite:/tmp/cloud-assistant-jobs.db'
+
+# Function invoked asynchronously to run jobs (default: the function handling
+# the intent). Without a function name, e.g. in local runs, jobs run on a thread.
+JOB_WORKER_FUNCTION = os.environ.get('JOB_WORKER_FUNCTION', '')
+
+# How long a worker holds a job before another invocation may take it over (seconds)
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '900'))
+
+# Time a worker keeps in reserve; with less left it hands the job on (seconds)
+JOB_HANDOFF_SECONDS = float(os.environ.get('JOB_HANDOFF_SECONDS', '10'))
+
+# Delay between checks while a step waits for AWS (seconds)
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '5'))
+
+# Longest a single step may wait for AWS before the job fails (seconds)
+JOB_MAX_WAIT_SECONDS = int(os.environ.get('JOB_MAX_WAIT_SECONDS', '1800'))
+
+# How long jobs can be looked up after they were last updated (seconds)
+JOB_RECORD_TTL = int(os.environ.get('JOB_RECORD_TTL', str(7 * 24 * 3600)))
+
+# What the jobs create
+JOB_EC2_IMAGE_PARAMETER = os.environ.get(
+    'JOB_EC2_IMAGE_PARAMETER', '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64'
+)
+JOB_EC2_INSTANCE_TYPE = os.environ.get('JOB_EC2_INSTANCE_TYPE', 't3.micro')
+JOB_ALARM_THRESHOLD = float(os.environ.get('JOB_ALARM_THRESHOLD', '80'))
+
+# Source of the events that run a job
+JOB_EVENT_SOURCE = 'cloud-assistant.jobs'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATES = {SUCCEEDED, FAILED}
+
+RESOURCE_LABELS = {
+    'ec2': 'an EC2 instance',
+    's3': 'an S3 bucket',
+    'cloudwatch': 'a CloudWatch alarm',
+}
+
+class JobStoreConfigError(RuntimeError):
+    """Raised when workers in other containers could not see the configured job store"""
+
+def check_store_config(spec, worker_function=None, in_lambda=None):
+    """Raise JobStoreConfigError if spec is missing or local to this container but jobs run elsewhere"""
+    if worker_function is None:
+        worker_function = JOB_WORKER_FUNCTION
+    if in_lambda is None:
+        in_lambda = bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+    if not spec:
+        if worker_function or in_lambda:
+            raise JobStoreConfigError(
+                "JOB_STORE is not set, so a worker invocation could not read the job; "
+                "set JOB_STORE to 'dynamodb:<table name>'"
+            )
+        return
+    backend, _, target = spec.partition(':')
+    local = backend == 'sqlite' and os.path.realpath(target).startswith('/tmp/')
+    if local and (worker_function or in_lambda):
+        raise JobStoreConfigError(
+            f"JOB_STORE is '{spec}', which a worker invocation in another container cannot read; "
+            "set JOB_STORE to 'dynamodb:<table name>'"
+        )
+
+class StepPending(Exception):
+    """Raised by a step that is waiting for AWS; the step runs again after JOB_POLL_INTERVAL"""
+
+def _call(service, job, operation, **params):
+    from cloud_assistant.clients import get_client
+    from cloud_assistant.scheduler import call
+    client = get_client(service, job['Region'])
+    return call(service, job['Region'], getattr(client, operation), **params)
+
+def _tags(job):
+    return [{'Key': 'Name', 'Value': job['Name']}, {'Key': 'cloud-assistant:job', 'Value': job['JobId']}]
+
+def _resolve_image(job, checkpoint):
+    parameter = _call('ssm', job, 'get_parameter', Name=JOB_EC2_IMAGE_PARAMETER)
+    return {'ImageId': parameter['Parameter']['Value']}
+
+def _launch_instance(job, checkpoint):
+    # A repeated launch with the same client token returns the first launch's instance
+    response = _call(
+        'ec2', job, 'run_instances',
+        ImageId=checkpoint['ImageId'],
+        InstanceType=job['Options'].get('InstanceType') or JOB_EC2_INSTANCE_TYPE,
+        MinCount=1,
+        MaxCount=1,
+        ClientToken=f"cloud-assistant-{job['JobId']}",
+        TagSpecifications=[{'ResourceType': 'instance', 'Tags': _tags(job)}]
+    )
+    return {'InstanceId': response['Instances'][0]['InstanceId']}
+
+def _wait_until_running(job, checkpoint):
+    from cloud_assistant.scheduler import error_code
+    instance_id = checkpoint['InstanceId']
+    try:
+        response = _call('ec2', job, 'describe_instances', InstanceIds=[instance_id])
+    except Exception as e:
+        # New instances take a moment to become visible to DescribeInstances
+        if error_code(e) == 'InvalidInstanceID.NotFound':
+            raise StepPending(f"{instance_id} is not visible yet")
+        raise
+    instances = [i for r in response.get('Reservations', []) for i in r.get('Instances', [])]
+    if not instances or instances[0]['State']['Name'] == 'pending':
+        raise StepPending(f"{instance_id} is starting")
+    state = instances[0]['State']['Name']
+    if state != 'running':
+        raise RuntimeError(f"instance {instance_id} is {state}")
+    return {'PublicIpAddress': instances[0].get('PublicIpAddress')}
+
+def _create_bucket(job, checkpoint):
+    from cloud_assistant.scheduler import error_code
+    params = {'Bucket': job['Name']}
+    # us-east-1 is the one region that rejects a location constraint
+    if job['Region'] != 'us-east-1':
+        params['CreateBucketConfiguration'] = {'LocationConstraint': job['Region']}
+    try:
+        _call('s3', job, 'create_bucket', **params)
+    except Exception as e:
+        if error_code(e) != 'BucketAlreadyOwnedByYou':
+            raise
+    return {'Bucket': job['Name']}
+
+def _block_public_access(job, checkpoint):
+    _call(
+        's3', job, 'put_public_access_block',
+        Bucket=job['Name'],
+        PublicAccessBlockConfiguration={
+            'BlockPublicAcls': True,
+            'IgnorePublicAcls': True,
+            'BlockPublicPolicy': True,
+            'RestrictPublicBuckets': True
+        }
+    )
+
+def _encrypt_bucket(job, checkpoint):
+    _call(
+        's3', job, 'put_bucket_encryption',
+        Bucket=job['Name'],
+        ServerSideEncryptionConfiguration={
+            'Rules': [{'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'}}]
+        }
+    )
+
+def _tag_bucket(job, checkpoint):
+    _call('s3', job, 'put_bucket_tagging', Bucket=job['Name'], Tagging={'TagSet': _tags(job)})
+
+def _create_alarm(job, checkpoint):
+    params = {}
+    if job['Options'].get('InstanceId'):
+        params['Dimensions'] = [{'Name': 'InstanceId', 'Value': job['Options']['InstanceId']}]
+    _call(
+        'cloudwatch', job, 'put_metric_alarm',
+        AlarmName=job['Name'],
+        AlarmDescription=f"Created by Cloud Assistant job {job['JobId']}",
+        Namespace='AWS/EC2',
+        MetricName='CPUUtilization',
+        Statistic='Average',
+        Period=300,
+        EvaluationPeriods=2,
+        Threshold=JOB_ALARM_THRESHOLD,
+        ComparisonOperator='GreaterThanThreshold',
+        Tags=_tags(job),
+        **params
+    )
+
+def _verify_alarm(job, checkpoint):
+    response = _call('cloudwatch', job, 'describe_alarms', AlarmNames=[job['Name']], AlarmTypes=['MetricAlarm'])
+    alarms = response.get('MetricAlarms', [])
+    if not alarms:
+        raise StepPending(f"{job['Name']} is not visible yet")
+    return {'AlarmState': alarms[0]['StateValue']}
+
+# Ordered (name, description, function) steps of each resource type. A step
+# returns a dict of outputs for the checkpoint, or None.
+STEPS = {
+    'ec2': [
+        ('resolve_image', "looking up the latest Amazon Linux image", _resolve_image),
+        ('launch', "launching the instance", _launch_instance),
+        ('wait_until_running', "waiting for the instance to start", _wait_until_running),
+    ],
+    's3': [
+        ('create_bucket', "creating the bucket", _create_bucket),
+        ('block_public_access', "blocking public access", _block_public_access),
+        ('encrypt', "turning on default encryption", _encrypt_bucket),
+        ('tag', "tagging the bucket", _tag_bucket),
+    ],
+    'cloudwatch': [
+        ('create_alarm', "creating the alarm", _create_alarm),
+        ('verify_alarm', "checking the alarm is active", _verify_alarm),
+    ],
+}
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file, shared by processes on one host"""
+    
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, idempotency_key TEXT, status TEXT, owner TEXT, "
+                "lease_until REAL, record TEXT, expires_at REAL);"
+                "CREATE INDEX IF NOT EXISTS jobs_idempotency_key ON jobs (idempotency_key);"
+            )
+        finally:
+            conn.close()
+    
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+    
+    def create(self, job):
+        """Insert job unless a job with its idempotency key exists and has not failed; returns (job, created)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT record FROM jobs WHERE idempotency_key = ? AND status != ? AND expires_at > ? "
+                "ORDER BY rowid DESC LIMIT 1",
+                (job['IdempotencyKey'], FAILED, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return json.loads(row[0]), False
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, NULL, 0, ?, ?)",
+                (job['JobId'], job['IdempotencyKey'], job['Status'], json.dumps(job), now + JOB_RECORD_TTL)
+            )
+            conn.execute("COMMIT")
+            return job, True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT record FROM jobs WHERE job_id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row is not None else None
+    
+    def claim(self, job_id, owner, lease_seconds):
+        """Lease an unfinished job no live worker holds; returns the job, or None"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT record, status, owner, lease_until FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None or row[1] in FINISHED_STATES or (row[2] not in (None, owner) and row[3] > now):
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ?", (owner, now + lease_seconds, job_id)
+            )
+            conn.execute("COMMIT")
+            return json.loads(row[0])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def save(self, job, owner, release=False):
+        """Write back a job leased by owner, extending or releasing the lease; False if the lease was lost"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET record = ?, status = ?, owner = ?, lease_until = ?, expires_at = ? "
+                "WHERE job_id = ? AND owner = ?",
+                (
+                    json.dumps(job), job['Status'], None if release else owner,
+                    0 if release else now + JOB_LEASE_SECONDS, now + JOB_RECORD_TTL,
+                    job['JobId'], owner
+                )
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+class DynamoDBJobStore:
+    """
+    Jobs in a DynamoDB table keyed on 'job_id'. Idempotency keys are separate
+    items ('key#<hash>') pointing at the job that holds them.
+    """
+    
+    def __init__(self, table_name):
+        self.table_name = table_name
+    
+    def _call(self, operation, **params):
+        from cloud_assistant.clients import get_client
+        from cloud_assistant.scheduler import call
+        client = get_client('dynamodb')
+        return call('dynamodb', client.meta.region_name, getattr(client, operation), **params)
+    
+    def _conditional(self, operation, **params):
+        """Run a conditional write; False if its condition did not hold"""
+        from botocore.exceptions import ClientError
+        try:
+            self._call(operation, TableName=self.table_name, **params)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+    
+    def _get_item(self, key, include_expired=False):
+        item = self._call(
+            'get_item', TableName=self.table_name, Key={'job_id': {'S': key}}, ConsistentRead=True
+        ).get('Item')
+        # TTL deletion lags, so expired items are filtered here
+        if not item or (not include_expired and float(item['expires_at']['N']) <= time.time()):
+            return None
+        return item
+    
+    def create(self, job):
+        key = f"key#{job['IdempotencyKey']}"
+        expires_at = {'N': str(int(time.time() + JOB_RECORD_TTL))}
+        key_item = {'job_id': {'S': key}, 'target': {'S': job['JobId']}, 'expires_at': expires_at}
+        if not self._conditional('put_item', Item=key_item, ConditionExpression='attribute_not_exists(job_id)'):
+            existing_item = self._get_item(key, include_expired=True)
+            existing = self.get(existing_item['target']['S']) if existing_item else None
+            if existing is not None and existing['Status'] != FAILED:
+                return existing, False
+            # The earlier job failed or expired, so this one takes over the key
+            taken = self._conditional(
+                'put_item',
+                Item=key_item,
+                ConditionExpression='attribute_not_exists(job_id) OR #t = :old',
+                ExpressionAttributeNames={'#t': 'target'},
+                ExpressionAttributeValues={':old': existing_item['target'] if existing_item else {'S': ''}}
+            )
+            if not taken:
+                # A concurrent request took it over first; share its job
+                return self.get(self._get_item(key)['target']['S']), False
+        self._call(
+            'put_item',
+            TableName=self.table_name,
+            Item={
+                'job_id': {'S': job['JobId']},
+                'record': {'S': json.dumps(job)},
+                'status': {'S': job['Status']},
+                'lease_until': {'N': '0'},
+                'expires_at': expires_at
+            }
+        )
+        return job, True
+    
+    def get(self, job_id):
+        item = self._get_item(job_id)
+        return json.loads(item['record']['S']) if item else None
+    
+    def claim(self, job_id, owner, lease_seconds):
+        from botocore.exceptions import ClientError
+        now = time.time()
+        try:
+            item = self._call(
+                'update_item',
+                TableName=self.table_name,
+                Key={'job_id': {'S': job_id}},
+                UpdateExpression='SET #o = :owner, lease_until = :until',
+                ConditionExpression=(
+                    '#s IN (:queued, :running) AND '
+                    '(attribute_not_exists(#o) OR #o = :owner OR lease_until < :now)'
+                ),
+                ExpressionAttributeNames={'#o': 'owner', '#s': 'status'},
+                ExpressionAttributeValues={
+                    ':owner': {'S': owner},
+                    ':until': {'N': str(now + lease_seconds)},
+                    ':now': {'N': str(now)},
+                    ':queued': {'S': QUEUED},
+                    ':running': {'S': RUNNING}
+                },
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+        return json.loads(item['record']['S'])
+    
+    def save(self, job, owner, release=False):
+        now = time.time()
+        if release:
+            update = 'SET #r = :r, #s = :s, expires_at = :e, lease_until = :zero REMOVE #o'
+            values = {':zero': {'N': '0'}}
+        else:
+            update = 'SET #r = :r, #s = :s, expires_at = :e, lease_until = :until'
+            values = {':until': {'N': str(now + JOB_LEASE_SECONDS)}}
+        values.update({
+            ':r': {'S': json.dumps(job)},
+            ':s': {'S': job['Status']},
+            ':e': {'N': str(int(now + JOB_RECORD_TTL))},
+            ':owner': {'S': owner}
+        })
+        return self._conditional(
+            'update_item',
+            Key={'job_id': {'S': job['JobId']}},
+            UpdateExpression=update,
+            ConditionExpression='#o = :owner',
+            ExpressionAttributeNames={'#r': 'record', '#s': 'status', '#o': 'owner'},
+            ExpressionAttributeValues=values
+        )
+
+def create_store(spec):
+    """Build a store from a 'sqlite:<path>' or 'dynamodb:<table>' spec"""
+    backend, _, target = spec.partition(':')
+    if backend == 'sqlite':
+        return SQLiteJobStore(target)
+    if backend == 'dynamodb':
+        return DynamoDBJobStore(target)
+    raise ValueError(f"Unknown job store: {spec}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Store configured by JOB_STORE, created once per container"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                check_store_config(JOB_STORE)
+                _store = create_store(JOB_STORE or LOCAL_JOB_STORE)
+    return _store
+
+def idempotency_key(event, resource_type, name, region):
+    """Key under which one Lex session can only have one live job per resource"""
+    raw = json.dumps([event.get('sessionId'), resource_type, name.strip().lower(), region])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def dispatch(job_id, context=None):
+    """Start a worker invocation for a job"""
+    function_name = JOB_WORKER_FUNCTION or getattr(context, 'function_name', None)
+    if not function_name:
+        threading.Thread(target=run_job, args=(job_id,), daemon=True).start()
+        return
+    from cloud_assistant.clients import get_client
+    from cloud_assistant.scheduler import call
+    client = get_client('lambda')
+    call(
+        'lambda', client.meta.region_name, client.invoke,
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'source': JOB_EVENT_SOURCE, 'jobId': job_id}).encode('utf-8')
+    )
+
+def submit(event, resource_type, name, region, options=None, context=None, store=None):
+    """
+    Record a provisioning job and start a worker for it, without waiting for
+    any AWS work. A repeated request from the same Lex session for the same
+    resource gets the job already recorded for it, unless that one failed.
+    Returns (job, created).
+    """
+    store = store or get_store()
+    now = time.time()
+    job = {
+        'JobId': uuid.uuid4().hex[:12],
+        'IdempotencyKey': idempotency_key(event, resource_type, name, region),
+        'ResourceType': resource_type,
+        'Name': name,
+        'Region': region,
+        'Options': options or {},
+        'Status': QUEUED,
+        'Step': None,
+        'StepStartedAt': None,
+        'StepsDone': [],
+        'Checkpoint': {},
+        'Message': None,
+        'Attempts': 0,
+        'CreatedAt': now,
+        'UpdatedAt': now
+    }
+    job, created = store.create(job)
+    if created:
+        try:
+            dispatch(job['JobId'], context)
+        except Exception as e:
+            # Nothing will ever run the job, so it must not hold the idempotency key
+            _fail_unstarted(store, job, f"starting the job: {str(e)}")
+            raise
+    return job, created
+
+def _fail_unstarted(store, job, message):
+    owner = uuid.uuid4().hex
+    job = store.claim(job['JobId'], owner, JOB_LEASE_SECONDS)
+    if job is not None:
+        job['Status'] = FAILED
+        job['Message'] = message
+        job['UpdatedAt'] = time.time()
+        store.save(job, owner, release=True)
+
+def get_job(job_id, store=None):
+    """The job with this id, or None if it does not exist or has expired"""
+    return (store or get_store()).get(job_id)
+
+def resume_if_stalled(job, context=None):
+    """Start a new worker for an unfinished job nobody has updated for a whole lease"""
+    if job['Status'] not in FINISHED_STATES and time.time() - job['UpdatedAt'] > JOB_LEASE_SECONDS:
+        print(f"Job {job['JobId']}: no progress since {job['UpdatedAt']}, starting a new worker")
+        dispatch(job['JobId'], context)
+
+def _save(store, job, owner, release=False):
+    job['UpdatedAt'] = time.time()
+    saved = store.save(job, owner, release)
+    if not saved:
+        print(f"Job {job['JobId']}: lease lost, leaving it to the current holder")
+    return saved
+
+def run_job(job_id, context=None, store=None):
+    """
+    Worker entry point: run the remaining steps of a job, checkpointing after
+    each one. Returns the job's status when this invocation stops working on
+    it, or None if the job is finished or another worker holds it.
+    """
+    from cloud_assistant.scheduler import describe_failure
+    
+    store = store or get_store()
+    owner = uuid.uuid4().hex
+    job = store.claim(job_id, owner, JOB_LEASE_SECONDS)
+    if job is None:
+        print(f"Job {job_id}: finished or held by another worker")
+        return None
+    job['Status'] = RUNNING
+    job['Attempts'] += 1
+    
+    description = None
+    # An invocation always makes some progress, so a short timeout cannot hand a job on forever
+    progressed = False
+    try:
+        for step_name, description, step in STEPS[job['ResourceType']]:
+            if step_name in job['StepsDone']:
+                continue
+            if job['Step'] != step_name:
+                job['Step'] = step_name
+                job['StepStartedAt'] = time.time()
+            job['Message'] = description
+            if not _save(store, job, owner):
+                return None
+            
+            while True:
+                budget = get_time_budget(context)
+                if progressed and budget is not None and budget < JOB_HANDOFF_SECONDS:
+                    # Everything up to this step is checkpointed; a new invocation carries on
+                    print(f"Job {job_id}: handing off at step {step_name}")
+                    if _save(store, job, owner, release=True):
+                        dispatch(job_id, context)
+                    return job['Status']
+                progressed = True
+                try:
+                    job['Checkpoint'].update(step(job, job['Checkpoint']) or {})
+                    break
+                except StepPending as e:
+                    if time.time() - job['StepStartedAt'] > JOB_MAX_WAIT_SECONDS:
+                        raise RuntimeError(f"gave up waiting: {str(e)}")
+                    job['Message'] = f"{description} ({str(e)})"
+                    if not _save(store, job, owner):
+                        return None
+                    time.sleep(JOB_POLL_INTERVAL)
+            job['StepsDone'].append(step_name)
+        
+        job['Status'] = SUCCEEDED
+        job['Step'] = None
+        job['Message'] = None
+    except Exception as e:
+        print(f"Job {job_id}: step {job['Step']} failed: {str(e)}")
+        job['Status'] = FAILED
+        job['Message'] = f"{description}: {describe_failure(e)}"
+    
+    _save(store, job, owner, release=True)
+    print(f"Job {job_id}: {job['Status']}")
+    return job['Status']
+
+def describe_job(job):
+    """One-sentence, user-facing progress report for a job"""
+    subject = f"Job {job['JobId']} ({RESOURCE_LABELS[job['ResourceType']]} named '{job['Name']}' in {job['Region']})"
+    checkpoint = job['Checkpoint']
+    if job['Status'] == QUEUED:
+        return f"{subject} is queued and will start shortly."
+    if job['Status'] == RUNNING:
+        steps = STEPS[job['ResourceType']]
+        return f"{subject} is running, step {len(job['StepsDone']) + 1} of {len(steps)}: {job['Message']}."
+    if job['Status'] == FAILED:
+        return f"{subject} failed while {job['Message']}."
+    
+    if job['ResourceType'] == 'ec2':
+        address = f" at {checkpoint['PublicIpAddress']}" if checkpoint.get('PublicIpAddress') else ""
+        return f"{subject} is done. Instance {checkpoint['InstanceId']} is running{address}."
+    if job['ResourceType'] == 's3':
+        return f"{subject} is done. The bucket is ready, with public access blocked and default encryption on."
+    return f"{subject} is done. The alarm is active and currently {checkpoint.get('AlarmState')}."
@@ -0,0 +1,10 @@
+"""
+Helpers for reading Lex V2 events
+"""
+
+def get_slot_value(event, slot_name):
+    """Helper to extract slot values from the event"""
+    slots = event['sessionState']['intent']['slots']
+    if slots and slot_name in slots and slots[slot_name] and slots[slot_name].get('value'):
+        return slots[slot_name]['value']['interpretedValue']
+    return None
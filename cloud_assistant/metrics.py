@@ -0,0 +1,155 @@
+"""
+Per-invocation instrumentation emitted as CloudWatch Embedded Metric Format
+
+Measurements are collected in memory while an invocation runs and written as a
+handful of EMF log lines when it finishes, so CloudWatch extracts metrics from
+the logs without extra API calls:
+
+- IntentLatency / ResponseSize per intent
+- AWSCallLatency (every call, up to 100 values per line), AWSCallRetries and
+  AWSCallErrors per service and operation, and per service and region so slow
+  regions stand out (never per operation and region, to keep the number of
+  metric series small)
+- CacheHits / CacheMisses per cache
+
+Each invocation gets its own collector through a context variable. fan_out(),
+background cache refreshes and the health fetcher run their work in a copy of
+the caller's context, so their measurements land in the invocation that started
+them; anything they record after that invocation flushed is discarded instead
+of being counted against the next one.
+
+Full Lex events are only logged when LOG_LEVEL is DEBUG or for a sampled
+fraction of invocations (EVENT_LOG_SAMPLE_RATE).
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CloudAssistant')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Fraction of invocations whose full event is logged (DEBUG logs every event)
+EVENT_LOG_SAMPLE_RATE = float(os.environ.get('EVENT_LOG_SAMPLE_RATE', '0'))
+DEBUG = os.environ.get('LOG_LEVEL', '').upper() == 'DEBUG'
+
+# EMF accepts at most 100 values per metric in one document
+MAX_VALUES_PER_METRIC = 100
+
+class Collector:
+    """Measurements of one invocation"""
+    
+    def __init__(self):
+        self.aws_calls = {}
+        self.cache_counts = {}
+        self.flushed = False
+        self.lock = threading.Lock()
+
+# Collector of the invocation this code is running for; None outside one
+_collector = contextvars.ContextVar('metrics_collector', default=None)
+
+def log_event(event):
+    """Log the incoming event when debugging or when this invocation is sampled"""
+    if DEBUG or (EVENT_LOG_SAMPLE_RATE and random.random() < EVENT_LOG_SAMPLE_RATE):
+        print(f"Event: {json.dumps(event, default=str)}")
+
+def start_invocation():
+    """Give the current context a fresh collector for a new invocation"""
+    collector = Collector()
+    _collector.set(collector)
+    return collector
+
+def _active_collector():
+    collector = _collector.get()
+    if collector is None or collector.flushed:
+        return None
+    return collector
+
+def record_aws_call(service, operation, region, elapsed_ms, attempts, error=None):
+    """Record one scheduled AWS call, including its retries"""
+    collector = _active_collector()
+    if collector is None:
+        return
+    with collector.lock:
+        stats = collector.aws_calls.setdefault(
+            (service, operation, region or 'global'), {'latencies': [], 'retries': 0, 'errors': 0}
+        )
+        stats['latencies'].append(round(elapsed_ms, 2))
+        stats['retries'] += max(attempts - 1, 0)
+        if error is not None:
+            stats['errors'] += 1
+
+def record_cache(cache_name, hit):
+    """Count one cache lookup"""
+    collector = _active_collector()
+    if collector is None:
+        return
+    with collector.lock:
+        counts = collector.cache_counts.setdefault(cache_name, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
+
+def _emit(dimensions, metrics, dimension_sets=None, **properties):
+    """
+    Print one EMF document. metrics maps metric name to (unit, value) where
+    value may be a list of observations; they are published for each list of
+    dimension names in dimension_sets (default: all of dimensions together).
+    """
+    document = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': dimension_sets or [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in metrics.items()]
+            }]
+        }
+    }
+    document.update(dimensions)
+    document.update(properties)
+    for name, (_, value) in metrics.items():
+        document[name] = value
+    print(json.dumps(document, default=str))
+
+def flush(intent_name, elapsed_ms, response, **properties):
+    """Emit everything measured during this invocation and close its collector"""
+    collector = _collector.get()
+    if collector is None:
+        collector = Collector()
+    with collector.lock:
+        collector.flushed = True
+        aws_calls = dict(collector.aws_calls)
+        cache_counts = dict(collector.cache_counts)
+    if not METRICS_ENABLED:
+        return
+    
+    response_size = len(json.dumps(response, default=str)) if response is not None else 0
+    _emit(
+        {'Intent': intent_name},
+        {
+            'IntentLatency': ('Milliseconds', round(elapsed_ms, 2)),
+            'ResponseSize': ('Bytes', response_size)
+        },
+        **properties
+    )
+    
+    for (service, operation, region), stats in aws_calls.items():
+        latencies = stats['latencies']
+        for start in range(0, len(latencies), MAX_VALUES_PER_METRIC):
+            metrics = {'AWSCallLatency': ('Milliseconds', latencies[start:start + MAX_VALUES_PER_METRIC])}
+            if start == 0:
+                metrics['AWSCallRetries'] = ('Count', stats['retries'])
+                metrics['AWSCallErrors'] = ('Count', stats['errors'])
+            _emit(
+                {'Service': service, 'Operation': operation, 'Region': region}, metrics,
+                dimension_sets=[['Service', 'Operation'], ['Service', 'Region']],
+                Intent=intent_name
+            )
+    
+    for cache_name, counts in cache_counts.items():
+        _emit(
+            {'Cache': cache_name},
+            {'CacheHits': ('Count', counts['hits']), 'CacheMisses': ('Count', counts['misses'])},
+            Intent=intent_name
+        )
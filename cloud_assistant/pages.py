@@ -0,0 +1,219 @@
+"""
+Paged Lex responses with "show more" across turns
+
+Handlers write a header, a list of items (one instance, alarm or region block
+each) and optional notes into a ResponseBuffer. respond() packs as many items
+as fit into at most LEX_MESSAGES_PER_PAGE messages of LEX_MESSAGE_CHARS
+characters. When items are left over, the rendered items are saved as a result
+set and its id plus a cursor go into sessionState.sessionAttributes, so the
+ShowMoreResults intent serves the next page without calling AWS again.
+
+Result sets live in an in-process cache and, when RESULT_STORE (default:
+COALESCE_STORE) is set, in the shared coalescing store so any container can
+serve the next page.
+"""
+import os
+import uuid
+
+from cloud_assistant.cache import TTLCache
+from cloud_assistant.coalesce import COALESCE_STORE, create_store
+
+# Lex V2 limits a message to 1,000 characters
+LEX_MESSAGE_CHARS = int(os.environ.get('LEX_MESSAGE_CHARS', '1000'))
+LEX_MESSAGES_PER_PAGE = int(os.environ.get('LEX_MESSAGES_PER_PAGE', '2'))
+
+# Longest header and notes kept on a page, so items always have room
+MAX_HEADER_CHARS = LEX_MESSAGE_CHARS // 2
+MAX_NOTES_CHARS = LEX_MESSAGE_CHARS // 4
+
+# Room kept on the last message for the "show more" prompt
+MORE_PROMPT_RESERVE = 80
+
+# How long "show more" works after a result was produced (seconds)
+RESULT_SET_TTL = int(os.environ.get('RESULT_SET_TTL', '900'))
+
+# Shared store for result sets ('sqlite:<path>' or 'dynamodb:<table>')
+RESULT_STORE = os.environ.get('RESULT_STORE', COALESCE_STORE)
+
+# Session attributes owned by the pager
+RESULT_SET_ATTRIBUTE = 'resultSet'
+RESULT_CURSOR_ATTRIBUTE = 'resultCursor'
+
+result_sets = TTLCache('result-sets', ttl=RESULT_SET_TTL, persist_dir='')
+_store = None
+
+def _get_store():
+    global _store
+    if _store is None and RESULT_STORE:
+        _store = create_store(RESULT_STORE)
+    return _store
+
+def save_result_set(items):
+    """Keep rendered items for later pages and return the result set id"""
+    result_id = uuid.uuid4().hex
+    result_sets.set(result_id, items)
+    store = _get_store()
+    if store is not None:
+        try:
+            store.put(f"results:{result_id}", items, RESULT_SET_TTL)
+        except Exception as e:
+            print(f"Error saving result set: {str(e)}")
+    return result_id
+
+def load_result_set(result_id):
+    """Rendered items of a result set, or None once it has expired"""
+    items = result_sets.get(result_id)
+    if items is None:
+        store = _get_store()
+        if store is not None:
+            try:
+                items, _ = store.get(f"results:{result_id}")
+            except Exception as e:
+                print(f"Error loading result set: {str(e)}")
+    return items
+
+def _truncate(text, limit):
+    return text if len(text) <= limit else text[:max(limit - 3, 0)] + "..."
+
+def _pack(header, items, start, notes):
+    """
+    Split header, items[start:] and notes into messages within the Lex limits.
+    Header and notes are cut to MAX_HEADER_CHARS and MAX_NOTES_CHARS; callers
+    add the notes cut the same way with _append(). Returns (messages, index of
+    the first item that did not fit).
+    """
+    header = _truncate(header, MAX_HEADER_CHARS)
+    notes = _truncate(notes, MAX_NOTES_CHARS)
+    # Room for the notes and the "show more" prompt is reserved on the last message
+    reserve = len(notes) + MORE_PROMPT_RESERVE
+    messages = []
+    parts = [header] if header else []
+    size = len(header)
+    index = start
+    while index < len(items):
+        item = items[index]
+        if len(item) >= LEX_MESSAGE_CHARS - reserve:
+            item = item[:max(LEX_MESSAGE_CHARS - reserve - 4, 0)] + "..."
+        last_message = len(messages) == LEX_MESSAGES_PER_PAGE - 1
+        room = LEX_MESSAGE_CHARS - (reserve if last_message else 0)
+        if size + len(item) + 1 <= room:
+            parts.append(item)
+            size += len(item) + 1
+            index += 1
+        elif not last_message and parts:
+            messages.append("\n".join(parts))
+            parts = []
+            size = 0
+        else:
+            break
+    # Items that all fit before the last message reserved nothing, so the notes and
+    # prompt get a message of their own when they would overflow this one
+    tail = len(notes) + (MORE_PROMPT_RESERVE if index < len(items) else 0)
+    if tail and size + tail > LEX_MESSAGE_CHARS and len(messages) < LEX_MESSAGES_PER_PAGE - 1:
+        messages.append("\n".join(parts))
+        parts = []
+    messages.append("\n".join(parts))
+    return messages, index
+
+def _append(messages, tail):
+    """Add the notes and prompt to the last message, which _pack() may have left empty for them"""
+    messages[-1] = messages[-1] + tail if messages[-1] else tail.lstrip("\n")
+
+def _session_attributes(event, result_id=None, cursor=None):
+    """The caller's session attributes with the pager's own attributes replaced"""
+    attributes = dict(event['sessionState'].get('sessionAttributes') or {})
+    attributes.pop(RESULT_SET_ATTRIBUTE, None)
+    attributes.pop(RESULT_CURSOR_ATTRIBUTE, None)
+    if result_id is not None:
+        attributes[RESULT_SET_ATTRIBUTE] = result_id
+        attributes[RESULT_CURSOR_ATTRIBUTE] = str(cursor)
+    return attributes
+
+def _response(event, intent_name, messages, attributes):
+    return {
+        'sessionState': {
+            'sessionAttributes': attributes,
+            'dialogAction': {
+                'type': 'Close',
+                'fulfillmentState': 'Fulfilled'
+            },
+            'intent': {
+                'name': intent_name,
+                'state': 'Fulfilled'
+            }
+        },
+        'messages': [
+            {
+                'contentType': 'PlainText',
+                'content': content
+            }
+            for content in messages if content.strip()
+        ]
+    }
+
+def _more_prompt(shown, total):
+    return f"\nShowing {shown} of {total}. Say \"show more\" for the next page."
+
+class ResponseBuffer:
+    """Collects a response as header text, items and notes, then renders one page"""
+    
+    def __init__(self):
+        self.header = []
+        self.items = []
+        self.notes = []
+    
+    def write(self, text):
+        """Text shown before the items on the first page"""
+        self.header.append(text)
+    
+    def add_item(self, text):
+        """One entry that is never split across pages"""
+        self.items.append(text.rstrip("\n"))
+    
+    def note(self, text):
+        """Text shown after the items on the first page"""
+        self.notes.append(text)
+    
+    def respond(self, event, intent_name):
+        """Lex response with the first page, saving the remaining items for "show more\""""
+        header = _truncate("".join(self.header), MAX_HEADER_CHARS)
+        notes = _truncate("".join(self.notes), MAX_NOTES_CHARS)
+        messages, end = _pack(header, self.items, 0, notes)
+        if end < len(self.items):
+            result_id = save_result_set(self.items)
+            _append(messages, notes + _more_prompt(end, len(self.items)))
+            return _response(event, intent_name, messages, _session_attributes(event, result_id, end))
+        _append(messages, notes)
+        return _response(event, intent_name, messages, _session_attributes(event))
+
+def next_page(event, intent_name):
+    """Response with the page after the cursor stored in the session, or None if there is none"""
+    attributes = event['sessionState'].get('sessionAttributes') or {}
+    result_id = attributes.get(RESULT_SET_ATTRIBUTE)
+    if not result_id:
+        return None
+    items = load_result_set(result_id)
+    if items is None:
+        return _response(
+            event, intent_name,
+            ["Those results have expired. Please ask the question again."],
+            _session_attributes(event)
+        )
+    
+    start = int(attributes.get(RESULT_CURSOR_ATTRIBUTE) or 0)
+    messages, end = _pack(f"Results {start + 1}-{{end}} of {len(items)}:\n", items, start, "")
+    messages[0] = messages[0].replace("{end}", str(end), 1)
+    if end < len(items):
+        _append(messages, _more_prompt(end, len(items)))
+        return _response(event, intent_name, messages, _session_attributes(event, result_id, end))
+    return _response(event, intent_name, messages, _session_attributes(event))
+
+def with_caller_session(event, response):
+    """
+    Copy of a (possibly shared, coalesced) response carrying this caller's own
+    session attributes, plus the pager attributes the response set
+    """
+    shared = response.get('sessionState', {}).get('sessionAttributes') or {}
+    attributes = _session_attributes(event, shared.get(RESULT_SET_ATTRIBUTE), shared.get(RESULT_CURSOR_ATTRIBUTE))
+    session_state = dict(response.get('sessionState', {}), sessionAttributes=attributes)
+    return dict(response, sessionState=session_state)
@@ -0,0 +1,357 @@
+"""
+Throttle-aware scheduling for AWS API calls
+
+Every call goes through call(service, region, fn, ...), which:
+
+- waits on a per-(service, region) token bucket whose rate halves when AWS
+  throttles and creeps back up on success,
+- retries throttling and transient errors with full-jitter exponential backoff,
+- fails fast with RegionUnavailableError while that (service, region) circuit
+  breaker is open after repeated failures, until its cooldown has passed,
+- keeps at most AWS_MAX_CONCURRENT_CALLS requests in flight per container.
+
+Buckets and breakers are kept per account as well when calls run inside
+clients.use_account(), since AWS rate limits and failures are per account.
+call_async() and paginate_async() apply the same policy to coroutine methods
+(aiobotocore clients) and wait with asyncio.sleep() instead of blocking.
+
+botocore's own retries are disabled in the pooled client config so attempts are
+not multiplied.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+from cloud_assistant import metrics
+from cloud_assistant.clients import current_account
+
+# Steady-state call rate and burst per (service, region)
+AWS_CALL_RATE = float(os.environ.get('AWS_CALL_RATE', '10'))
+AWS_CALL_BURST = float(os.environ.get('AWS_CALL_BURST', '20'))
+
+# Per-service rate overrides as "service=rate,..."; S3 bucket-level APIs and STS
+# (one AssumeRole per account on an org-wide scan) allow far more than the default
+AWS_SERVICE_CALL_RATES = {
+    service.strip(): float(rate)
+    for service, rate in (
+        item.split('=') for item in os.environ.get('AWS_SERVICE_CALL_RATES', 's3=100,sts=100').split(',') if '=' in item
+    )
+}
+
+# Lowest rate the adaptive bucket will back off to
+AWS_MIN_CALL_RATE = float(os.environ.get('AWS_MIN_CALL_RATE', '0.5'))
+
+# Longest a call waits for a token before giving up as throttled (seconds)
+AWS_TOKEN_WAIT_SECONDS = float(os.environ.get('AWS_TOKEN_WAIT_SECONDS', '5'))
+
+# Attempts per call and backoff bounds (seconds)
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '4'))
+AWS_BACKOFF_BASE = float(os.environ.get('AWS_BACKOFF_BASE', '0.1'))
+AWS_BACKOFF_CAP = float(os.environ.get('AWS_BACKOFF_CAP', '2'))
+
+# Requests in flight at once across every fan-out in the container
+AWS_MAX_CONCURRENT_CALLS = int(os.environ.get('AWS_MAX_CONCURRENT_CALLS', '64'))
+
+# Consecutive failed calls that open a breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('BREAKER_COOLDOWN_SECONDS', '60'))
+
+THROTTLING_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestThrottledException', 'RequestLimitExceeded', 'TooManyRequestsException',
+    'SlowDown', 'ProvisionedThroughputExceededException', 'BandwidthLimitExceeded'
+}
+TRANSIENT_ERROR_CODES = {
+    'InternalError', 'InternalFailure', 'InternalServerError', 'ServiceUnavailable',
+    'ServiceUnavailableException', 'Unavailable', 'RequestTimeout', 'RequestTimeoutException'
+}
+# Errors that mean the whole region is unusable for this account (not retried)
+REGION_ERROR_CODES = {'AuthFailure', 'OptInRequired', 'UnrecognizedClientException', 'InvalidClientTokenId'}
+
+class RegionUnavailableError(Exception):
+    """Raised without calling AWS when a (service, region) is skipped or over its rate limit"""
+    
+    def __init__(self, service, region, reason):
+        self.service = service
+        self.region = region
+        self.reason = reason
+        super().__init__(f"{service} in {region} is temporarily unavailable: {reason}")
+
+class TokenBucket:
+    """Token bucket with additive-increase / multiplicative-decrease on its rate"""
+    
+    def __init__(self, rate=AWS_CALL_RATE, burst=AWS_CALL_BURST, min_rate=AWS_MIN_CALL_RATE):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _take(self):
+        """Take a token if one is available (0), otherwise return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self, timeout=AWS_TOKEN_WAIT_SECONDS):
+        """Take one token, waiting up to timeout seconds; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait_for = self._take()
+            if not wait_for:
+                return True
+            if time.monotonic() + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+    
+    async def acquire_async(self, timeout=AWS_TOKEN_WAIT_SECONDS):
+        """acquire() without blocking the event loop"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait_for = self._take()
+            if not wait_for:
+                return True
+            if time.monotonic() + wait_for > deadline:
+                return False
+            await asyncio.sleep(wait_for)
+    
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+    
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures; after the cooldown it lets a single trial
+    call through and keeps rejecting everyone else until that call reports back.
+    A trial call that never reports (e.g. it ran out of tokens) is replaced by
+    a new one after another cooldown.
+    """
+    
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self._lock = threading.Lock()
+    
+    def retry_in(self):
+        """Seconds until a call may be attempted again (0 when this caller may call)"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            now = time.monotonic()
+            remaining = self.opened_at + self.cooldown - now
+            if remaining > 0:
+                return remaining
+            if self.probe_started is not None and now - self.probe_started < self.cooldown:
+                # Half-open with a trial call in flight
+                return self.probe_started + self.cooldown - now
+            self.probe_started = now
+            return 0
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_started is not None or self.failures >= self.failure_threshold:
+                # A failed trial call re-opens the breaker for a full cooldown
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+# Buckets and breakers per (service, region, account), shared across warm invocations
+_buckets = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+_in_flight = threading.BoundedSemaphore(AWS_MAX_CONCURRENT_CALLS)
+# The asyncio path's cap, created on the event loop that uses it
+_async_in_flight = None
+
+def _get(registry, key, factory):
+    item = registry.get(key)
+    if item is None:
+        with _registry_lock:
+            item = registry.setdefault(key, factory())
+    return item
+
+def get_bucket(service, region):
+    rate = AWS_SERVICE_CALL_RATES.get(service, AWS_CALL_RATE)
+    return _get(_buckets, (service, region, current_account()), lambda: TokenBucket(rate, max(AWS_CALL_BURST, rate)))
+
+def get_breaker(service, region):
+    return _get(_breakers, (service, region, current_account()), CircuitBreaker)
+
+def error_code(error):
+    """AWS error code of a botocore ClientError, or None"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+def _is_connection_error(error):
+    try:
+        from botocore.exceptions import ConnectionError, HTTPClientError
+    except ImportError:
+        return False
+    return isinstance(error, (ConnectionError, HTTPClientError))
+
+def call(service, region, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) as an AWS request against (service, region) with
+    rate limiting, jittered retries and circuit breaking. The last error is
+    re-raised when all attempts fail. Latency and retries are recorded as metrics.
+    """
+    started = time.perf_counter()
+    attempts = {'count': 0}
+    error = None
+    try:
+        return _call_with_retries(service, region, fn, attempts, args, kwargs)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        operation = getattr(fn, '__name__', 'call')
+        metrics.record_aws_call(service, operation, region, elapsed_ms, attempts['count'], error)
+
+def _check_breaker(service, region):
+    breaker = get_breaker(service, region)
+    retry_in = breaker.retry_in()
+    if retry_in > 0:
+        raise RegionUnavailableError(service, region, f"skipped for {int(retry_in)}s after repeated failures")
+    return breaker
+
+def _retry_delay(error, attempt, bucket, breaker):
+    """Backoff before retrying a failed attempt, or None when the error is to be raised"""
+    code = error_code(error)
+    if code in THROTTLING_ERROR_CODES:
+        bucket.on_throttle()
+    elif code in REGION_ERROR_CODES:
+        breaker.record_failure()
+        return None
+    elif code not in TRANSIENT_ERROR_CODES and not _is_connection_error(error):
+        # A normal API error (bad input, missing resource): the region answered
+        breaker.record_success()
+        return None
+    
+    if attempt == AWS_MAX_ATTEMPTS - 1:
+        breaker.record_failure()
+        return None
+    return random.uniform(0, min(AWS_BACKOFF_CAP, AWS_BACKOFF_BASE * 2 ** attempt))
+
+def _call_with_retries(service, region, fn, attempts, args, kwargs):
+    breaker = _check_breaker(service, region)
+    bucket = get_bucket(service, region)
+    for attempt in range(AWS_MAX_ATTEMPTS):
+        if not bucket.acquire():
+            raise RegionUnavailableError(service, region, "request rate limit reached")
+        attempts['count'] += 1
+        try:
+            with _in_flight:
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, bucket, breaker)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        
+        bucket.on_success()
+        breaker.record_success()
+        return result
+
+async def call_async(service, region, fn, *args, **kwargs):
+    """call() for a coroutine function, e.g. an aiobotocore client method"""
+    started = time.perf_counter()
+    attempts = {'count': 0}
+    error = None
+    try:
+        return await _call_with_retries_async(service, region, fn, attempts, args, kwargs)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        operation = getattr(fn, '__name__', 'call')
+        metrics.record_aws_call(service, operation, region, elapsed_ms, attempts['count'], error)
+
+async def _call_with_retries_async(service, region, fn, attempts, args, kwargs):
+    global _async_in_flight
+    if _async_in_flight is None:
+        _async_in_flight = asyncio.Semaphore(AWS_MAX_CONCURRENT_CALLS)
+    
+    breaker = _check_breaker(service, region)
+    bucket = get_bucket(service, region)
+    for attempt in range(AWS_MAX_ATTEMPTS):
+        if not await bucket.acquire_async():
+            raise RegionUnavailableError(service, region, "request rate limit reached")
+        attempts['count'] += 1
+        try:
+            async with _async_in_flight:
+                result = await fn(*args, **kwargs)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, bucket, breaker)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        
+        bucket.on_success()
+        breaker.record_success()
+        return result
+
+def paginate(service, region, method, input_token='NextToken', output_token='NextToken', **params):
+    """
+    Yield every page of a token-paginated operation, scheduling each page request
+    through call() so throttled pages are retried individually.
+    """
+    while True:
+        page = call(service, region, method, **params)
+        yield page
+        token = page.get(output_token)
+        if not token:
+            return
+        params[input_token] = token
+
+async def paginate_async(service, region, method, input_token='NextToken', output_token='NextToken', **params):
+    """paginate() for a coroutine method, as an async generator"""
+    while True:
+        page = await call_async(service, region, method, **params)
+        yield page
+        token = page.get(output_token)
+        if not token:
+            return
+        params[input_token] = token
+
+def describe_failure(error):
+    """Short, user-facing reason for a failed regional call"""
+    if isinstance(error, RegionUnavailableError):
+        return error.reason
+    code = error_code(error)
+    if code in THROTTLING_ERROR_CODES:
+        return "throttled"
+    if code in REGION_ERROR_CODES:
+        return "not enabled or not authorised"
+    if code in TRANSIENT_ERROR_CODES or _is_connection_error(error):
+        return "unreachable"
+    if isinstance(error, TimeoutError):
+        return "timed out"
+    return f"error: {str(error)}"
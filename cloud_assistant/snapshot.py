@@ -0,0 +1,465 @@
+"""
+Precomputed inventory snapshot with secondary indexes
+
+A scheduled invocation of the function (an EventBridge "Scheduled Event")
+collects EC2 instances, S3 buckets and CloudWatch alarms and writes them to an
+indexed store, one (resource type, region) partition at a time, so a region
+that fails or runs out of time keeps its previous snapshot. Intent handlers
+then answer filtered and aggregated questions ("how many t3.large are running
+in eu-west-1 tagged team=payments") from the store instead of live API calls.
+
+Every record has the same shape:
+
+    {'ResourceType': 'ec2' | 's3' | 'alarm', 'ResourceId': str, 'Region': str,
+     'State': str, 'InstanceType': str or None, 'Name': str,
+     'Tags': {key: value}, 'Data': {...type-specific fields}}
+
+SNAPSHOT_STORE selects the store:
+
+    sqlite:/tmp/inventory.db   local file (or on EFS, shared by containers)
+    dynamodb:<table name>      table with string keys 'pk'/'sk' and two GSIs,
+                               'state-index' (gsi1pk, sk) and
+                               'type-index' (gsi2pk, sk)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from cloud_assistant.clients import get_client
+from cloud_assistant.fanout import fan_out
+from cloud_assistant.scheduler import call, describe_failure, paginate
+
+# Store specification; empty disables the snapshot
+SNAPSHOT_STORE = os.environ.get('SNAPSHOT_STORE', '')
+
+# Snapshots older than this (seconds) are reported as stale in responses
+SNAPSHOT_MAX_AGE = int(os.environ.get('SNAPSHOT_MAX_AGE', '3600'))
+
+# Columns that queries may filter and group on
+INDEXED_FIELDS = {'region': 'Region', 'state': 'State', 'instance_type': 'InstanceType'}
+
+def _matches(record, region=None, state=None, instance_type=None, tags=None):
+    if region is not None and record['Region'] != region:
+        return False
+    if state is not None and record['State'] != state:
+        return False
+    if instance_type is not None and record['InstanceType'] != instance_type:
+        return False
+    for key, value in (tags or {}).items():
+        if record['Tags'].get(key) != value:
+            return False
+    return True
+
+def _group_value(record, group_by):
+    if group_by.startswith('tag:'):
+        return record['Tags'].get(group_by[4:])
+    return record[INDEXED_FIELDS[group_by]]
+
+class SQLiteSnapshotStore:
+    """Snapshot in a local SQLite file with indexes on region, state, type and tags"""
+    
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS resources ("
+                "resource_type TEXT, resource_id TEXT, region TEXT, state TEXT, instance_type TEXT, "
+                "name TEXT, record TEXT, PRIMARY KEY (resource_type, region, resource_id));"
+                "CREATE INDEX IF NOT EXISTS resources_region ON resources (resource_type, region, state);"
+                "CREATE INDEX IF NOT EXISTS resources_state ON resources (resource_type, state);"
+                "CREATE INDEX IF NOT EXISTS resources_type ON resources (resource_type, instance_type);"
+                "CREATE TABLE IF NOT EXISTS resource_tags ("
+                "resource_type TEXT, resource_id TEXT, region TEXT, tag_key TEXT, tag_value TEXT);"
+                "CREATE INDEX IF NOT EXISTS resource_tags_value ON resource_tags (resource_type, tag_key, tag_value);"
+                "CREATE INDEX IF NOT EXISTS resource_tags_id ON resource_tags (resource_type, region, resource_id);"
+                "CREATE TABLE IF NOT EXISTS partitions ("
+                "resource_type TEXT, region TEXT, refreshed_at REAL, PRIMARY KEY (resource_type, region));"
+            )
+        finally:
+            conn.close()
+    
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+    
+    def replace(self, resource_type, region, records):
+        """Atomically replace every record of a type in a region"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM resources WHERE resource_type = ? AND region = ?", (resource_type, region))
+            conn.execute("DELETE FROM resource_tags WHERE resource_type = ? AND region = ?", (resource_type, region))
+            conn.executemany(
+                "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (resource_type, r['ResourceId'], region, r['State'], r['InstanceType'], r['Name'], json.dumps(r, default=str))
+                    for r in records
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO resource_tags VALUES (?, ?, ?, ?, ?)",
+                [
+                    (resource_type, r['ResourceId'], region, key, value)
+                    for r in records for key, value in r['Tags'].items()
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?)", (resource_type, region, time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def _where(self, resource_type, region, state, instance_type, tags):
+        clauses = ["r.resource_type = ?"]
+        params = [resource_type]
+        for column, value in (('region', region), ('state', state), ('instance_type', instance_type)):
+            if value is not None:
+                clauses.append(f"r.{column} = ?")
+                params.append(value)
+        for key, value in (tags or {}).items():
+            clauses.append(
+                "EXISTS (SELECT 1 FROM resource_tags t WHERE t.resource_type = r.resource_type "
+                "AND t.region = r.region AND t.resource_id = r.resource_id AND t.tag_key = ? AND t.tag_value = ?)"
+            )
+            params.extend([key, value])
+        return " AND ".join(clauses), params
+    
+    def query(self, resource_type, region=None, state=None, instance_type=None, tags=None, limit=None):
+        where, params = self._where(resource_type, region, state, instance_type, tags)
+        sql = f"SELECT r.record FROM resources r WHERE {where} ORDER BY r.region, r.resource_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        conn = self._connect()
+        try:
+            return [json.loads(row[0]) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+    
+    def aggregate(self, resource_type, group_by, region=None, state=None, instance_type=None, tags=None):
+        where, params = self._where(resource_type, region, state, instance_type, tags)
+        if group_by.startswith('tag:'):
+            sql = (
+                f"SELECT t.tag_value, COUNT(*) FROM resources r LEFT JOIN resource_tags t "
+                f"ON t.resource_type = r.resource_type AND t.region = r.region "
+                f"AND t.resource_id = r.resource_id AND t.tag_key = ? "
+                f"WHERE {where} GROUP BY t.tag_value"
+            )
+            params = [group_by[4:]] + params
+        else:
+            if group_by not in INDEXED_FIELDS:
+                raise ValueError(f"Cannot group by {group_by}")
+            column = group_by
+            sql = f"SELECT r.{column}, COUNT(*) FROM resources r WHERE {where} GROUP BY r.{column}"
+        conn = self._connect()
+        try:
+            return dict(conn.execute(sql, params).fetchall())
+        finally:
+            conn.close()
+    
+    def refreshed_at(self, resource_type):
+        """{region: epoch seconds of its last refresh} for a type"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute(
+                "SELECT region, refreshed_at FROM partitions WHERE resource_type = ?", (resource_type,)
+            ).fetchall())
+        finally:
+            conn.close()
+
+class DynamoDBSnapshotStore:
+    """
+    Snapshot in a DynamoDB table. Resources live under pk '<type>#<region>'
+    with GSIs on state and instance type; each tag is a separate item under
+    pk '<type>#tag#<key>=<value>' pointing at its resource. Items from older
+    snapshots are deleted after a partition is rewritten; tag items expire
+    through the table's TTL on 'expires_at' and are re-checked on read.
+    """
+    
+    def __init__(self, table_name):
+        self.table_name = table_name
+    
+    def _call(self, operation, **params):
+        client = get_client('dynamodb')
+        return call('dynamodb', client.meta.region_name, getattr(client, operation), **params)
+    
+    def _pages(self, operation, **params):
+        client = get_client('dynamodb')
+        return paginate(
+            'dynamodb', client.meta.region_name, getattr(client, operation),
+            input_token='ExclusiveStartKey', output_token='LastEvaluatedKey', **params
+        )
+    
+    def _write(self, requests):
+        for start in range(0, len(requests), 25):
+            pending = {self.table_name: requests[start:start + 25]}
+            while pending:
+                pending = self._call('batch_write_item', RequestItems=pending).get('UnprocessedItems')
+    
+    def replace(self, resource_type, region, records):
+        snapshot_id = uuid.uuid4().hex
+        now = time.time()
+        expires_at = str(int(now + 2 * SNAPSHOT_MAX_AGE))
+        requests = []
+        for record in records:
+            item = {
+                'pk': {'S': f"{resource_type}#{region}"},
+                'sk': {'S': record['ResourceId']},
+                'snapshot': {'S': snapshot_id},
+                'gsi1pk': {'S': f"{resource_type}#{record['State']}"},
+                'record': {'S': json.dumps(record, default=str)}
+            }
+            if record['InstanceType']:
+                item['gsi2pk'] = {'S': f"{resource_type}#{record['InstanceType']}"}
+            requests.append({'PutRequest': {'Item': item}})
+            for key, value in record['Tags'].items():
+                requests.append({'PutRequest': {'Item': {
+                    'pk': {'S': f"{resource_type}#tag#{key}={value}"},
+                    'sk': {'S': f"{region}#{record['ResourceId']}"},
+                    'expires_at': {'N': expires_at}
+                }}})
+        self._write(requests)
+        
+        # Drop resources that were not part of this snapshot
+        stale = []
+        pages = self._pages(
+            'query', TableName=self.table_name,
+            KeyConditionExpression='pk = :pk',
+            ExpressionAttributeValues={':pk': {'S': f"{resource_type}#{region}"}},
+            ProjectionExpression='pk, sk, #s',
+            ExpressionAttributeNames={'#s': 'snapshot'}
+        )
+        for page in pages:
+            for item in page.get('Items', []):
+                if item.get('snapshot', {}).get('S') != snapshot_id:
+                    stale.append({'DeleteRequest': {'Key': {'pk': item['pk'], 'sk': item['sk']}}})
+        self._write(stale)
+        self._write([{'PutRequest': {'Item': {
+            'pk': {'S': f"{resource_type}#partitions"},
+            'sk': {'S': region},
+            'refreshed_at': {'N': str(now)}
+        }}}])
+    
+    def _query_records(self, pk, index_name=None):
+        params = {
+            'TableName': self.table_name,
+            'KeyConditionExpression': f"{'gsi1pk' if index_name == 'state-index' else 'gsi2pk' if index_name else 'pk'} = :pk",
+            'ExpressionAttributeValues': {':pk': {'S': pk}}
+        }
+        if index_name:
+            params['IndexName'] = index_name
+        for page in self._pages('query', **params):
+            for item in page.get('Items', []):
+                yield json.loads(item['record']['S'])
+    
+    def _records_for_tag(self, resource_type, key, value):
+        keys = []
+        pages = self._pages(
+            'query', TableName=self.table_name,
+            KeyConditionExpression='pk = :pk',
+            ExpressionAttributeValues={':pk': {'S': f"{resource_type}#tag#{key}={value}"}}
+        )
+        for page in pages:
+            for item in page.get('Items', []):
+                region, _, resource_id = item['sk']['S'].partition('#')
+                keys.append({'pk': {'S': f"{resource_type}#{region}"}, 'sk': {'S': resource_id}})
+        for start in range(0, len(keys), 100):
+            pending = {self.table_name: {'Keys': keys[start:start + 100]}}
+            while pending:
+                response = self._call('batch_get_item', RequestItems=pending)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    yield json.loads(item['record']['S'])
+                pending = response.get('UnprocessedKeys')
+    
+    def query(self, resource_type, region=None, state=None, instance_type=None, tags=None, limit=None):
+        # Read through the most selective index, then apply the remaining filters
+        if tags:
+            key, value = next(iter(tags.items()))
+            candidates = self._records_for_tag(resource_type, key, value)
+        elif region is not None:
+            candidates = self._query_records(f"{resource_type}#{region}")
+        elif state is not None:
+            candidates = self._query_records(f"{resource_type}#{state}", 'state-index')
+        elif instance_type is not None:
+            candidates = self._query_records(f"{resource_type}#{instance_type}", 'type-index')
+        else:
+            candidates = (
+                record
+                for partition in sorted(self.refreshed_at(resource_type))
+                for record in self._query_records(f"{resource_type}#{partition}")
+            )
+        records = []
+        for record in candidates:
+            if _matches(record, region, state, instance_type, tags):
+                records.append(record)
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+    
+    def aggregate(self, resource_type, group_by, region=None, state=None, instance_type=None, tags=None):
+        counts = {}
+        for record in self.query(resource_type, region, state, instance_type, tags):
+            value = _group_value(record, group_by)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+    
+    def refreshed_at(self, resource_type):
+        partitions = {}
+        pages = self._pages(
+            'query', TableName=self.table_name,
+            KeyConditionExpression='pk = :pk',
+            ExpressionAttributeValues={':pk': {'S': f"{resource_type}#partitions"}}
+        )
+        for page in pages:
+            for item in page.get('Items', []):
+                partitions[item['sk']['S']] = float(item['refreshed_at']['N'])
+        return partitions
+
+def create_store(spec):
+    """Build a store from a 'sqlite:<path>' or 'dynamodb:<table>' spec, or None"""
+    if not spec:
+        return None
+    backend, _, target = spec.partition(':')
+    if backend == 'sqlite':
+        return SQLiteSnapshotStore(target)
+    if backend == 'dynamodb':
+        return DynamoDBSnapshotStore(target)
+    raise ValueError(f"Unknown snapshot store: {spec}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Store configured by SNAPSHOT_STORE, created once per container"""
+    global _store
+    if _store is None and SNAPSHOT_STORE:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(SNAPSHOT_STORE)
+    return _store
+
+def query(resource_type, region=None, state=None, instance_type=None, tags=None, limit=None, store=None):
+    """Records matching every given filter, or None when no snapshot is configured"""
+    store = store or get_store()
+    if store is None:
+        return None
+    return store.query(resource_type, region, state, instance_type, tags, limit)
+
+def aggregate(resource_type, group_by, region=None, state=None, instance_type=None, tags=None, store=None):
+    """
+    {value: count} of matching records grouped by 'region', 'state',
+    'instance_type' or 'tag:<key>', or None when no snapshot is configured
+    """
+    store = store or get_store()
+    if store is None:
+        return None
+    return store.aggregate(resource_type, group_by, region, state, instance_type, tags)
+
+def snapshot_age(resource_type, store=None):
+    """Seconds since the oldest partition of a type was refreshed, or None if it was never written"""
+    store = store or get_store()
+    refreshed = store.refreshed_at(resource_type) if store is not None else {}
+    if not refreshed:
+        return None
+    return time.time() - min(refreshed.values())
+
+def _ec2_records(region):
+    from cloud_assistant.intents.ec2 import load_region_batch
+    return [
+        {
+            'ResourceType': 'ec2',
+            'ResourceId': instance.InstanceId,
+            'Region': region,
+            'State': instance.State,
+            'InstanceType': instance.InstanceType,
+            'Name': instance.Name,
+            'Tags': instance.Tags,
+            'Data': {}
+        }
+        for instance in load_region_batch(region).select()
+    ]
+
+def _alarm_records(region):
+    from cloud_assistant.alarm_index import get_index
+    return [
+        {
+            'ResourceType': 'alarm',
+            'ResourceId': alarm['Name'],
+            'Region': region,
+            'State': alarm['State'],
+            'InstanceType': None,
+            'Name': alarm['Name'],
+            'Tags': {},
+            'Data': {'Type': alarm['Type'], 'Namespaces': alarm['Namespaces'], 'Updated': alarm['Updated']}
+        }
+        for alarm in get_index(region).refresh().query()
+    ]
+
+def _s3_records(context):
+    """Bucket records grouped by region, or None if some buckets could not be enriched in time"""
+    from cloud_assistant.bucket_listing import list_buckets_enriched
+    buckets, pending = list_buckets_enriched(context)
+    if pending:
+        return None
+    by_region = {}
+    for bucket in buckets:
+        by_region.setdefault(bucket['Region'], []).append({
+            'ResourceType': 's3',
+            'ResourceId': bucket['Name'],
+            'Region': bucket['Region'],
+            'State': {True: 'public', False: 'private', None: 'unknown'}[bucket['IsPublic']],
+            'InstanceType': None,
+            'Name': bucket['Name'],
+            'Tags': {},
+            'Data': {'Size': bucket['Size'], 'CreationDate': bucket['CreationDate']}
+        })
+    return by_region
+
+def refresh_snapshot(context=None, store=None):
+    """
+    Collect every resource type and rewrite the store partition by partition.
+    Returns {'written': {'<type>#<region>': count}, 'failed': {...: reason}}.
+    """
+    # The collectors' modules are loaded on first use, so the intents that only query
+    # the snapshot (and intents.ec2, which imports this module) do not pay for them
+    from cloud_assistant.alarm_index import ALARM_REGIONS
+    from cloud_assistant.intents.ec2 import get_regions
+    
+    store = store or get_store()
+    if store is None:
+        raise ValueError("SNAPSHOT_STORE is not configured")
+    
+    jobs = [('ec2', region) for region in get_regions()] + [('alarm', region) for region in ALARM_REGIONS] + [('s3', None)]
+    
+    def collect(job):
+        resource_type, region = job
+        if resource_type == 's3':
+            return _s3_records(context)
+        records = _ec2_records(region) if resource_type == 'ec2' else _alarm_records(region)
+        return {region: records}
+    
+    results, skipped, failed = fan_out(collect, jobs, context)
+    written = {}
+    failures = {f"{t}#{r or 'all'}": describe_failure(e) for (t, r), e in failed.items()}
+    failures.update({f"{t}#{r or 'all'}": "time limit reached" for t, r in skipped})
+    for (resource_type, region), partitions in results.items():
+        if partitions is None:
+            failures[f"{resource_type}#all"] = "not every bucket could be described in time"
+            continue
+        if resource_type == 's3':
+            # Regions whose last bucket was deleted are emptied
+            for previous_region in store.refreshed_at('s3'):
+                partitions.setdefault(previous_region, [])
+        for partition_region, records in partitions.items():
+            store.replace(resource_type, partition_region, records)
+            written[f"{resource_type}#{partition_region}"] = len(records)
+    
+    print(f"Snapshot refresh: {json.dumps({'written': written, 'failed': failures})}")
+    return {'written': written, 'failed': failures}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useLayoutEffect, useRef, useCallback } from 'react';
 import { fetchAuthSession, signOut } from '@aws-amplify/auth';
 import { LexRuntimeV2 } from '@aws-sdk/client-lex-runtime-v2';
 import { generateClient } from 'aws-amplify/api';
@@ -15,6 +15,27 @@ import { useNavigate } from 'react-router-dom';
 
 const client = generateClient();
 
+// Messages fetched per history page, newest first
+const PAGE_SIZE = 30;
+
+// Height assumed for a message until it has been rendered, and how far above
+// and below the visible area messages are still rendered (px)
+const ESTIMATED_ROW_HEIGHT = 80;
+const OVERSCAN_PX = 600;
+
+// Older messages are fetched when the list is scrolled this close to its top (px)
+const LOAD_OLDER_THRESHOLD_PX = 200;
+
+// sessionStorage key of the newest page of a conversation, shown while it reloads
+const STORED_PAGE_KEY = 'cloudAssistant.newestMessages.';
+
+// Scan pages read per request for messages saved before history was indexed
+const MAX_LEGACY_SCANS = 10;
+
+// History loaded in this tab per conversation: { messages, cursor }, where
+// cursor.phase is 'indexed', 'legacy' or 'done'
+const historyCache = new Map();
+
 const ChatContainer = styled(Paper)(({ theme }) => ({
   height: '70vh',
   display: 'flex',
@@ -41,6 +62,13 @@ const MessageItem = styled(ListItem)(({ theme, sender }) => ({
   alignSelf: sender === 'user' ? 'flex-end' : 'flex-start',
 }));
 
+const HistoryStatus = styled(Box)(({ theme }) => ({
+  display: 'flex',
+  justifyContent: 'center',
+  padding: theme.spacing(1),
+  color: theme.palette.text.secondary,
+}));
+
 
 async function saveMessageToGraphQL(messageObj) {
   try {
@@ -62,32 +90,252 @@ async function saveMessageToGraphQL(messageObj) {
   }
 }
 
-async function fetchMessagesFromGraphQL() {
+// One page of a conversation, newest first. Pass the previous page's nextToken
+// to get the messages before it.
+async function fetchMessagesFromGraphQL(conversation, nextToken = null) {
   try {
-    const response = await client.graphql({ 
-      query: queries.listMessages,
+    const response = await client.graphql({
+      query: queries.messagesByConversation,
+      variables: { conversation, sortDirection: 'DESC', limit: PAGE_SIZE, nextToken },
       authMode: 'userPool' // Ensure you're using the right auth mode
     });
-    
+
     if (response.errors) {
       console.error('GraphQL query errors:', response.errors);
       throw new Error(response.errors[0].message);
     }
 
-    return response.data.listMessages.items || [];
+    const page = response.data.messagesByConversation;
+    return { items: page.items || [], nextToken: page.nextToken || null };
   } catch (error) {
     console.error('Error fetching messages:', error);
     throw error; // Re-throw to handle in the calling function
   }
 }
 
+// Messages saved before they had a conversation are not in the index. They are
+// read with a filtered scan once the indexed history is exhausted.
+async function fetchLegacyMessagesFromGraphQL(nextToken = null) {
+  try {
+    let items = [];
+    let token = nextToken;
+    for (let scans = 0; scans < MAX_LEGACY_SCANS && items.length === 0; scans++) {
+      const response = await client.graphql({
+        query: queries.listMessages,
+        variables: { filter: { conversation: { attributeExists: false } }, limit: PAGE_SIZE, nextToken: token },
+        authMode: 'userPool'
+      });
+
+      if (response.errors) {
+        console.error('GraphQL query errors:', response.errors);
+        throw new Error(response.errors[0].message);
+      }
+
+      items = response.data.listMessages.items || [];
+      token = response.data.listMessages.nextToken || null;
+      if (!token) break;
+    }
+    return { items, nextToken: token };
+  } catch (error) {
+    console.error('Error fetching older messages:', error);
+    throw error;
+  }
+}
+
+function toChatMessage(m) {
+  return {
+    text: m.content,
+    sender: m.sender,
+    id: m.id,
+    createdAt: m.createdAt,
+  };
+}
+
+// Union of two message lists by id, oldest first. Rows keep the key they were
+// first rendered with, so a sent message does not re-mount once it has an id.
+function mergeMessages(current, incoming) {
+  const byId = new Map(current.map(m => [m.id || m.key, m]));
+  incoming.forEach(m => {
+    const existing = byId.get(m.id);
+    byId.set(m.id, existing ? { ...m, key: existing.key } : m);
+  });
+  return [...byId.values()].sort((a, b) => new Date(a.createdAt) - new Date(b.createdAt));
+}
+
+function nextCursor(page, phase) {
+  if (page.nextToken) {
+    return { nextToken: page.nextToken, phase };
+  }
+  return { nextToken: null, phase: phase === 'indexed' ? 'legacy' : 'done' };
+}
+
+function readStoredPage(conversation) {
+  try {
+    return JSON.parse(sessionStorage.getItem(STORED_PAGE_KEY + conversation)) || [];
+  } catch (error) {
+    return [];
+  }
+}
+
+function storeNewestPage(conversation, messages) {
+  try {
+    sessionStorage.setItem(STORED_PAGE_KEY + conversation, JSON.stringify(messages.slice(-PAGE_SIZE)));
+  } catch (error) {
+    // Storage full or disabled; the page is simply fetched again next time
+  }
+}
+
+function clearHistoryCache() {
+  historyCache.forEach((_, conversation) => sessionStorage.removeItem(STORED_PAGE_KEY + conversation));
+  historyCache.clear();
+}
+
+// Reports its rendered height, so the list can place rows it does not render
+function MeasuredRow({ rowKey, top, onMeasure, children }) {
+  const ref = useRef(null);
+  const topRef = useRef(top);
+  topRef.current = top;
+
+  useLayoutEffect(() => {
+    const node = ref.current;
+    onMeasure(rowKey, node.offsetHeight, topRef.current);
+    if (typeof ResizeObserver === 'undefined') return undefined;
+    const observer = new ResizeObserver(() => onMeasure(rowKey, node.offsetHeight, topRef.current));
+    observer.observe(node);
+    return () => observer.disconnect();
+  }, [rowKey, onMeasure]);
+
+  return <div ref={ref}>{children}</div>;
+}
+
+// Renders only the messages near the visible area, with spacers standing in
+// for the rest, and asks for older messages when scrolled near the top
+function VirtualMessageList({ messages, hasOlder, isLoadingOlder, olderFailed, onLoadOlder, emptyText }) {
+  const listRef = useRef(null);
+  const heights = useRef(new Map());
+  const distanceFromBottom = useRef(0);
+  const edges = useRef({ first: null, last: null });
+  const [viewport, setViewport] = useState({ top: 0, height: 0 });
+  const [, setMeasuredCount] = useState(0);
+
+  const handleMeasure = useCallback((key, height, top) => {
+    const previous = heights.current.get(key) || ESTIMATED_ROW_HEIGHT;
+    if (previous === height) return;
+    heights.current.set(key, height);
+    // Keep the visible messages still when a row above them changes height
+    const list = listRef.current;
+    if (list && top < list.scrollTop) {
+      list.scrollTop += height - previous;
+    }
+    setMeasuredCount(count => count + 1);
+  }, []);
+
+  const handleScroll = () => {
+    const list = listRef.current;
+    distanceFromBottom.current = list.scrollHeight - list.scrollTop - list.clientHeight;
+    setViewport({ top: list.scrollTop, height: list.clientHeight });
+    if (list.scrollTop < LOAD_OLDER_THRESHOLD_PX && hasOlder && !isLoadingOlder) {
+      onLoadOlder();
+    }
+  };
+
+  // Older messages keep the view where it was; new ones scroll it down if the
+  // user was already reading the latest messages
+  useLayoutEffect(() => {
+    const list = listRef.current;
+    if (!list || messages.length === 0) return;
+    const first = messages[0].key || messages[0].id;
+    const last = messages[messages.length - 1].key || messages[messages.length - 1].id;
+    const previous = edges.current;
+    if (previous.last === null || (previous.last !== last && distanceFromBottom.current < ESTIMATED_ROW_HEIGHT)) {
+      list.scrollTop = list.scrollHeight;
+    } else if (previous.first !== first) {
+      list.scrollTop = list.scrollHeight - list.clientHeight - distanceFromBottom.current;
+    }
+    edges.current = { first, last };
+    distanceFromBottom.current = list.scrollHeight - list.scrollTop - list.clientHeight;
+    setViewport({ top: list.scrollTop, height: list.clientHeight });
+  }, [messages]);
+
+  // Keep loading while the loaded history does not fill the list
+  useEffect(() => {
+    const list = listRef.current;
+    if (list && hasOlder && !isLoadingOlder && list.scrollHeight <= list.clientHeight + LOAD_OLDER_THRESHOLD_PX) {
+      onLoadOlder();
+    }
+  }, [messages, hasOlder, isLoadingOlder, onLoadOlder]);
+
+  let offset = 0;
+  let topSpace = 0;
+  let bottomSpace = 0;
+  const rows = [];
+  messages.forEach(msg => {
+    const key = msg.key || msg.id;
+    const height = heights.current.get(key) || ESTIMATED_ROW_HEIGHT;
+    const visible = offset + height >= viewport.top - OVERSCAN_PX &&
+      offset <= viewport.top + viewport.height + OVERSCAN_PX;
+    if (visible) {
+      rows.push({ msg, key, top: offset });
+    } else if (rows.length === 0) {
+      topSpace += height;
+    } else {
+      bottomSpace += height;
+    }
+    offset += height;
+  });
+
+  return (
+    <MessageList ref={listRef} onScroll={handleScroll} sx={{ overflowAnchor: 'none' }}>
+      {isLoadingOlder && (
+        <HistoryStatus>
+          <CircularProgress size={20} />
+        </HistoryStatus>
+      )}
+      {olderFailed && (
+        <HistoryStatus>
+          <Typography variant="body2">Older messages could not be loaded.</Typography>
+        </HistoryStatus>
+      )}
+      {messages.length === 0 && !hasOlder ? (
+        <Box sx={{ textAlign: 'center', p: 3, color: 'text.secondary' }}>
+          <Typography variant="body1">{emptyText}</Typography>
+        </Box>
+      ) : (
+        <>
+          <div style={{ height: topSpace }} />
+          {rows.map(({ msg, key, top }) => (
+            <MeasuredRow key={key} rowKey={key} top={top} onMeasure={handleMeasure}>
+              <Box
+                sx={{
+                  display: 'flex',
+                  justifyContent: msg.sender === 'user' ? 'flex-end' : 'flex-start',
+                  pb: 2
+                }}
+              >
+                <MessageItem sender={msg.sender}>
+                  <Typography variant="body1">{msg.text}</Typography>
+                </MessageItem>
+              </Box>
+            </MeasuredRow>
+          ))}
+          <div style={{ height: bottomSpace }} />
+        </>
+      )}
+    </MessageList>
+  );
+}
+
 
 function Chat() {
   const [message, setMessage] = useState('');
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState({ nextToken: null, phase: 'indexed' });
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  const [historyReady, setHistoryReady] = useState(false);
   const [lexClient, setLexClient] = useState(null);
   const [sessionId, setSessionId] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const loadingOlder = useRef(false);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -127,28 +375,94 @@ function Chat() {
     initializeLex();
   }, [navigate]);
 
-  // Load chat history after Lex client ready and not loading
+  // Load the newest page of history after Lex client ready and not loading.
+  // History already loaded in this tab, or the newest page from the last
+  // visit, is shown straight away while the newest page is fetched again.
   useEffect(() => {
-    const loadMessages = async () => {
-      const msgs = await fetchMessagesFromGraphQL();
-      msgs.sort((a, b) => new Date(a.createdAt) - new Date(b.createdAt));
-      setMessages(msgs.map(m => ({
-        text: m.content,
-        sender: m.sender,
-        id: m.id,
-        createdAt: m.createdAt,
-      })));
+    const loadNewestPage = async () => {
+      const cached = historyCache.get(sessionId);
+      if (cached) {
+        setMessages(prev => mergeMessages(cached.messages, prev));
+        setOlderCursor(cached.cursor);
+      } else {
+        setMessages(prev => mergeMessages(readStoredPage(sessionId), prev));
+      }
+
+      try {
+        const page = await fetchMessagesFromGraphQL(sessionId);
+        const newest = page.items.map(toChatMessage);
+        // Loaded history only stays valid if the fresh page connects to it
+        const connected = cached && newest.some(m => cached.messages.some(c => c.id === m.id));
+        if (connected) {
+          setMessages(prev => mergeMessages(prev, newest));
+        } else {
+          setMessages(prev => mergeMessages(prev.filter(m => m.pending), newest));
+          setOlderCursor(nextCursor(page, 'indexed'));
+        }
+      } catch (error) {
+        console.error('Error loading chat history:', error);
+        setOlderCursor(cursor => ({ ...cursor, failed: true }));
+      } finally {
+        setHistoryReady(true);
+      }
     };
 
-    if (!isLoading && lexClient) {
-      loadMessages();
+    if (!isLoading && lexClient && sessionId) {
+      loadNewestPage();
+    }
+  }, [isLoading, lexClient, sessionId]);
+
+  // Keep what has been loaded for the next visit
+  useEffect(() => {
+    if (!historyReady || !sessionId) return;
+    historyCache.set(sessionId, { messages, cursor: { ...olderCursor, failed: false } });
+    storeNewestPage(sessionId, messages.filter(m => !m.pending));
+  }, [historyReady, sessionId, messages, olderCursor]);
+
+  const loadOlder = useCallback(async () => {
+    const { nextToken, phase, failed } = olderCursor;
+    if (!historyReady || phase === 'done' || failed || loadingOlder.current) return;
+
+    loadingOlder.current = true;
+    setIsLoadingOlder(true);
+    try {
+      const page = phase === 'indexed'
+        ? await fetchMessagesFromGraphQL(sessionId, nextToken)
+        : await fetchLegacyMessagesFromGraphQL(nextToken);
+      setMessages(prev => mergeMessages(prev, page.items.map(toChatMessage)));
+      setOlderCursor(nextCursor(page, phase));
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+      setOlderCursor(cursor => ({ ...cursor, failed: true }));
+    } finally {
+      loadingOlder.current = false;
+      setIsLoadingOlder(false);
     }
-  }, [isLoading, lexClient]);
+  }, [historyReady, olderCursor, sessionId]);
+
+  // A message shown before it is saved; createdAt is sent along so it sorts the same once stored
+  const localMessage = (text, sender) => ({
+    text,
+    sender,
+    key: `local-${Date.now()}-${Math.random().toString(36).slice(2)}`,
+    createdAt: new Date().toISOString(),
+    pending: true,
+  });
+
+  const saveLocalMessage = async (msg) => {
+    const saved = await saveMessageToGraphQL({
+      content: msg.text,
+      sender: msg.sender,
+      conversation: sessionId,
+      createdAt: msg.createdAt,
+    });
+    setMessages(prev => prev.map(m => (m.key === msg.key ? { ...m, id: saved.id, pending: false } : m)));
+  };
 
   const handleSend = async () => {
     if (!message.trim() || !lexClient) return;
 
-    const userMessage = { text: message, sender: 'user' };
+    const userMessage = localMessage(message, 'user');
     setMessages(prev => [...prev, userMessage]);
 
     try {
@@ -163,31 +477,24 @@ function Chat() {
       const response = await lexClient.recognizeText(params);
 
       // Save user message to GraphQL
-      await saveMessageToGraphQL({
-        content: message,
-        sender: 'user',
-      });
+      await saveLocalMessage(userMessage);
 
       let botReply = "I didn't understand that. Can you rephrase?";
       if (response.messages && response.messages.length > 0) {
         botReply = response.messages[0].content;
       }
 
-      setMessages(prev => [...prev, { text: botReply, sender: 'bot' }]);
+      const botMessage = localMessage(botReply, 'bot');
+      setMessages(prev => [...prev, botMessage]);
 
       // Save bot message to GraphQL
-      await saveMessageToGraphQL({
-        content: botReply,
-        sender: 'bot',
-      });
+      await saveLocalMessage(botMessage);
     } catch (error) {
       console.error('Error communicating with Lex:', error);
       const errorMsg = "Sorry, I'm having trouble connecting. " + error.message;
-      setMessages(prev => [...prev, { text: errorMsg, sender: 'bot' }]);
-      await saveMessageToGraphQL({
-        content: errorMsg,
-        sender: 'bot',
-      });
+      const errorMessage = localMessage(errorMsg, 'bot');
+      setMessages(prev => [...prev, errorMessage]);
+      await saveLocalMessage(errorMessage);
     }
 
     setMessage('');
@@ -196,6 +503,7 @@ function Chat() {
   const handleLogout = async () => {
     try {
       await signOut();
+      clearHistoryCache();
       navigate('/login');
     } catch (error) {
       console.error('Error during sign out:', error);
@@ -227,30 +535,14 @@ function Chat() {
       </AppBar>
 
       <ChatContainer elevation={6}>
-        <MessageList>
-          {messages.length === 0 ? (
-            <Box sx={{ textAlign: 'center', p: 3, color: 'text.secondary' }}>
-              <Typography variant="body1">
-                Start chatting with the Cloud Assistant. Ask anything!
-              </Typography>
-            </Box>
-          ) : (
-            messages.map((msg, index) => (
-              <Box
-                key={msg.id || index}
-                sx={{
-                  display: 'flex',
-                  justifyContent: msg.sender === 'user' ? 'flex-end' : 'flex-start',
-                  mb: 2
-                }}
-              >
-                <MessageItem sender={msg.sender}>
-                  <Typography variant="body1">{msg.text}</Typography>
-                </MessageItem>
-              </Box>
-            ))
-          )}
-        </MessageList>
+        <VirtualMessageList
+          messages={messages}
+          hasOlder={olderCursor.phase !== 'done' && !olderCursor.failed}
+          isLoadingOlder={isLoadingOlder}
+          olderFailed={Boolean(olderCursor.failed)}
+          onLoadOlder={loadOlder}
+          emptyText="Start chatting with the Cloud Assistant. Ask anything!"
+        />
         <Box sx={{ p: 2, display: 'flex', gap: 1, alignItems: 'center', bgcolor: 'rgba(255, 255, 255, 0.9)' }}>
           <TextField
             value={message}
@@ -10,6 +10,7 @@ export const createMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -26,6 +27,7 @@ export const updateMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -42,6 +44,7 @@ export const deleteMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -7,6 +7,7 @@ export const getMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -25,6 +26,39 @@ export const listMessages = /* GraphQL */ `
         id
         content
         sender
+        conversation
+        createdAt
+        updatedAt
+        owner
+        __typename
+      }
+      nextToken
+      __typename
+    }
+  }
+`;
+export const messagesByConversation = /* GraphQL */ `
+  query MessagesByConversation(
+    $conversation: String!
+    $createdAt: ModelStringKeyConditionInput
+    $sortDirection: ModelSortDirection
+    $filter: ModelMessageFilterInput
+    $limit: Int
+    $nextToken: String
+  ) {
+    messagesByConversation(
+      conversation: $conversation
+      createdAt: $createdAt
+      sortDirection: $sortDirection
+      filter: $filter
+      limit: $limit
+      nextToken: $nextToken
+    ) {
+      items {
+        id
+        content
+        sender
+        conversation
         createdAt
         updatedAt
         owner
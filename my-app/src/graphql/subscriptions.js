@@ -10,6 +10,7 @@ export const onCreateMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -26,6 +27,7 @@ export const onUpdateMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
@@ -42,6 +44,7 @@ export const onDeleteMessage = /* GraphQL */ `
       id
       content
       sender
+      conversation
       createdAt
       updatedAt
       owner
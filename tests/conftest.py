@@ -0,0 +1,42 @@
+"""
+Shared fixtures: a synthetic AWS account from the benchmark harness, installed
+as the client factory so nothing in the tests reaches AWS, plus builders for
+Lex events and Lambda contexts
+"""
+import pytest
+
+from benchmarks.synthetic_aws import SyntheticAccount, SyntheticBackend
+from cloud_assistant import clients
+
+@pytest.fixture
+def backend():
+    """Small synthetic account served without latency or throttling"""
+    account = SyntheticAccount(regions=3, instances_per_region=50, buckets=20, alarms=100, objects_per_bucket=10)
+    backend = SyntheticBackend(account, validate=False)
+    clients.set_client_factory(backend)
+    yield backend
+    clients.set_client_factory(None)
+
+class Context:
+    """Lambda context stand-in with a fixed remaining time"""
+    
+    function_name = 'cloud-assistant-test'
+    aws_request_id = 'test'
+    
+    def __init__(self, remaining_ms=600000):
+        self.remaining_ms = remaining_ms
+    
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+def lex_event(intent_name='ListEC2Instances', attributes=None, **slots):
+    """Lex V2 fulfilment event for an intent, its slot values and session attributes"""
+    return {
+        'sessionState': {
+            'sessionAttributes': dict(attributes or {}),
+            'intent': {
+                'name': intent_name,
+                'slots': {name: {'value': {'interpretedValue': value}} for name, value in slots.items()}
+            }
+        }
+    }
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from benchmarks.synthetic_aws import SyntheticAccount, SyntheticBackend
+from cloud_assistant import accounts, clients
+
+MEMBER = '000000000001'
+OUTSIDER = '999999999999'
+
+@pytest.fixture
+def organization(monkeypatch):
+    """Synthetic organization of the management account and two members"""
+    account = SyntheticAccount(regions=2, instances_per_region=10, buckets=4, alarms=10, objects_per_bucket=1, member_accounts=2)
+    backend = SyntheticBackend(account, validate=False)
+    clients.set_client_factory(backend)
+    monkeypatch.setattr(accounts, '_credentials', {})
+    accounts.account_cache.invalidate()
+    yield backend
+    accounts.account_cache.invalidate()
+    clients.set_client_factory(None)
+
+def test_static_account_list(monkeypatch):
+    monkeypatch.setattr(accounts, 'ACCOUNTS', '111111111111:prod, 222222222222')
+    assert accounts.list_accounts() == [{'Id': '111111111111', 'Name': 'prod'}, {'Id': '222222222222', 'Name': None}]
+    monkeypatch.setattr(accounts, 'ACCOUNTS', '')
+    assert accounts.list_accounts() is None
+
+def test_organization_accounts_are_listed_once(organization, monkeypatch):
+    monkeypatch.setattr(accounts, 'ACCOUNTS', 'organizations')
+    listed = accounts.list_accounts()
+    assert [account['Id'] for account in listed] == ['000000000000', MEMBER, '000000000002']
+    accounts.list_accounts()
+    assert organization.calls[('organizations', 'list_accounts')] == 1
+
+def test_accounts_are_selected_by_id_or_name(monkeypatch):
+    monkeypatch.setattr(accounts, 'ACCOUNTS', '111111111111:prod,222222222222:staging')
+    assert accounts.select_accounts('PROD') == [{'Id': '111111111111', 'Name': 'prod'}]
+    assert accounts.select_accounts('222222222222') == [{'Id': '222222222222', 'Name': 'staging'}]
+    assert len(accounts.select_accounts('all')) == len(accounts.select_accounts()) == 2
+    with pytest.raises(accounts.UnknownAccountError):
+        accounts.select_accounts('dev')
+
+def test_member_credentials_are_assumed_once(organization):
+    assert accounts.get_credentials('000000000000') is None
+    credentials = accounts.get_credentials(MEMBER)
+    assert credentials['aws_access_key_id'] == f"ASIA{MEMBER}"
+    assert accounts.get_credentials(MEMBER) is credentials
+    assert organization.calls[('sts', 'assume_role')] == 1
+
+def test_credentials_close_to_expiry_are_renewed(organization):
+    credentials = accounts.get_credentials(MEMBER)
+    accounts._credentials[MEMBER] = (credentials, time.time() + accounts.CREDENTIAL_REFRESH_MARGIN - 1)
+    renewed = accounts.get_credentials(MEMBER)
+    assert renewed['aws_session_token'] != credentials['aws_session_token']
+    assert organization.calls[('sts', 'assume_role')] == 2
+
+def test_scan_runs_every_cell_in_its_account(organization):
+    account_list = [{'Id': '000000000000'}, {'Id': MEMBER}, {'Id': OUTSIDER}]
+    results, skipped, failed = accounts.scan(
+        lambda region: (clients.current_account(), clients.current_credentials() is not None),
+        account_list,
+        ['us-east-1', 'us-east-2']
+    )
+    assert results == {
+        ('000000000000', 'us-east-1'): (None, False),
+        ('000000000000', 'us-east-2'): (None, False),
+        (MEMBER, 'us-east-1'): (MEMBER, True),
+        (MEMBER, 'us-east-2'): (MEMBER, True)
+    }
+    # An account whose role cannot be assumed fails as a whole, not per region
+    assert not skipped
+    assert list(failed) == [(OUTSIDER, None)]
+
+def test_scan_asks_each_account_for_its_regions(organization):
+    results, _, _ = accounts.scan(
+        lambda region: region,
+        [{'Id': '000000000000'}, {'Id': MEMBER}],
+        lambda: ['us-east-1'] if clients.current_account() else ['us-east-1', 'us-east-2']
+    )
+    assert sorted(results) == [('000000000000', 'us-east-1'), ('000000000000', 'us-east-2'), (MEMBER, 'us-east-1')]
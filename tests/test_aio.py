@@ -0,0 +1,97 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from cloud_assistant import aio
+from cloud_assistant.fanout import DEADLINE_SAFETY_MARGIN_MS
+from tests.conftest import Context
+
+async def lookup(item):
+    if item == 'network-timeout':
+        raise asyncio.TimeoutError()
+    if item == 'slow':
+        await asyncio.sleep(5)
+    return item.upper()
+
+def test_network_timeouts_fail_and_task_timeouts_skip():
+    results, skipped, failed = aio.run(
+        aio.fan_out_async, lookup, ['a', 'network-timeout', 'slow'], task_timeout=0.1
+    )
+    assert results == {'a': 'A'}
+    assert skipped == ['slow']
+    assert isinstance(failed['network-timeout'], asyncio.TimeoutError)
+
+def test_lookups_past_the_deadline_are_skipped():
+    context = Context(DEADLINE_SAFETY_MARGIN_MS + 100)
+    results, skipped, failed = aio.run(aio.fan_out_async, lookup, ['a', 'slow'], context, context=context)
+    assert results == {'a': 'A'}
+    assert skipped == ['slow'] and not failed
+
+def test_run_cancels_the_coroutine_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(aio, 'AIO_RESULT_GRACE_MS', 0)
+    cancelled = threading.Event()
+    
+    async def hang():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    with pytest.raises(TimeoutError):
+        aio.run(hang, context=Context(DEADLINE_SAFETY_MARGIN_MS + 50))
+    assert cancelled.wait(1)
+
+@pytest.fixture
+def silent_endpoint(monkeypatch):
+    """Real aiobotocore clients pointed at a local socket that accepts requests and never answers"""
+    pytest.importorskip('aiobotocore')
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    connections = []
+    
+    def accept():
+        while True:
+            try:
+                connections.append(server.accept()[0])
+            except OSError:
+                return
+    
+    threading.Thread(target=accept, daemon=True).start()
+    monkeypatch.setenv('AWS_ENDPOINT_URL', f"http://127.0.0.1:{server.getsockname()[1]}")
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_READ_TIMEOUT', '1')
+    monkeypatch.setattr(aio, '_session', None)
+    monkeypatch.setattr(aio, '_client_config', None)
+    aio.set_client_factory(None)
+    yield
+    aio.set_client_factory(None)
+    server.close()
+    for connection in connections:
+        connection.close()
+
+async def describe_regions(region):
+    ec2 = await aio.get_client('ec2', region)
+    return await ec2.describe_regions()
+
+def test_real_client_read_timeout_counts_as_failed(silent_endpoint):
+    results, skipped, failed = aio.run(aio.fan_out_async, describe_regions, ['us-east-1'], task_timeout=5)
+    assert not results and not skipped
+    assert 'us-east-1' in failed
+
+def test_real_client_call_is_cut_off_at_the_deadline(silent_endpoint, monkeypatch):
+    monkeypatch.setenv('AWS_READ_TIMEOUT', '30')
+    context = Context(DEADLINE_SAFETY_MARGIN_MS + 200)
+    started = time.monotonic()
+    results, skipped, failed = aio.run(aio.fan_out_async, describe_regions, ['us-east-1'], context, context=context)
+    assert skipped == ['us-east-1'] and not failed
+    
+    monkeypatch.setattr(aio, 'AIO_RESULT_GRACE_MS', 0)
+    with pytest.raises(TimeoutError):
+        aio.run(describe_regions, 'us-east-1', context=context)
+    assert time.monotonic() - started < 5
@@ -0,0 +1,71 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cloud_assistant import alarm_index
+from cloud_assistant.alarm_index import apply_event, get_index
+
+REGION = 'us-east-1'
+
+def state_change(name, state, timestamp, detail_type='CloudWatch Alarm State Change'):
+    return {
+        'detail-type': detail_type,
+        'source': 'aws.cloudwatch',
+        'account': '000000000000',
+        'region': REGION,
+        'detail': {
+            'alarmName': name,
+            'state': {'value': state, 'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.000+0000')}
+        }
+    }
+
+@pytest.fixture
+def index(backend):
+    alarm_index.clear_indexes()
+    index = get_index(REGION).refresh()
+    yield index
+    alarm_index.clear_indexes()
+
+def test_full_sync_indexes_every_alarm(index):
+    assert len(index.query()) == 100
+    assert len(index.query(state='ALARM')) == 20
+    assert {record['Name'] for record in index.query(name_prefix='alarm-0001')} == {f"alarm-{n:05d}" for n in range(10, 20)}
+    assert all('AWS/EC2' in record['Namespaces'] for record in index.query(namespace='AWS/EC2'))
+
+def test_state_change_event_moves_the_alarm_between_states(index):
+    assert index.alarms['alarm-00000']['State'] == 'OK'
+    assert apply_event(state_change('alarm-00000', 'ALARM', datetime.now(timezone.utc)))
+    assert 'alarm-00000' in {record['Name'] for record in index.query(state='ALARM')}
+    assert 'alarm-00000' not in {record['Name'] for record in index.query(state='OK')}
+
+def test_older_event_does_not_override_a_newer_state(index):
+    now = datetime.now(timezone.utc)
+    apply_event(state_change('alarm-00000', 'ALARM', now))
+    assert apply_event(state_change('alarm-00000', 'OK', now - timedelta(minutes=5)))
+    assert index.alarms['alarm-00000']['State'] == 'ALARM'
+
+def test_unknown_alarms_and_other_events_are_not_applied(index):
+    assert not apply_event(state_change('not-indexed', 'ALARM', datetime.now(timezone.utc)))
+    assert not apply_event(state_change('alarm-00000', 'ALARM', datetime.now(timezone.utc), detail_type='Other'))
+
+def test_event_before_the_first_sync_is_left_to_the_sync(backend):
+    alarm_index.clear_indexes()
+    assert not apply_event(state_change('alarm-00000', 'ALARM', datetime.now(timezone.utc)))
+
+def test_queries_and_events_do_not_wait_for_a_full_sync(index, backend):
+    backend.latency_ms = 300
+    index.full_synced_monotonic = None
+    sync = threading.Thread(target=index.refresh)
+    sync.start()
+    time.sleep(0.05)
+    
+    started = time.monotonic()
+    assert len(index.query()) == 100
+    assert apply_event(state_change('alarm-00000', 'ALARM', datetime.now(timezone.utc)))
+    assert time.monotonic() - started < 0.2
+    
+    sync.join(10)
+    # The change that arrived during the sync survives the swap
+    assert index.alarms['alarm-00000']['State'] == 'ALARM'
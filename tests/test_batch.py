@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from cloud_assistant import batch
+from cloud_assistant.batch import BatchItemError, _parse, handle_batch
+from tests.conftest import Context, lex_event
+
+SHARED_INTENTS = {'ListEC2Instances'}
+
+def sqs_record(message_id, body):
+    return {'messageId': message_id, 'eventSource': 'aws:sqs', 'body': body}
+
+def fulfilled(request, context=None):
+    region = request['sessionState']['intent']['slots']['Region']['value']['interpretedValue']
+    return {
+        'sessionState': {'sessionAttributes': {}, 'intent': {'name': 'ListEC2Instances', 'state': 'Fulfilled'}},
+        'messages': [{'contentType': 'PlainText', 'content': region}]
+    }
+
+def test_parse_sqs_records():
+    shape, items = _parse({'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1'))), sqs_record('m2', '{not json')]})
+    assert shape == 'sqs'
+    assert items[0] == ('m1', lex_event(Region='us-east-1'))
+    assert items[1][0] == 'm2' and isinstance(items[1][1], BatchItemError)
+
+def test_parse_rejects_other_record_sources():
+    with pytest.raises(ValueError):
+        _parse({'Records': [{'messageId': 'm1', 'eventSource': 'aws:kinesis'}]})
+
+def test_parse_appsync_batch():
+    shape, items = _parse([{'arguments': {'request': lex_event(Region='us-east-1')}}, {'arguments': {'request': {'foo': 1}}}])
+    assert shape == 'appsync'
+    assert items[0] == ('0', lex_event(Region='us-east-1'))
+    assert items[1][0] == '1' and isinstance(items[1][1], BatchItemError)
+
+def test_parse_direct_requests():
+    shape, items = _parse({'requests': [{'id': 'a', 'request': lex_event(Region='us-east-1')}, {'request': lex_event(Region='us-east-1')}]})
+    assert shape == 'direct'
+    assert [item_id for item_id, _ in items] == ['a', '1']
+
+def test_parse_rejects_duplicate_direct_ids():
+    with pytest.raises(ValueError, match="a"):
+        _parse({'requests': [{'id': 'a', 'request': lex_event(Region='us-east-1')}, {'id': 'a', 'request': lex_event(Region='eu-west-1')}]})
+
+def test_malformed_sqs_messages_are_not_retried():
+    event = {'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1'))), sqs_record('m2', '{not json')]}
+    result, stats = handle_batch(event, None, fulfilled, SHARED_INTENTS)
+    assert result == {'batchItemFailures': []}
+    assert stats['FailedItems'] == 1
+
+def test_failed_sqs_fulfilment_is_retried():
+    def fail(request, context=None):
+        raise RuntimeError('throttled')
+    
+    result, _ = handle_batch({'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1')))]}, None, fail, SHARED_INTENTS)
+    assert result == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+
+def test_malformed_sqs_messages_are_answered_with_their_error(backend, monkeypatch):
+    monkeypatch.setattr(batch, 'BATCH_RESULT_QUEUE', 'https://sqs.us-east-1.amazonaws.com/123456789012/answers')
+    event = {'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1'))), sqs_record('m2', '{not json')]}
+    result, _ = handle_batch(event, None, fulfilled, SHARED_INTENTS)
+    assert result == {'batchItemFailures': []}
+    answers = [json.loads(body) for body in backend.sent_messages[batch.BATCH_RESULT_QUEUE]]
+    assert {answer['requestId'] for answer in answers} == {'m1', 'm2'}
+    assert 'error' in next(answer for answer in answers if answer['requestId'] == 'm2')
+
+def test_identical_requests_are_fulfilled_once():
+    calls = []
+    
+    def fulfil(request, context=None):
+        calls.append(1)
+        return fulfilled(request)
+    
+    event = {'requests': [{'id': 'a', 'request': lex_event(Region='us-east-1')}, {'id': 'b', 'request': lex_event(Region='us-east-1')}]}
+    result, stats = handle_batch(event, None, fulfil, SHARED_INTENTS)
+    assert len(calls) == 1 and stats['DistinctRequests'] == 1
+    assert [response['id'] for response in result['responses']] == ['a', 'b']
+
+def test_requests_see_an_earlier_deadline_than_the_batch():
+    seen = []
+    
+    def fulfil(request, context):
+        seen.append((context.get_remaining_time_in_millis(), context.function_name))
+        return fulfilled(request)
+    
+    handle_batch({'requests': [{'id': 'a', 'request': lex_event(Region='us-east-1')}]}, Context(10000), fulfil, SHARED_INTENTS)
+    assert seen == [(10000 - batch.BATCH_ITEM_MARGIN_MS, 'cloud-assistant-test')]
+
+def test_non_dict_appsync_items_fail_on_their_own():
+    result, _ = handle_batch([{'arguments': {'request': lex_event(Region='us-east-1')}}, 'not a request', None], None, fulfilled, SHARED_INTENTS)
+    assert result[0]['data']['messages'][0]['content'] == 'us-east-1'
+    assert [item['errorType'] for item in result[1:]] == ['BatchItemError', 'BatchItemError']
+
+def test_sqs_records_without_a_message_id_are_rejected():
+    event = {'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1'))), {'eventSource': 'aws:sqs', 'body': '{}'}]}
+    result, stats = handle_batch(event, None, fulfilled, SHARED_INTENTS)
+    assert result == {'batchItemFailures': []}
+    assert stats['FailedItems'] == 1
+
+def test_malformed_messages_are_acknowledged_when_their_reply_fails(backend, monkeypatch):
+    monkeypatch.setattr(batch, 'BATCH_RESULT_QUEUE', 'https://sqs.us-east-1.amazonaws.com/123456789012/answers')
+    monkeypatch.setattr(batch, '_send_results', lambda answers: [item_id for item_id, _ in answers])
+    event = {'Records': [sqs_record('m1', json.dumps(lex_event(Region='us-east-1'))), sqs_record('m2', '{not json')]}
+    result, _ = handle_batch(event, None, fulfilled, SHARED_INTENTS)
+    assert result == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.run import SCENARIOS
+
+SMALL_ACCOUNT = ['--regions', '2', '--instances', '20', '--buckets', '6', '--objects', '20', '--alarms', '20']
+
+def run_benchmark(*args):
+    """Run the harness in its own interpreter, since it installs module-wide client factories"""
+    return subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', *SMALL_ACCOUNT, '--iterations', '2', *args],
+        capture_output=True, text=True, timeout=120, cwd=Path(__file__).parent.parent
+    )
+
+def test_every_scenario_is_fulfilled(tmp_path):
+    output = tmp_path / 'results.json'
+    finished = run_benchmark('--cold-cache', '--json', str(output))
+    assert finished.returncode == 0, finished.stdout + finished.stderr
+    results = json.loads(output.read_text())
+    assert [result['scenario'] for result in results] == list(SCENARIOS)
+    assert all(result['failures'] == 0 and result['iterations'] == 2 for result in results)
+    # Cold caches make every invocation reach the synthetic account
+    by_name = {result['scenario']: result for result in results}
+    assert by_name['ec2-all-regions']['api_calls_per_invocation'] > 0
+
+def test_async_path_runs_against_the_stand_in(tmp_path):
+    output = tmp_path / 'results.json'
+    finished = run_benchmark('--async', '--cold-cache', '--scenario', 'ec2-all-regions', '--scenario', 's3-list-buckets', '--json', str(output))
+    assert finished.returncode == 0, finished.stdout + finished.stderr
+    assert all(result['failures'] == 0 and result['api_calls_per_invocation'] > 0 for result in json.loads(output.read_text()))
+
+def test_p95_gate_fails_the_run():
+    finished = run_benchmark('--scenario', 'job-status', '--max-p95-ms', '0')
+    assert finished.returncode == 1
+    assert "p95 above 0.0 ms: job-status" in finished.stdout
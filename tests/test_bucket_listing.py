@@ -0,0 +1,76 @@
+import pytest
+
+from cloud_assistant import accounts, bucket_listing
+from cloud_assistant.bucket_listing import describe_bucket_overview, list_buckets_enriched, size_class
+from tests.conftest import Context
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    caches = [bucket_listing.bucket_details_cache, bucket_listing.region_sizes_cache, accounts.account_cache]
+    for cache in caches:
+        cache.invalidate()
+    yield
+    for cache in caches:
+        cache.invalidate()
+
+def expected_size(backend, index):
+    # The synthetic account publishes storage metrics for even-numbered buckets only
+    return backend.account.objects_per_bucket * 32 * 1024 * (1 + index % 7) if index % 2 == 0 else None
+
+def test_every_bucket_gets_region_access_and_size(backend):
+    buckets, pending = list_buckets_enriched(Context())
+    assert pending == 0
+    assert len(buckets) == backend.account.buckets
+    for index, bucket in enumerate(buckets):
+        assert bucket['Region'] == backend.account.bucket_region(index)
+        assert bucket['IsPublic'] == (index % 10 == 0)
+        assert bucket['Size'] == expected_size(backend, index)
+    # ListBuckets reports each bucket's region, so no GetBucketLocation calls are needed
+    assert ('s3', 'get_bucket_location') not in backend.calls
+
+def test_details_and_sizes_are_cached(backend):
+    list_buckets_enriched(Context())
+    backend.reset_calls()
+    list_buckets_enriched(Context())
+    assert backend.calls == {('s3', 'list_buckets'): 1}
+
+def test_sizes_are_read_in_batches_of_metric_queries(backend, monkeypatch):
+    monkeypatch.setattr(bucket_listing, 'METRIC_QUERIES_PER_CALL', 2)
+    buckets, _ = list_buckets_enriched(Context())
+    assert [bucket['Size'] for bucket in buckets] == [expected_size(backend, index) for index in range(len(buckets))]
+    # 10 sized buckets spread over 3 regions: 4, 3 and 3 series
+    assert backend.calls[('cloudwatch', 'get_metric_data')] == 2 + 2 + 2
+
+def test_bucket_without_a_reported_region_is_located(backend):
+    details = bucket_listing.get_bucket_details({'Name': 'bucket-00001'})
+    assert details == {'Region': backend.account.bucket_region(1), 'IsPublic': False}
+    assert backend.calls[('s3', 'get_bucket_location')] == 1
+
+def test_location_constraints_are_normalised():
+    assert bucket_listing._normalise_region(None) == 'us-east-1'
+    assert bucket_listing._normalise_region('EU') == 'eu-west-1'
+    assert bucket_listing._normalise_region('ap-south-1') == 'ap-south-1'
+
+def test_size_classes():
+    assert size_class(None) == 'unknown'
+    assert size_class(1024) == 'under 1 GB'
+    assert size_class(1024 ** 3) == '1 GB - 1 TB'
+    assert size_class(5 * 1024 ** 4) == 'over 1 TB'
+
+def test_accounts_that_cannot_be_entered_are_reported(backend, monkeypatch):
+    monkeypatch.setattr(accounts, '_credentials', {})
+    account_list = [{'Id': backend.account.account_id, 'Name': 'main'}, {'Id': '999999999999', 'Name': None}]
+    buckets, pending, failed = bucket_listing.list_buckets_across_accounts(account_list, Context())
+    assert len(buckets) == backend.account.buckets and pending == 0
+    assert {bucket['Account'] for bucket in buckets} == {backend.account.account_id}
+    assert list(failed) == ['999999999999']
+
+def test_overview_lists_the_largest_buckets(backend):
+    buckets, _ = list_buckets_enriched(Context())
+    content = describe_bucket_overview(buckets, pending=3, limit=5)
+    assert content.startswith("You have 20 S3 buckets across 3 regions.")
+    assert "Publicly accessible: 2 (bucket-00000, bucket-00010)" in content
+    assert "By size: 10 under 1 GB, 10 unknown" in content
+    assert "Largest 5 buckets:\n1. bucket-00006 (" in content
+    assert "...and 15 more buckets" in content
+    assert "Details for 3 buckets were still loading" in content
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from cloud_assistant import bucket_stats, clients
+from cloud_assistant.bucket_stats import count_objects_live, split_points
+
+class FlatS3:
+    """list_objects_v2 over a flat, sorted key list, recording the calls made"""
+    
+    def __init__(self, keys, page_size=100):
+        self.keys = sorted(keys)
+        self.page_size = page_size
+        self.calls = 0
+        self.meta = None
+        self._lock = threading.Lock()
+    
+    def list_objects_v2(self, Bucket, StartAfter=None, ContinuationToken=None):
+        with self._lock:
+            self.calls += 1
+        keys = [k for k in self.keys if StartAfter is None or k > StartAfter]
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.page_size]
+        response = {
+            'Contents': [{'Key': k, 'Size': 10} for k in page],
+            'IsTruncated': start + self.page_size < len(keys)
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + self.page_size)
+        return response
+
+@pytest.fixture
+def flat_bucket():
+    s3 = FlatS3([f"events/{n:06d}.json" for n in range(5000)])
+    clients.set_client_factory(lambda service, region, credentials=None: s3)
+    yield s3
+    clients.set_client_factory(None)
+
+def test_split_points_are_ordered_and_after_the_last_key():
+    points = split_points('logs/000000', 'logs/000999', limit=30)
+    assert points
+    assert points == sorted(points)
+    assert all(point > 'logs/000999' for point in points)
+    assert points[0] == 'logs/001'
+
+def test_split_points_stop_before_the_range_end():
+    assert all(point < 'logs/003' for point in split_points('logs/000000', 'logs/000999', upto='logs/003'))
+    assert split_points('a', 'b', limit=0) == []
+
+def test_live_count_of_a_flat_bucket_is_exact_and_split(flat_bucket, monkeypatch):
+    monkeypatch.setattr(bucket_stats, 'LIVE_COUNT_PAGES_PER_RANGE', 2)
+    stats = count_objects_live('flat', 'us-east-1')
+    assert stats['exact']
+    assert stats['objects'] == 5000
+    assert stats['bytes'] == 50000
+
+def test_live_count_keeps_a_bounded_number_of_ranges(flat_bucket, monkeypatch):
+    monkeypatch.setattr(bucket_stats, 'LIVE_COUNT_PAGES_PER_RANGE', 1)
+    monkeypatch.setattr(bucket_stats, 'LIVE_COUNT_MAX_RANGES', 4)
+    seen = []
+    original = bucket_stats.fan_out
+    
+    def recording_fan_out(func, items, *args, **kwargs):
+        seen.append(len(items))
+        return original(func, items, *args, **kwargs)
+    
+    monkeypatch.setattr(bucket_stats, 'fan_out', recording_fan_out)
+    assert count_objects_live('flat', 'us-east-1')['objects'] == 5000
+    # The flat bucket is listed as several concurrent key ranges, never more than the cap
+    assert 1 < max(seen) <= 4
+
+def test_buckets_without_statistics_are_cached_briefly(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(bucket_stats, 'stats_from_cloudwatch', lambda *args: lookups.append(1))
+    monkeypatch.setattr(bucket_stats, 'stats_from_inventory', lambda *args: None)
+    monkeypatch.setattr(bucket_stats, 'count_objects_live', lambda *args: {'objects': 0})
+    bucket_stats.bucket_stats_cache.invalidate()
+    bucket_stats.missing_stats_cache.invalidate()
+    
+    bucket_stats.get_bucket_stats('no-metrics', 'us-east-1')
+    bucket_stats.get_bucket_stats('no-metrics', 'us-east-1')
+    assert len(lookups) == 1
+    assert bucket_stats.bucket_stats_cache.get(('no-metrics', 'us-east-1')) is None
+    assert bucket_stats.missing_stats_cache.ttl < bucket_stats.bucket_stats_cache.ttl
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from cloud_assistant.cache import TTLCache
+
+class Loader:
+    """Counts calls and returns the call number, optionally waiting on an event"""
+    
+    def __init__(self, gate=None):
+        self.calls = 0
+        self.gate = gate
+        self._lock = threading.Lock()
+    
+    def __call__(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self._lock:
+            self.calls += 1
+            return self.calls
+
+def age(cache, key, seconds):
+    """Pretend the entry for key was stored seconds ago"""
+    stored_at, value = cache._entries[key]
+    cache._entries[key] = (stored_at - seconds, value)
+
+def test_fresh_entry_is_served_without_loading():
+    cache = TTLCache('test', ttl=60)
+    loader = Loader()
+    assert cache.get_or_load('k', loader) == 1
+    assert cache.get_or_load('k', loader) == 1
+    assert loader.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_stale_entry_is_served_while_reloading_in_background():
+    cache = TTLCache('test', ttl=1, stale_ttl=60)
+    loader = Loader()
+    cache.get_or_load('k', loader)
+    age(cache, 'k', 2)
+    
+    assert cache.get_or_load('k', loader) == 1
+    deadline = time.time() + 5
+    while cache.get('k') != 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get('k') == 2
+    assert loader.calls == 2
+
+def test_one_background_refresh_per_key():
+    cache = TTLCache('test', ttl=1, stale_ttl=60)
+    cache.set('k', 0)
+    age(cache, 'k', 2)
+    gate = threading.Event()
+    loader = Loader(gate)
+    
+    for _ in range(5):
+        assert cache.get_or_load('k', loader) == 0
+    gate.set()
+    deadline = time.time() + 5
+    while cache._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert loader.calls == 1
+
+def test_expired_entry_reloads_synchronously():
+    cache = TTLCache('test', ttl=1, stale_ttl=1)
+    loader = Loader()
+    cache.get_or_load('k', loader)
+    age(cache, 'k', 5)
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', loader) == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache('test', ttl=60, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache('test', ttl=60)
+    gate = threading.Event()
+    loader = Loader(gate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [1, 1, 1, 1]
+    assert loader.calls == 1
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache('test', ttl=60)
+    
+    def failing():
+        raise RuntimeError('boom')
+    
+    try:
+        cache.get_or_load('k', failing)
+    except RuntimeError:
+        pass
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', Loader()) == 1
+
+def test_persistent_tier_warms_a_new_cache(tmp_path):
+    TTLCache('test', ttl=60, persist_dir=str(tmp_path)).set('k', {'regions': ['us-east-1']})
+    cache = TTLCache('test', ttl=60, persist_dir=str(tmp_path))
+    assert cache.get('k') == {'regions': ['us-east-1']}
+
+def test_get_can_refuse_stale_entries():
+    cache = TTLCache('test', ttl=60, stale_ttl=600)
+    cache.set('k', 'v')
+    age(cache, 'k', 120)
+    assert cache.get('k') == 'v'
+    assert cache.get('k', max_age=cache.ttl) is None
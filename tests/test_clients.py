@@ -0,0 +1,40 @@
+import pytest
+
+from cloud_assistant import clients
+from cloud_assistant.fanout import MAX_REGION_WORKERS
+
+MEMBER_CREDENTIALS = {'aws_access_key_id': 'ASIAMEMBER', 'aws_secret_access_key': 'secret', 'aws_session_token': 'token'}
+
+def test_clients_are_pooled_per_service_region_and_credentials(backend):
+    client = clients.get_client('ec2', 'us-east-1')
+    assert clients.get_client('ec2', 'us-east-1') is client
+    assert clients.get_client('ec2', 'us-east-2') is not client
+    assert clients.get_client('s3', 'us-east-1') is not client
+    
+    with clients.use_account('000000000001', MEMBER_CREDENTIALS):
+        member_client = clients.get_client('ec2', 'us-east-1')
+        assert clients.current_account() == '000000000001'
+    assert member_client is not client
+    assert clients.get_client('ec2', 'us-east-1', MEMBER_CREDENTIALS) is member_client
+
+def test_released_credentials_drop_only_their_clients(backend):
+    client = clients.get_client('ec2', 'us-east-1')
+    member_client = clients.get_client('ec2', 'us-east-1', MEMBER_CREDENTIALS)
+    clients.release_credentials(MEMBER_CREDENTIALS)
+    assert clients.get_client('ec2', 'us-east-1') is client
+    assert clients.get_client('ec2', 'us-east-1', MEMBER_CREDENTIALS) is not member_client
+
+def test_boto3_clients_share_one_pooled_config(monkeypatch):
+    pytest.importorskip('boto3')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    clients.set_client_factory(None)
+    try:
+        client = clients.get_client('ec2', 'us-east-1')
+        assert clients.get_client('ec2', 'us-east-1') is client
+        config = client.meta.config
+        assert config.max_pool_connections >= MAX_REGION_WORKERS
+        assert config.tcp_keepalive
+        assert clients.get_client('s3', 'us-east-1').meta.config.max_pool_connections == config.max_pool_connections
+    finally:
+        clients.set_client_factory(None)
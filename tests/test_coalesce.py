@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from cloud_assistant import coalesce
+from cloud_assistant.coalesce import FlightTimeout, SingleFlight, SQLiteCoalescingStore, request_key
+from tests.conftest import Context, lex_event
+
+def fulfilled(content):
+    return {
+        'sessionState': {'intent': {'state': 'Fulfilled'}},
+        'messages': [{'contentType': 'PlainText', 'content': content}]
+    }
+
+def test_request_key_ignores_slot_case_and_whitespace():
+    assert request_key(lex_event(Region=' US-East-1')) == request_key(lex_event(Region='us-east-1'))
+    assert request_key(lex_event(Region='us-east-1')) != request_key(lex_event(Region='us-west-2'))
+
+def test_waiters_share_the_leaders_result():
+    flight = SingleFlight()
+    gate = threading.Event()
+    calls = []
+    results = []
+    
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return 'answer'
+    
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['answer'] * 3
+    assert len(calls) == 1
+
+def test_waiter_gives_up_after_its_timeout():
+    flight = SingleFlight()
+    gate = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do('k', lambda: gate.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    with pytest.raises(FlightTimeout):
+        flight.do('k', lambda: 'duplicate', timeout=0.1)
+    assert time.monotonic() - started < 1
+    gate.set()
+    leader.join(5)
+
+def test_waiter_wait_is_capped_by_the_invocation_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(coalesce, 'COALESCE_POLL_INTERVAL', 0.01)
+    store = SQLiteCoalescingStore(str(tmp_path / 'coalesce.db'))
+    event = lex_event(Region='us-east-1')
+    assert store.acquire(request_key(event), 'other-process', 60)
+    
+    calls = []
+    started = time.monotonic()
+    response = coalesce.coalesce(event, lambda: calls.append(1) or fulfilled('mine'), Context(1400), store)
+    elapsed = time.monotonic() - started
+    # Half of the 0.4 s left after the safety margin, not the whole budget
+    assert elapsed < 0.6
+    assert calls == []
+    assert response['sessionState']['intent']['state'] == 'Failed'
+    assert 'still gathering' in response['messages'][0]['content']
+
+def test_released_lease_lets_the_waiter_run_itself(tmp_path, monkeypatch):
+    monkeypatch.setattr(coalesce, 'COALESCE_POLL_INTERVAL', 0.01)
+    store = SQLiteCoalescingStore(str(tmp_path / 'coalesce.db'))
+    event = lex_event(Region='us-east-1')
+    key = request_key(event)
+    assert store.acquire(key, 'other-process', 60)
+    threading.Timer(0.05, store.release, (key, 'other-process')).start()
+    
+    response = coalesce.coalesce(event, lambda: fulfilled('mine'), Context(10000), store)
+    assert response['messages'][0]['content'] == 'mine'
+
+def test_leader_result_is_shared_through_the_store(tmp_path):
+    store = SQLiteCoalescingStore(str(tmp_path / 'coalesce.db'))
+    event = lex_event(Region='us-east-1')
+    assert coalesce.coalesce(event, lambda: fulfilled('first'), None, store)['messages'][0]['content'] == 'first'
+    assert coalesce.coalesce(event, lambda: fulfilled('second'), None, store)['messages'][0]['content'] == 'first'
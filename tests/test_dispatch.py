@@ -0,0 +1,26 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import lambda_function
+from cloud_assistant.intents import ec2
+from tests.conftest import Context, lex_event
+
+def test_importing_the_handler_loads_no_intent_or_sdk_module():
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, lambda_function; print(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent
+    ).stdout.split()
+    assert not [name for name in loaded if name.startswith(('cloud_assistant.intents', 'boto3', 'botocore'))]
+
+def test_intents_are_routed_to_their_handler(backend):
+    response = lambda_function.lambda_handler(lex_event(Region='us-east-1'), Context())
+    assert response['sessionState']['intent']['state'] == 'Fulfilled'
+    assert lambda_function.get_handler('ListEC2Instances') is ec2.handle_list_ec2_instances
+    # Handler names stay reachable as attributes of the entry module
+    assert lambda_function.handle_list_ec2_instances is ec2.handle_list_ec2_instances
+
+def test_unknown_intents_fail_politely():
+    response = lambda_function.fulfil(lex_event('OrderPizza'), Context())
+    assert response['sessionState']['intent'] == {'name': 'OrderPizza', 'state': 'Failed'}
+    assert "don't know how to handle" in response['messages'][0]['content']
@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.synthetic_aws import INSTANCE_STATES
+from cloud_assistant.intents import ec2
+
+REGION = 'us-east-1'
+
+def expected_count(backend, state):
+    return sum(1 for i in range(backend.account.instances_per_region) if INSTANCE_STATES[i % len(INSTANCE_STATES)] == state)
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    ec2.batch_cache.invalidate()
+    ec2.inventory_cache.invalidate()
+    yield
+    ec2.batch_cache.invalidate()
+
+def test_filtered_count_only_sweep_streams_without_caching_a_batch(backend):
+    summary = ec2.summarize_region(REGION, 'running', limit=3, count_only=True)
+    assert summary['Count'] == expected_count(backend, 'running')
+    assert summary['States'] == {'running': summary['Count']}
+    assert [instance['State'] for instance in summary['Instances']] == ['running'] * 3
+    assert ec2.batch_cache.get(REGION) is None
+
+def test_full_sweep_is_cached_and_answers_every_state_filter(backend):
+    summary = ec2.summarize_region(REGION, 'all', limit=5)
+    assert summary['Count'] == backend.account.instances_per_region
+    assert ec2.batch_cache.get(REGION) is not None
+    
+    backend.reset_calls()
+    stopped = ec2.summarize_region(REGION, 'stopped', limit=5, count_only=True)
+    assert stopped['Count'] == expected_count(backend, 'stopped')
+    assert backend.total_calls() == 0
+
+def test_regions_above_the_bound_are_not_cached(backend, monkeypatch):
+    monkeypatch.setattr(ec2, 'BATCH_CACHE_MAX_INSTANCES', 10)
+    summary = ec2.summarize_region(REGION, 'all', limit=5)
+    assert summary['Count'] == backend.account.instances_per_region
+    assert len(summary['Instances']) == 5
+    assert ec2.batch_cache.get(REGION) is None
+
+def test_stale_batch_is_swept_again(backend):
+    ec2.summarize_region(REGION, 'all', limit=5)
+    stored_at, batch = ec2.batch_cache._entries[REGION]
+    ec2.batch_cache._entries[REGION] = (stored_at - ec2.batch_cache.ttl - 1, batch)
+    assert ec2.batch_cache.get(REGION) is not None
+    
+    backend.reset_calls()
+    summary = ec2.summarize_region(REGION, 'running', limit=5)
+    assert summary['Count'] == expected_count(backend, 'running')
+    assert backend.total_calls() > 0
+
+def test_listings_follow_every_page(backend, monkeypatch):
+    monkeypatch.setattr(ec2, 'EC2_PAGE_SIZE', 7)
+    records = list(ec2.iter_instances(REGION))
+    assert len({record['InstanceId'] for record in records}) == backend.account.instances_per_region
+    assert len(list(ec2.iter_instance_ids(REGION))) == backend.account.instances_per_region
+    assert backend.calls[('ec2', 'describe_instances')] == backend.calls[('ec2', 'describe_instance_status')] == 8
+
+def test_count_only_sweep_describes_only_the_listed_rows(backend, monkeypatch):
+    monkeypatch.setattr(ec2, 'EC2_PAGE_SIZE', 7)
+    summary = ec2.summarize_region(REGION, 'all', limit=3, count_only=True)
+    assert summary['Count'] == backend.account.instances_per_region
+    assert [instance['Name'] for instance in summary['Instances']] == ['server-0', 'server-1', 'server-2']
+    assert backend.calls[('ec2', 'describe_instance_status')] == 8
+    assert backend.calls[('ec2', 'describe_instances')] == 1
@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+from benchmarks.synthetic_aws import SyntheticHealth
+from cloud_assistant import health
+from cloud_assistant.coalesce import SQLiteCoalescingStore
+from cloud_assistant.intents.service_status import handle_aws_service_status
+from cloud_assistant.pages import LEX_MESSAGE_CHARS
+from tests.conftest import lex_event
+
+class SubscriptionRequired(Exception):
+    response = {'Error': {'Code': 'SubscriptionRequiredException', 'Message': 'Subscription required'}}
+
+class Provider:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+    
+    def fetch(self):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return {'CheckedAt': health._now(), 'Events': [{'Service': 'EC2', 'Region': 'us-east-1'}]}
+
+class SlowProvider(Provider):
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+    
+    def fetch(self):
+        self.gate.wait(5)
+        return super().fetch()
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = Provider()
+    monkeypatch.setattr(health, '_provider', provider)
+    monkeypatch.setattr(health, '_pending', None)
+    monkeypatch.setattr(health, '_failure', None)
+    monkeypatch.setattr(health, '_store', None)
+    monkeypatch.setattr(health, 'HEALTH_STORE', '')
+    health.health_cache.invalidate()
+    yield provider
+    health.health_cache.invalidate()
+
+def test_subscription_error_is_remembered(provider):
+    provider.error = SubscriptionRequired()
+    for _ in range(3):
+        with pytest.raises(SubscriptionRequired):
+            health.get_health()
+    assert provider.calls == 1
+
+def test_subscription_error_expires(provider, monkeypatch):
+    provider.error = SubscriptionRequired()
+    with pytest.raises(SubscriptionRequired):
+        health.get_health()
+    monkeypatch.setattr(health, '_failure', (health._failure[0], 0))
+    provider.error = None
+    assert health.get_health()['Events']
+    assert provider.calls == 2
+
+def test_other_errors_are_not_remembered(provider):
+    provider.error = RuntimeError('boom')
+    with pytest.raises(RuntimeError):
+        health.get_health()
+    provider.error = None
+    assert health.get_health()['Events']
+    assert provider.calls == 2
+
+def test_refresh_fills_the_cache(provider):
+    assert health.refresh_health() == {'refreshed': True, 'events': 1}
+    health.get_health()
+    assert provider.calls == 1
+
+def test_refresh_reports_failures(provider):
+    provider.error = SubscriptionRequired()
+    result = health.refresh_health()
+    assert result['refreshed'] is False
+    with pytest.raises(SubscriptionRequired):
+        health.get_health()
+    assert provider.calls == 1
+
+def test_fresh_shared_snapshot_skips_the_provider(provider, monkeypatch, tmp_path):
+    monkeypatch.setattr(health, '_store', SQLiteCoalescingStore(str(tmp_path / 'health.db')))
+    health.refresh_health()
+    health.health_cache.invalidate()
+    assert health.get_health()['Events']
+    assert provider.calls == 1
+
+def test_stale_shared_snapshot_covers_a_slow_provider(monkeypatch, tmp_path):
+    slow = SlowProvider()
+    store = SQLiteCoalescingStore(str(tmp_path / 'health.db'))
+    store.put(f"health:{health.HEALTH_PROVIDER}", {'CheckedAt': '2024-01-01T00:00:00+00:00', 'Events': []}, 60)
+    monkeypatch.setattr(health, '_provider', slow)
+    monkeypatch.setattr(health, '_pending', None)
+    monkeypatch.setattr(health, '_failure', None)
+    monkeypatch.setattr(health, '_store', store)
+    monkeypatch.setattr(health, 'HEALTH_LOAD_TIMEOUT', 0.05)
+    health.health_cache.invalidate()
+    try:
+        assert health.get_health()['CheckedAt'] == '2024-01-01T00:00:00+00:00'
+    finally:
+        slow.gate.set()
+        health.health_cache.invalidate()
+
+def test_events_without_timestamps_are_sorted_last(backend, monkeypatch):
+    events = SyntheticHealth._events
+    
+    def undated(self):
+        records = events(self)
+        for key in ('startTime', 'lastUpdatedTime'):
+            records[0].pop(key)
+        return records
+    
+    monkeypatch.setattr(SyntheticHealth, '_events', undated)
+    snapshot = health.AWSHealthProvider().fetch()
+    assert [event['Service'] for event in snapshot['Events']] == ['LAMBDA', 'EC2']
+
+def test_busy_feed_is_paged_within_the_message_limit(provider):
+    event = {'Service': 'EC2', 'Region': 'us-east-1', 'Type': 'AWS_EC2_OPERATIONAL_ISSUE',
+             'StartTime': '2024-01-01T00:00:00+00:00', 'Description': 'x' * 400}
+    provider.fetch = lambda: {'CheckedAt': health._now(), 'Events': [event] * 40}
+    response = handle_aws_service_status(lex_event('GetAWSServiceStatus', ServiceName='ec2'))
+    contents = [message['content'] for message in response['messages']]
+    assert all(len(content) <= LEX_MESSAGE_CHARS for content in contents)
+    assert "Degraded - 40 open issue(s)" in contents[0]
+    assert 'show more' in contents[-1]
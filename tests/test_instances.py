@@ -0,0 +1,58 @@
+from benchmarks.synthetic_aws import INSTANCE_STATES, TEAMS
+from cloud_assistant.instances import InstanceBatch
+from cloud_assistant.intents.ec2 import load_region_batch
+
+def sample_batch():
+    batch = InstanceBatch()
+    batch.append('i-0123456789abcdef0', 'running', 'us-east-1', 't3.micro', 'web-1', {'Name': 'web-1', 'team': 'web'})
+    batch.append('i-00000001', 'stopped', 'us-east-1', 't3.large', None, {})
+    batch.append('i-0fedcba9876543210', 'running', 'eu-west-1', 't3.micro', 'db-1', {'team': 'data', 'env': 'prod'})
+    return batch
+
+def test_records_round_trip():
+    records = [record.as_dict() for record in sample_batch().select()]
+    assert records == [
+        {'InstanceId': 'i-0123456789abcdef0', 'State': 'running', 'InstanceType': 't3.micro', 'Name': 'web-1', 'Region': 'us-east-1', 'Tags': {'team': 'web'}},
+        {'InstanceId': 'i-00000001', 'State': 'stopped', 'InstanceType': 't3.large', 'Name': None, 'Region': 'us-east-1', 'Tags': {}},
+        {'InstanceId': 'i-0fedcba9876543210', 'State': 'running', 'InstanceType': 't3.micro', 'Name': 'db-1', 'Region': 'eu-west-1', 'Tags': {'team': 'data', 'env': 'prod'}}
+    ]
+
+def test_counts_with_filters():
+    batch = sample_batch()
+    assert len(batch) == batch.count() == 3
+    assert batch.count({'state': 'running'}) == 2
+    assert batch.count({'state': 'running', 'region': 'us-east-1'}) == 1
+    assert batch.count({'tag:team': 'data'}) == 1
+    assert batch.count({'state': 'terminated'}) == 0
+    assert batch.count({'tag:owner': 'nobody'}) == 0
+
+def test_count_by_one_or_several_fields():
+    batch = sample_batch()
+    assert batch.count_by('state') == {'running': 2, 'stopped': 1}
+    assert batch.count_by('instance_type', where={'region': 'us-east-1'}) == {'t3.micro': 1, 't3.large': 1}
+    # A tag key first seen on a later row reads as None on the earlier ones
+    assert batch.count_by('tag:env') == {None: 2, 'prod': 1}
+    assert batch.count_by('tag:owner') == {None: 3}
+    assert batch.count_by('region', 'state') == {('us-east-1', 'running'): 1, ('us-east-1', 'stopped'): 1, ('eu-west-1', 'running'): 1}
+
+def test_select_filters_and_limits():
+    batch = sample_batch()
+    assert [record.InstanceId for record in batch.select({'state': 'running'}, limit=1)] == ['i-0123456789abcdef0']
+    assert [record.Name for record in batch.select({'tag:team': 'data'})] == ['db-1']
+
+def test_columns_widen_past_65535_values():
+    batch = InstanceBatch()
+    for index in range(70000):
+        batch.append(f"i-{index:017x}", 'running', 'us-east-1', tags={'serial': str(index)})
+    assert batch.count({'tag:serial': '69999'}) == 1
+    assert batch.select({'tag:serial': '69999'})[0].InstanceId == f"i-{69999:017x}"
+    assert batch.select(limit=1)[0].Tags == {'serial': '0'}
+
+def test_region_sweep_matches_the_account(backend):
+    batch = load_region_batch('us-east-1')
+    instances = [backend.account.instance('us-east-1', index) for index in range(backend.account.instances_per_region)]
+    assert len(batch) == len(instances)
+    assert batch.count_by('state') == {state: sum(1 for i in instances if i['State']['Name'] == state) for state in set(INSTANCE_STATES)}
+    assert batch.count_by('tag:team') == {team: sum(1 for i in instances if {'Key': 'team', 'Value': team} in i['Tags']) for team in TEAMS}
+    first = batch.select(limit=1)[0]
+    assert (first.InstanceId, first.Name, first.Tags) == (instances[0]['InstanceId'], 'server-0', {'team': 'payments'})
@@ -0,0 +1,91 @@
+import pytest
+
+from cloud_assistant import jobs
+from cloud_assistant.intents.configure import handle_configure_aws_resource
+from tests.conftest import Context, lex_event
+
+def configure_event(confirmation='Confirmed', name='test-bucket'):
+    event = lex_event('ConfigureAWSResource', ResourceType='s3', ConfigurationName=name)
+    event['sessionId'] = 'session-1'
+    event['sessionState']['intent']['confirmationState'] = confirmation
+    return event
+
+@pytest.fixture
+def store(tmp_path):
+    return jobs.SQLiteJobStore(str(tmp_path / 'jobs.db'))
+
+def calls(backend, operation):
+    return backend.calls.get(('s3', operation), 0)
+
+def test_job_runs_every_step_and_checkpoints(backend, store):
+    job, created = jobs.submit(configure_event(), 's3', 'test-bucket', 'us-east-1', context=Context(), store=store)
+    assert created
+    assert job['Status'] == jobs.QUEUED
+    assert backend.calls[('lambda', 'invoke')] == 1
+    
+    assert jobs.run_job(job['JobId'], store=store) == jobs.SUCCEEDED
+    job = jobs.get_job(job['JobId'], store)
+    assert job['StepsDone'] == ['create_bucket', 'block_public_access', 'encrypt', 'tag']
+    assert job['Checkpoint'] == {'Bucket': 'test-bucket'}
+    assert 'is done' in jobs.describe_job(job)
+
+def test_worker_low_on_time_hands_off_and_the_next_resumes(backend, store):
+    job, _ = jobs.submit(configure_event(), 's3', 'test-bucket', 'us-east-1', context=Context(), store=store)
+    
+    # Less than JOB_HANDOFF_SECONDS left: one step, then hand the job on
+    assert jobs.run_job(job['JobId'], Context(remaining_ms=2000), store) == jobs.RUNNING
+    handed_off = jobs.get_job(job['JobId'], store)
+    assert handed_off['StepsDone'] == ['create_bucket']
+    assert backend.calls[('lambda', 'invoke')] == 2
+    assert 'step 2 of 4' in jobs.describe_job(handed_off)
+    
+    assert jobs.run_job(job['JobId'], store=store) == jobs.SUCCEEDED
+    assert calls(backend, 'create_bucket') == 1
+    assert calls(backend, 'put_bucket_tagging') == 1
+
+def test_job_held_by_another_worker_is_left_alone(backend, store):
+    job, _ = jobs.submit(configure_event(), 's3', 'test-bucket', 'us-east-1', context=Context(), store=store)
+    assert store.claim(job['JobId'], 'other-worker', 60) is not None
+    assert jobs.run_job(job['JobId'], store=store) is None
+    assert calls(backend, 'create_bucket') == 0
+
+def test_repeated_request_gets_the_recorded_job(backend, store):
+    first, created = jobs.submit(configure_event(), 's3', 'test-bucket', 'us-east-1', context=Context(), store=store)
+    again, created_again = jobs.submit(configure_event(), 's3', 'Test-Bucket ', 'us-east-1', context=Context(), store=store)
+    assert created and not created_again
+    assert again['JobId'] == first['JobId']
+
+def test_local_store_is_rejected_when_workers_run_in_lambda():
+    with pytest.raises(jobs.JobStoreConfigError):
+        jobs.check_store_config('sqlite:/tmp/jobs.db', worker_function='worker', in_lambda=False)
+    with pytest.raises(jobs.JobStoreConfigError):
+        jobs.check_store_config('sqlite:/tmp/jobs.db', worker_function='', in_lambda=True)
+    jobs.check_store_config('sqlite:/tmp/jobs.db', worker_function='', in_lambda=False)
+    jobs.check_store_config('dynamodb:jobs', worker_function='worker', in_lambda=True)
+
+def test_missing_store_is_only_an_error_when_workers_run_in_lambda():
+    with pytest.raises(jobs.JobStoreConfigError, match='JOB_STORE'):
+        jobs.check_store_config('', worker_function='', in_lambda=True)
+    jobs.check_store_config('', worker_function='', in_lambda=False)
+
+def test_unconfigured_store_in_lambda_fails_the_turn(backend, monkeypatch):
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'cloud-assistant')
+    monkeypatch.setattr(jobs, 'JOB_STORE', '')
+    monkeypatch.setattr(jobs, '_store', None)
+    response = handle_configure_aws_resource(configure_event(), Context())
+    assert response['sessionState']['intent']['state'] == 'Failed'
+    assert 'JOB_STORE' in response['messages'][0]['content']
+    assert ('lambda', 'invoke') not in backend.calls
+
+def test_provisioning_waits_for_confirmation(backend, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(jobs, 'submit', lambda *args, **kwargs: submitted.append(args))
+    
+    response = handle_configure_aws_resource(configure_event(confirmation='None'), Context())
+    assert response['sessionState']['dialogAction']['type'] == 'ConfirmIntent'
+    assert response['sessionState']['intent']['slots']['ConfigurationName']
+    
+    response = handle_configure_aws_resource(configure_event(confirmation='Denied'), Context())
+    assert response['sessionState']['dialogAction']['type'] == 'Close'
+    assert "won't create" in response['messages'][0]['content']
+    assert submitted == []
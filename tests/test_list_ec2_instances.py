@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from cloud_assistant.fanout import DEADLINE_SAFETY_MARGIN_MS
+from cloud_assistant.intents import ec2
+from tests.conftest import Context, lex_event
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    caches = [ec2.region_cache, ec2.inventory_cache, ec2.batch_cache]
+    for cache in caches:
+        cache.invalidate()
+    yield
+    for cache in caches:
+        cache.invalidate()
+
+def content(response):
+    return "".join(message['content'] for message in response['messages'])
+
+def test_every_region_is_counted(backend):
+    response = ec2.handle_list_ec2_instances(lex_event(), Context())
+    total = len(backend.account.regions) * backend.account.instances_per_region
+    assert f"I found {total} EC2 instances across all regions:" in content(response)
+    for region in backend.account.regions:
+        assert f"Region {region}: {backend.account.instances_per_region} instances" in content(response)
+
+def test_slow_and_failing_regions_do_not_hold_up_the_answer(backend, monkeypatch):
+    slow, failing = backend.account.regions[1:]
+    released = threading.Event()
+    summarize = ec2.get_region_summary
+    
+    def get_region_summary(region, *args):
+        if region == slow:
+            released.wait(5)
+        if region == failing:
+            raise RuntimeError('boom')
+        return summarize(region, *args)
+    
+    monkeypatch.setattr(ec2, 'get_region_summary', get_region_summary)
+    try:
+        response = ec2.handle_list_ec2_instances(lex_event(), Context(DEADLINE_SAFETY_MARGIN_MS + 500))
+    finally:
+        released.set()
+    text = content(response)
+    assert f"I found {backend.account.instances_per_region} EC2 instances across the regions I checked:" in text
+    assert f"Degraded regions: {failing} (" in text
+    assert f"Regions not scanned (time limit reached): {slow}" in text
+
+def test_single_region_lists_its_instances(backend):
+    response = ec2.handle_list_ec2_instances(lex_event(Region='us-east-1', InstanceState='stopped'), Context())
+    text = content(response)
+    assert text.startswith("I found 8 EC2 instances in the stopped state in us-east-1:")
+    assert "(stopped): server-3" in text
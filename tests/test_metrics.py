@@ -0,0 +1,60 @@
+import json
+import threading
+
+from cloud_assistant import metrics
+from cloud_assistant.fanout import fan_out
+
+def emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+
+def test_aws_calls_are_published_per_operation_and_per_region(capsys):
+    metrics.start_invocation()
+    metrics.record_aws_call('ec2', 'describe_instances', 'us-east-1', 10, 1)
+    metrics.record_aws_call('ec2', 'describe_instances', 'us-east-1', 15, 1)
+    metrics.record_aws_call('ec2', 'describe_instances', 'eu-west-1', 20, 3, error=RuntimeError())
+    metrics.flush('ListEC2Instances', 50, {})
+    
+    calls = {d['Region']: d for d in emitted(capsys) if 'AWSCallLatency' in d}
+    assert set(calls) == {'us-east-1', 'eu-west-1'}
+    for document in calls.values():
+        assert document['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Service', 'Operation'], ['Service', 'Region']]
+        assert document['Service'] == 'ec2' and document['Operation'] == 'describe_instances'
+    assert calls['us-east-1']['AWSCallLatency'] == [10, 15]
+    assert calls['eu-west-1']['AWSCallLatency'] == [20]
+    assert calls['eu-west-1']['AWSCallRetries'] == 2
+    assert calls['eu-west-1']['AWSCallErrors'] == 1
+
+def test_fan_out_workers_record_into_the_callers_invocation(capsys):
+    metrics.start_invocation()
+    fan_out(lambda region: metrics.record_aws_call('ec2', 'describe_instances', region, 1, 1), ['a', 'b', 'c'])
+    metrics.flush('ListEC2Instances', 5, {})
+    calls = [d for d in emitted(capsys) if 'AWSCallLatency' in d]
+    assert sorted(d['Region'] for d in calls) == ['a', 'b', 'c']
+
+def test_late_measurements_do_not_leak_into_the_next_invocation(capsys):
+    metrics.start_invocation()
+    release = threading.Event()
+    recorded = threading.Event()
+    
+    def straggler(_):
+        release.wait(5)
+        metrics.record_cache('regions', True)
+        recorded.set()
+    
+    fan_out(straggler, ['us-east-1'], timeout=0)
+    metrics.flush('First', 1, {})
+    
+    metrics.start_invocation()
+    release.set()
+    recorded.wait(5)
+    metrics.flush('Second', 1, {})
+    assert not [d for d in emitted(capsys) if 'CacheHits' in d]
+
+def test_records_outside_an_invocation_are_dropped(capsys):
+    metrics._collector.set(None)
+    metrics.record_cache('regions', False)
+    metrics.record_aws_call('ec2', 'describe_regions', 'us-east-1', 1, 1)
+    metrics.flush('Background', 1, {})
+    documents = emitted(capsys)
+    assert [d['Intent'] for d in documents] == ['Background']
+    assert not [d for d in documents if 'AWSCallLatency' in d or 'CacheMisses' in d]
@@ -0,0 +1,80 @@
+import pytest
+
+from cloud_assistant import pages
+from cloud_assistant.coalesce import SQLiteCoalescingStore
+from cloud_assistant.pages import LEX_MESSAGE_CHARS, LEX_MESSAGES_PER_PAGE, ResponseBuffer, _pack, next_page
+from tests.conftest import lex_event
+
+def contents(response):
+    return [message['content'] for message in response['messages']]
+
+def test_items_are_packed_within_the_message_limits():
+    items = [f"{n}. " + "x" * 90 for n in range(100)]
+    messages, end = _pack("Header\n", items, 0, "")
+    assert 0 < end < len(items)
+    assert len(messages) <= LEX_MESSAGES_PER_PAGE
+    assert all(len(message) <= LEX_MESSAGE_CHARS for message in messages)
+    assert messages[0].startswith("Header")
+
+def test_oversized_header_and_notes_are_cut_to_size():
+    messages, end = _pack("h" * 5000, ["short item"], 0, "n" * 5000)
+    assert end == 1
+    assert all(len(message) <= LEX_MESSAGE_CHARS for message in messages)
+    assert "short item" in messages[-1]
+
+def test_oversized_item_is_truncated_not_garbled():
+    messages, end = _pack("", ["y" * 5000], 0, "n" * 5000)
+    assert end == 1
+    assert messages[-1].endswith("...")
+    assert len(messages[-1]) <= LEX_MESSAGE_CHARS
+
+def test_first_page_response_fits_with_notes_and_prompt():
+    buffer = ResponseBuffer()
+    buffer.write("h" * 3000)
+    for n in range(200):
+        buffer.add_item(f"{n}. " + "z" * 120)
+    buffer.note("n" * 3000)
+    response = buffer.respond(lex_event(), 'ListEC2Instances')
+    assert all(len(content) <= LEX_MESSAGE_CHARS for content in contents(response))
+    assert 'show more' in contents(response)[-1]
+
+def test_show_more_pages_through_every_item_once():
+    buffer = ResponseBuffer()
+    buffer.write("Instances:\n")
+    items = [f"item-{n:03d} " + "." * 80 for n in range(60)]
+    for item in items:
+        buffer.add_item(item)
+    response = buffer.respond(lex_event(), 'ListEC2Instances')
+    seen = [line for content in contents(response) for line in content.splitlines() if line.startswith('item-')]
+    
+    attributes = response['sessionState']['sessionAttributes']
+    while pages.RESULT_SET_ATTRIBUTE in attributes:
+        response = next_page(lex_event(attributes=attributes), 'ShowMoreResults')
+        seen += [line for content in contents(response) for line in content.splitlines() if line.startswith('item-')]
+        attributes = response['sessionState']['sessionAttributes']
+    assert seen == items
+
+def test_result_sets_are_shared_through_the_store(tmp_path, monkeypatch):
+    store = SQLiteCoalescingStore(str(tmp_path / 'results.db'))
+    monkeypatch.setattr(pages, '_store', store)
+    result_id = pages.save_result_set(['a', 'b'])
+    pages.result_sets.invalidate()
+    assert pages.load_result_set(result_id) == ['a', 'b']
+
+def test_store_put_values_expire(tmp_path):
+    store = SQLiteCoalescingStore(str(tmp_path / 'results.db'))
+    store.put('k', [1, 2], ttl=60)
+    assert store.get('k') == ([1, 2], False)
+    store.put('gone', [1], ttl=-1)
+    assert store.get('gone') == (None, False)
+
+def test_notes_never_push_the_last_message_over_the_limit():
+    buffer = ResponseBuffer()
+    buffer.write("Header\n")
+    for n in range(9):
+        buffer.add_item(f"{n}. " + "x" * 97)
+    buffer.note("\n\nDegraded regions: " + "r" * 200)
+    messages = contents(buffer.respond(lex_event(), 'ListEC2Instances'))
+    assert all(0 < len(message) <= LEX_MESSAGE_CHARS for message in messages)
+    assert messages[-1].startswith("Degraded regions")
+    assert "8. " in messages[0]
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cloud_assistant.scheduler import CircuitBreaker, TokenBucket
+
+def open_breaker(cooldown=60):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=cooldown)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.retry_in() == 0
+    breaker.record_failure()
+    assert breaker.retry_in() > 0
+
+def test_half_open_breaker_admits_one_trial_call():
+    breaker = open_breaker(cooldown=0.05)
+    breaker.opened_at -= 1
+    with ThreadPoolExecutor(16) as executor:
+        waits = list(executor.map(lambda _: breaker.retry_in(), range(16)))
+    assert waits.count(0) == 1
+
+def test_successful_trial_call_closes_the_breaker():
+    breaker = open_breaker()
+    breaker.opened_at -= 61
+    assert breaker.retry_in() == 0
+    assert breaker.retry_in() > 0
+    breaker.record_success()
+    assert breaker.retry_in() == 0
+    assert breaker.retry_in() == 0
+
+def test_failed_trial_call_reopens_the_breaker():
+    breaker = open_breaker()
+    breaker.opened_at -= 61
+    assert breaker.retry_in() == 0
+    breaker.record_failure()
+    assert breaker.retry_in() > 59
+
+def test_lost_trial_call_is_replaced_after_a_cooldown():
+    breaker = open_breaker()
+    breaker.opened_at -= 61
+    assert breaker.retry_in() == 0
+    breaker.probe_started -= 61
+    assert breaker.retry_in() == 0
+
+def test_token_bucket_halves_its_rate_on_throttling_and_recovers():
+    bucket = TokenBucket(rate=10, burst=1, min_rate=1)
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    bucket.on_success()
+    assert bucket.rate == 6
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
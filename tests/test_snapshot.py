@@ -0,0 +1,104 @@
+import pytest
+
+from cloud_assistant import alarm_index, bucket_listing, snapshot
+from cloud_assistant.intents import ec2
+from tests.conftest import Context
+
+def record(resource_id, region='us-east-1', state='running', instance_type='t3.micro', **tags):
+    return {
+        'ResourceType': 'ec2', 'ResourceId': resource_id, 'Region': region, 'State': state,
+        'InstanceType': instance_type, 'Name': resource_id, 'Tags': tags, 'Data': {}
+    }
+
+RECORDS = {
+    'us-east-1': [
+        record('i-1', team='payments'),
+        record('i-2', state='stopped', team='search'),
+        record('i-3', instance_type='t3.large', team='payments'),
+        record('i-4')
+    ],
+    'eu-west-1': [record('i-5', region='eu-west-1', team='payments')]
+}
+
+@pytest.fixture(params=['sqlite', 'dynamodb'])
+def store(request, backend, tmp_path):
+    if request.param == 'sqlite':
+        store = snapshot.SQLiteSnapshotStore(str(tmp_path / 'inventory.db'))
+    else:
+        store = snapshot.DynamoDBSnapshotStore('inventory')
+    for region, records in RECORDS.items():
+        store.replace('ec2', region, records)
+    return store
+
+def ids(records):
+    return {r['ResourceId'] for r in records}
+
+def test_query_filters_on_every_indexed_field(store):
+    assert ids(store.query('ec2', region='us-east-1')) == {'i-1', 'i-2', 'i-3', 'i-4'}
+    assert ids(store.query('ec2', state='stopped')) == {'i-2'}
+    assert ids(store.query('ec2', instance_type='t3.large')) == {'i-3'}
+    assert ids(store.query('ec2', tags={'team': 'payments'})) == {'i-1', 'i-3', 'i-5'}
+    assert ids(store.query('ec2', region='eu-west-1', tags={'team': 'payments'})) == {'i-5'}
+    assert ids(store.query('ec2', state='running', instance_type='t3.micro', tags={'team': 'payments'})) == {'i-1', 'i-5'}
+    assert len(store.query('ec2', limit=2)) == 2
+
+def test_aggregate_by_field_and_tag(store):
+    assert store.aggregate('ec2', 'state') == {'running': 4, 'stopped': 1}
+    assert store.aggregate('ec2', 'region') == {'us-east-1': 4, 'eu-west-1': 1}
+    # Records without the tag are counted under None
+    assert store.aggregate('ec2', 'tag:team') == {'payments': 3, 'search': 1, None: 1}
+    assert store.aggregate('ec2', 'tag:team', region='us-east-1', state='running') == {'payments': 2, None: 1}
+    assert store.aggregate('ec2', 'tag:owner') == {None: 5}
+
+def test_replace_drops_records_missing_from_the_new_snapshot(store):
+    store.replace('ec2', 'us-east-1', [record('i-1', team='search')])
+    assert ids(store.query('ec2', region='us-east-1')) == {'i-1'}
+    assert ids(store.query('ec2', tags={'team': 'payments'})) == {'i-5'}
+    assert store.aggregate('ec2', 'tag:team') == {'search': 1, 'payments': 1}
+
+def test_large_partitions_are_read_across_pages(store):
+    records = [record(f"i-{n:04d}", team=['payments', 'search'][n % 2]) for n in range(250)]
+    store.replace('ec2', 'us-east-1', records)
+    assert len(store.query('ec2', region='us-east-1')) == 250
+    assert store.aggregate('ec2', 'tag:team', region='us-east-1') == {'payments': 125, 'search': 125}
+
+def test_partitions_report_their_refresh_time(store):
+    assert set(store.refreshed_at('ec2')) == {'us-east-1', 'eu-west-1'}
+    assert 0 <= snapshot.snapshot_age('ec2', store) < 60
+    assert snapshot.snapshot_age('s3', store) is None
+
+def test_queries_without_a_store_return_none(monkeypatch):
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_STORE', '')
+    monkeypatch.setattr(snapshot, '_store', None)
+    assert snapshot.query('ec2') is None
+    assert snapshot.aggregate('ec2', 'tag:team') is None
+    with pytest.raises(ValueError):
+        snapshot.refresh_snapshot()
+
+@pytest.fixture
+def empty_caches():
+    caches = [ec2.region_cache, ec2.inventory_cache, ec2.batch_cache, bucket_listing.bucket_details_cache, bucket_listing.region_sizes_cache]
+    for cache in caches:
+        cache.invalidate()
+    alarm_index.clear_indexes()
+    yield
+    for cache in caches:
+        cache.invalidate()
+    alarm_index.clear_indexes()
+
+def test_refresh_writes_every_type_and_region(backend, tmp_path, monkeypatch, empty_caches):
+    monkeypatch.setattr(alarm_index, 'ALARM_REGIONS', ['us-east-1'])
+    store = snapshot.SQLiteSnapshotStore(str(tmp_path / 'inventory.db'))
+    result = snapshot.refresh_snapshot(Context(), store)
+    
+    assert result['failed'] == {}
+    regions = backend.account.regions
+    assert {f"ec2#{region}": 50 for region in regions}.items() <= result['written'].items()
+    assert result['written']['alarm#us-east-1'] == 100
+    assert sum(count for key, count in result['written'].items() if key.startswith('s3#')) == 20
+    
+    by_team = snapshot.aggregate('ec2', 'tag:team', store=store)
+    assert sum(by_team.values()) == 50 * len(regions)
+    assert by_team['payments'] == 13 * len(regions)
+    assert snapshot.aggregate('s3', 'state', store=store) == {'public': 2, 'private': 18}
+    assert len(snapshot.query('alarm', state='ALARM', store=store)) == 20